@@ -1,13 +1,21 @@
+import os
 from collections import Counter
 from scipy.stats import spearmanr
 import pandas as pd
 from matplotlib import pyplot as plt
+from postrequisite_prediction.GradeMatrices import GradeMatrices
+from postrequisite_prediction.GradeStore import GradeStore
 
 COURSE_LIST = pd.read_csv('..\\Data\\unique_courses.csv')['courses']
 STUDENT_ID_LIST = pd.read_csv('..\\Data\\unique_student_ids.csv')['student_id']
 GRADES_LIST = pd.read_csv('..\\Data\\id_term_course_grade.csv')
 GRADES_LIST[['student_id', 'term_number']] = GRADES_LIST[['student_id', 'term_number']].apply(pd.to_numeric)
-STUDENT_GRADE_LIST = pd.read_csv('data\\student_grade_list.csv')
+GRADE_MATRICES_FOLDER = 'data\\GradeMatrices'
+# the grade matrices only read the two classes of each combination, the grade list has to be read in full
+if os.path.exists(GRADE_MATRICES_FOLDER):
+    STUDENT_GRADES = GradeMatrices.open(GRADE_MATRICES_FOLDER)
+else:
+    STUDENT_GRADES = GradeStore.from_grade_list(pd.read_csv('data\\student_grade_list.csv'))
 COURSE_COMBINATIONS = pd.read_csv('..\\Data\\course_combinations.csv')
 FINAL_FILE = 'results\\final_correlations.csv'
 GRAPHS_FOLDER = 'results\\graphs\\'
@@ -20,36 +28,24 @@ MIN_SAMPLES = 20
 
 def fill():
     """
-    For each row in the course combinations table, get class 1 and class 2. Create a temporary dataframe with the 2 classes
-    as column names. For each student, search through the student grade list for the class names. If a student has grade
-    entries for both classes, add them to the temporary dataframe. Once all students have been iterated through, calculate
-    the Spearman rank-order correlation coefficient.
+    For each row in the course combinations table, get class 1 and class 2. Select the students who have grade entries
+    for both classes from the grade matrices of the student grade list, and calculate the Spearman rank-order correlation
+    coefficient of their grades.
     """
-    counter = 0
-    final = pd.DataFrame(columns=['class_1', 'class_2', 'rho', 'pval', 'n'])
-    for (class_1, class1_row_series) in COURSE_COMBINATIONS.iterrows():
-        took_both_count = 0
-        class_2 = COURSE_COMBINATIONS['class 2'].values[class_1]
-        class_1 = COURSE_COMBINATIONS['class 1'].values[class_1]
-        df = pd.DataFrame(columns=[class_1, class_2])  # temp dataframe with class1 and class2 as column headers
-        for (student_id, student_row_series) in STUDENT_GRADE_LIST.iterrows():
-            grade_class_1 = STUDENT_GRADE_LIST[class_1].values[student_id]
-            grade_class_2 = STUDENT_GRADE_LIST[class_2].values[student_id]
-            if isinstance(grade_class_1, str) and isinstance(grade_class_2, str):
-                took_both_count += 1
-                temp_df = pd.DataFrame(
-                    data={class_1: [grade_class_1.split(',')[1]], class_2: [grade_class_2.split(',')[1]]})
-                df = df.append(temp_df, ignore_index=True)
-        rho, pval = spearmanr(df[class_1].values, df[class_2].values)
-        temp_df = pd.DataFrame(
-            data={'class_1': [class_1], 'class_2': [class_2], 'rho': [rho], 'pval': [pval], 'n': [took_both_count]})
-        final = final.append(temp_df, ignore_index=True)
+    final = {'class_1': [], 'class_2': [], 'rho': [], 'pval': [], 'n': []}
+    for counter, (class_1, class_2) in enumerate(zip(COURSE_COMBINATIONS['class 1'].values,
+                                                     COURSE_COMBINATIONS['class 2'].values)):
+        terms, grades = STUDENT_GRADES.columns([class_1, class_2])
+        took_both = (terms != GradeStore.MISSING).all(axis=1)
+        # the letter grades are ranked as they were read, the same as the grade list cells
+        rho, pval = spearmanr(GradeStore.decode(grades[took_both, 0]), GradeStore.decode(grades[took_both, 1]))
+        for column, value in zip(final, [class_1, class_2, rho, pval, int(took_both.sum())]):
+            final[column].append(value)
 
         print(counter)
         if counter % 1000 == 0:
-            final.to_csv(FINAL_FILE, index=False)
-        counter += 1
-    final.to_csv(FINAL_FILE, index=False)
+            pd.DataFrame(final).to_csv(FINAL_FILE, index=False)
+    pd.DataFrame(final).to_csv(FINAL_FILE, index=False)
 
 
 def generate_graphs(max_p_value, min_n_value):
@@ -70,18 +66,10 @@ def generate_graphs(max_p_value, min_n_value):
         class_1 = final_read['class_1'].values[class_1]
         # p value for each course combination must be less than or equal than Bonferonni adjusted p value
         if p_value <= max_p_value:
-            df = pd.DataFrame(columns=[class_1, class_2])
-            # for each student id in our grades list
-            for (student_id, student_row_series) in STUDENT_GRADE_LIST.iterrows():
-                grade_class_1 = STUDENT_GRADE_LIST[class_1].values[student_id]
-                grade_class_2 = STUDENT_GRADE_LIST[class_2].values[student_id]
-                # if a student's grade in class_1 and class_2 exists
-                if isinstance(grade_class_1, str) and isinstance(grade_class_2, str):
-                    # get numerical value (for graphing) of grade
-                    grade_class_1 = convert_grade(grade_class_1.split(',')[1])
-                    grade_class_2 = convert_grade(grade_class_2.split(',')[1])
-                    temp_df = pd.DataFrame(data={class_1: [grade_class_1], class_2: [grade_class_2]})
-                    df = df.append(temp_df, ignore_index=True)
+            # numerical value (for graphing) of the grade of each student who took both classes, the GradeCodec codes
+            terms, grades = STUDENT_GRADES.columns([class_1, class_2])
+            took_both = (terms != GradeStore.MISSING).all(axis=1)
+            df = pd.DataFrame(data={class_1: grades[took_both, 0], class_2: grades[took_both, 1]})
             if len(df) >= min_n_value:
                 # getting the bubble size based on frequency in set
                 c = Counter(zip(df[class_1].values, df[class_2].values))
@@ -105,39 +93,5 @@ def generate_graphs(max_p_value, min_n_value):
                                    c.isalpha() or c.isdigit() or c == ' ']).rstrip())  # https://stackoverflow.com/a/7406369
 
 
-def convert_grade(string_grade):
-    """
-    Convert the letter grade to an arbitrary value between 0-10 inclusive in order to plot evenly. Encoded values are
-    evenly spaced for graphing purposes only, these values should not be directly correlated to each grade in any other
-    way.
-    :param string_grade: the grade to encode
-    :return: the encoded value for each grade
-    """
-# convert the letter grade to an arbitrary value between 0-10 inclusive in order to plot evenly.
-def convert_grade(string_grade):
-    if string_grade == 'A':
-        return 10
-    elif string_grade == 'A-':
-        return 9
-    elif string_grade == 'B+':
-        return 8
-    elif string_grade == 'B':
-        return 7
-    elif string_grade == 'B-':
-        return 6
-    elif string_grade == 'C+':
-        return 5
-    elif string_grade == 'C':
-        return 4
-    elif string_grade == 'C-':
-        return 3
-    elif string_grade == 'D+':
-        return 2
-    elif string_grade == 'D':
-        return 1
-    elif string_grade == 'F':
-        return 0
-
-
 if __name__ == "__main__":
     generate_graphs(ALPHA_VALUE / NUM_FINAL_COMBINATIONS, MIN_SAMPLES)
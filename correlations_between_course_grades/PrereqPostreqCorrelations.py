@@ -33,14 +33,11 @@ if __name__ == "__main__":
     for i, postreq_row in __COMBINED_STRUCTURE_DF.iterrows():
         postreq_node = tree_maker.process(postreq_row['postreq'])
         if tree_type == 1:
-            prereqs = postreq_node.get_all_prereqs()
-            for k in list(prereqs):
-                if k.does_have_prereq() == 1:
-                    prereqs.remove(k)
+            prereqs = postreq_node.get_root_prereqs()
         elif tree_type == 2:
-            prereqs = postreq_node.get_immediate_prereqs()
+            prereqs = postreq_node.get_unique_immediate_prereqs()
         elif tree_type == 3:
-            prereqs = postreq_node.get_all_prereqs()
+            prereqs = postreq_node.get_unique_all_prereqs()
 
         for j, prereq_node in enumerate(prereqs):
             try_1 = __COURSE_CORRELATIONS_DF.loc[(__COURSE_CORRELATIONS_DF['class_1'] == postreq_node.get_name()) & (__COURSE_CORRELATIONS_DF['class_2'] == prereq_node.get_name())]
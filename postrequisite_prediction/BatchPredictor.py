@@ -0,0 +1,154 @@
+"""
+Scores students against the postreq models saved by Predict's save_models. The prereq grades of every asked for student
+in every prereq of every asked for course are read from the grade data in one pass, and each course's model is then
+run once on the feature rows of all of the students, instead of building a prereq table per student.
+
+How to use: Open a predictor for a model type and tree type with BatchPredictor.open (or construct one from a
+ModelRegistry and a GradeStore or GradeMatrices), then call predict_batch with the student ids and the course names.
+The result has one row per student and course with the predicted letter grade and, for the classifiers, the probability
+of each letter grade.
+
+Note: The features are made the same way as the prereq tables: the grade code of the first attempt of each prereq, -1
+for prereqs the student has not taken. Students that are not in the grade data have no prereq grades.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from postrequisite_prediction import GradeCodec
+from postrequisite_prediction.GeneratePrereqTables import output_filename
+from postrequisite_prediction.GradeMatrices import GradeMatrices
+from postrequisite_prediction.GradeStore import GradeStore
+from postrequisite_prediction.ModelRegistry import ModelRegistry
+
+__GRADE_MATRICES_FOLDER = Path('data/GradeMatrices/')
+__STUDENT_GRADE_LIST_WITH_TERMS_FILEPATH = Path('data/student_grade_list_with_terms.csv')
+
+
+class BatchPredictor:
+    __STUDENT_ID = 'student_id'
+    __COURSE = 'course'
+    __PREDICTED = 'predicted'
+    __PREREQS_TAKEN = 'prereqs_taken'
+    __MISSING_FEATURE = -1
+    __MODELS_FOLDER = Path('models/')
+
+    def __init__(self, registry, grades, model_cache=None):
+        """
+        The constructor for a BatchPredictor object.
+        :param registry: the ModelRegistry of the models to predict with
+        :param grades: the GradeStore or GradeMatrices to read the students' prereq grades from
+        :param model_cache: optional cache to get the models from, anything with a get(registry, course) method. By
+        default the registry keeps every model it loads.
+        """
+        self._registry = registry
+        self._grades = grades
+        self._model_cache = model_cache
+        self._student_index = pd.Index(grades.get_student_ids())
+
+    @classmethod
+    def open(cls, model_type, tree_type, models_folder=None, grades=None, model_cache=None):
+        """
+        Opens the models saved by save_models for a model type and tree type.
+        :param model_type: the model type name, for example 'GBT_CLASSIFIER'
+        :param tree_type: the tree type name, 'ROOT', 'IMMEDIATE' or 'ALL'
+        :param models_folder: the folder save_models saves into, models/ by default
+        :param grades: optional GradeStore or GradeMatrices, by default data/GradeMatrices when it is current and the
+        student grade list with terms otherwise (see default_grades)
+        :param model_cache: optional cache to get the models from, see the constructor
+        :return: the BatchPredictor
+        """
+        models_folder = cls.__MODELS_FOLDER if models_folder is None else Path(models_folder)
+        registry = ModelRegistry.open(models_folder / (model_type + '_model_' + tree_type))
+        if grades is None:
+            grades = default_grades()
+        return cls(registry, grades, model_cache)
+
+    def get_registry(self):
+        return self._registry
+
+    def predict_batch(self, students, courses):
+        """
+        Predicts the grade of every student in every course.
+        :param students: list of student ids
+        :param courses: list of postreq course names
+        :return: data frame with the student_id, course, predicted (letter grade) and prereqs_taken columns, and one
+        probability column per letter grade that is NaN for models without probabilities, ordered by course and then
+        student in the given orders
+        """
+        names = [output_filename(course)[:-4] for course in courses]
+        unknown = [course for course, name in zip(courses, names) if not self._registry.has_course(name)]
+        if unknown:
+            raise ValueError('No model is saved for: ' + ', '.join(unknown))
+
+        columns = list(dict.fromkeys(column for name in names for column in self._registry.get_columns(name)
+                                     if self._grades.has_course(column)))
+        column_position = {column: position for position, column in enumerate(columns)}
+        rows = self._student_index.get_indexer(pd.Index(students))
+        _, grades = self._grades.columns(columns)
+        grades = np.where(rows[:, None] >= 0, grades[rows], self.__MISSING_FEATURE)
+
+        predictions = []
+        for course, name in zip(courses, names):
+            features = np.full((len(rows), len(self._registry.get_columns(name))), self.__MISSING_FEATURE,
+                               dtype=np.float64)
+            for feature, column in enumerate(self._registry.get_columns(name)):
+                if column in column_position:
+                    features[:, feature] = grades[:, column_position[column]]
+            predictions.append(self.__predict_course(course, name, students, features))
+        if not predictions:
+            return self.__predict_course(None, None, [], np.empty((0, 0)))
+        return pd.concat(predictions, ignore_index=True)
+
+    def __predict_course(self, course, name, students, features):
+        """
+        Runs one course's model on the feature rows of all of the students.
+        :return: data frame of the course's rows of the predict_batch result
+        """
+        probabilities = np.full((len(features), len(GradeCodec.GRADE_SCALE)), np.NaN)
+        predicted = np.empty(0)
+        if len(features):
+            if self._model_cache is None:
+                model = self._registry.get_model(name)
+            else:
+                model = self._model_cache.get(self._registry, name)
+            if hasattr(model, 'predict_proba'):
+                probabilities[:] = 0
+                probabilities[:, np.asarray(model.classes_, dtype=np.intp)] = model.predict_proba(features)
+            # round half up and clip to the grade scale, like round_school in Predict
+            predicted = np.clip(np.floor(np.asarray(model.predict(features), dtype=np.float64) + 0.5), 0,
+                                len(GradeCodec.GRADE_SCALE) - 1)
+
+        data_frame = pd.DataFrame({
+            self.__STUDENT_ID: list(students),
+            self.__COURSE: course,
+            self.__PREDICTED: GradeCodec.decode(predicted),
+            self.__PREREQS_TAKEN: (features != self.__MISSING_FEATURE).sum(axis=1)
+        })
+        return pd.concat([data_frame, pd.DataFrame(probabilities, columns=GradeCodec.GRADE_SCALE)], axis=1)
+
+
+def default_grades():
+    """
+    Gets the grade data to read prereq grades from, data/GradeMatrices when it exists and was written after the last
+    change of the student grade list with terms, the student grade list with terms otherwise.
+    :return: GradeMatrices or GradeStore
+    """
+    if __GRADE_MATRICES_FOLDER.exists() and \
+            GradeMatrices.is_current(__GRADE_MATRICES_FOLDER, __STUDENT_GRADE_LIST_WITH_TERMS_FILEPATH):
+        return GradeMatrices.open(__GRADE_MATRICES_FOLDER)
+    return GradeStore.read_grade_list(__STUDENT_GRADE_LIST_WITH_TERMS_FILEPATH)
+
+
+def predict_batch(students, courses, model_type='GBT_CLASSIFIER', tree_type='ALL'):
+    """
+    Predicts the grade of every student in every course with the saved models of a model type and tree type.
+    :param students: list of student ids
+    :param courses: list of postreq course names
+    :param model_type: the model type name
+    :param tree_type: the tree type name
+    :return: the data frame of BatchPredictor.predict_batch
+    """
+    return BatchPredictor.open(model_type, tree_type).predict_batch(students, courses)
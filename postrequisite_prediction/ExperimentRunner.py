@@ -21,6 +21,7 @@ from joblib import Parallel, delayed, parallel_backend
 import pickle
 from scipy.stats import loguniform
 from sklearn.utils import column_or_1d
+from postrequisite_prediction import GradeCodec
 
 if not sys.warnoptions:
     warnings.simplefilter("ignore")
@@ -55,25 +56,6 @@ def trim(file, course_name):
     return x, y
 
 
-def convert_grade(string_grade):
-    if str(string_grade) == 'nan':
-        return -1
-    grade_conversions = {
-        'A': 10,
-        'A-': 9,
-        'B+': 8,
-        'B': 7,
-        'B-': 6,
-        'C+': 5,
-        'C': 4,
-        'C-': 3,
-        'D+': 2,
-        'D': 1,
-        'F': 0
-    }
-    return grade_conversions[string_grade]
-
-
 def get_prediction_data():
     current_data = course_data[course_data.student_id.isin(testing_students[experiment_name])]
     current_data = current_data[0:0]
@@ -91,7 +73,7 @@ def get_prediction_data():
                 missing_data = pd.read_csv(Path('data/studentGradesPerCourse.csv'))
                 current_data = current_data.drop(columns=col)
                 current_data = current_data.merge(missing_data[['student_id', col]], on='student_id', how='inner')
-                current_data[col] = current_data[col].apply(convert_grade)
+                current_data[col] = GradeCodec.encode(current_data[col])
     print(current_data)
     return current_data
 
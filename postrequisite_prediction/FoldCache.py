@@ -0,0 +1,111 @@
+"""
+Cache of the stratified cross validation folds of the prereq tables. The folds of a table are kept as one int8 array
+that gives the test fold of every row, so the train and test rows of any fold are found by index slicing the already
+loaded table instead of writing and reading a pair of csv files per fold. The folds of every course of one tree type
+are kept in a single .npz file, keyed by the course and the random seed, next to the labels they were made from.
+
+How to use: Open the cache file of a tree type with FoldCache.open and call split with the course, its labels and the
+seed to get the (train index, test index) pair of each fold, exactly as StratifiedKFold.split gives them. Folds that are
+missing, or were made from different labels, are made again. Call save to write the folds made since the cache was
+opened. Code that only reads folds, like the ZeroRs, can call folds to get the cached folds without making any.
+
+Note: The folds are the ones of StratifiedKFold with shuffling, so they depend only on the labels, the number of folds
+and the seed.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+from sklearn.model_selection import StratifiedKFold
+
+FOLD_CACHE_FILENAME = 'folds.npz'
+
+
+class FoldCache:
+    __LABELS_SUFFIX = '.labels'
+    __OPENED = {}
+
+    def __init__(self, filepath, number_folds=5):
+        """
+        The constructor for a FoldCache object. Reads the cached folds when the file exists.
+        :param filepath: the .npz file of the cache
+        :param number_folds: the number of folds to split each table into
+        """
+        self._filepath = Path(filepath)
+        self._number_folds = number_folds
+        self._arrays = {}
+        self._changed = False
+        if self._filepath.exists():
+            with np.load(self._filepath, allow_pickle=False) as arrays:
+                self._arrays = {key: arrays[key] for key in arrays.files}
+
+    @classmethod
+    def open(cls, filepath, number_folds=5):
+        """
+        Returns the cache in a file, reading it the first time the file is asked for in this process.
+        :param filepath: the .npz file of the cache
+        :param number_folds: the number of folds to split each table into
+        :return: the FoldCache
+        """
+        key = (str(Path(filepath).resolve()), number_folds)
+        if key not in cls.__OPENED:
+            cls.__OPENED[key] = cls(filepath, number_folds)
+        return cls.__OPENED[key]
+
+    def folds(self, name, seed, labels=None):
+        """
+        Gets the cached folds of a table.
+        :param name: the course name of the table
+        :param seed: the random seed the folds were made with
+        :param labels: optional labels of the table, the folds are only returned when they were made from these labels
+        :return: list of (train index, test index) pairs, None when the folds are not cached
+        """
+        key = self.__key(name, seed)
+        if key not in self._arrays:
+            return None
+        if labels is not None and not np.array_equal(self._arrays[key + self.__LABELS_SUFFIX], np.asarray(labels)):
+            return None
+        test_folds = self._arrays[key]
+        return [(np.flatnonzero(test_folds != fold), np.flatnonzero(test_folds == fold))
+                for fold in range(self._number_folds)]
+
+    def split(self, name, labels, seed):
+        """
+        Gets the folds of a table, making and caching them when they are not cached for these labels.
+        :param name: the course name of the table
+        :param labels: the labels to stratify on
+        :param seed: the random seed to shuffle with
+        :return: list of (train index, test index) pairs
+        """
+        cached = self.folds(name, seed, labels)
+        if cached is not None:
+            return cached
+
+        labels = np.asarray(labels)
+        test_folds = np.empty(len(labels), dtype=np.int8)
+        skf = StratifiedKFold(n_splits=self._number_folds, shuffle=True, random_state=seed)
+        for fold, (_, test_index) in enumerate(skf.split(np.zeros(len(labels)), labels)):
+            test_folds[test_index] = fold
+        key = self.__key(name, seed)
+        self._arrays[key] = test_folds
+        self._arrays[key + self.__LABELS_SUFFIX] = labels
+        self._changed = True
+        return self.folds(name, seed)
+
+    def save(self):
+        """
+        Writes the cache file when folds were made since it was read. The file is replaced in one step, so a reader
+        never sees a partly written cache.
+        """
+        if not self._changed:
+            return
+        self._filepath.parent.mkdir(parents=True, exist_ok=True)
+        temporary_filepath = self._filepath.with_suffix('.tmp' + str(os.getpid()) + '.npz')
+        np.savez_compressed(temporary_filepath, **self._arrays)
+        os.replace(temporary_filepath, self._filepath)
+        self._changed = False
+
+    @staticmethod
+    def __key(name, seed):
+        return name + '_' + str(seed)
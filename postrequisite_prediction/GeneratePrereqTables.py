@@ -0,0 +1,355 @@
+"""
+Script that creates the ROOT, IMMEDIATE and ALL prerequisite tables in a single pass over the course structure. It
+writes the same tables as GenerateRootPrereqTables, GenerateImmediatePrereqTables and GenerateAllPrereqTables, but each
+postrequisite's tree is built once and the students that took it are found once for all three of its prerequisite
+selections. Postrequisites are split across a pool of processes. Each process parses the grade list and the per term
+gpa and struggle files a single time and reuses them for every postrequisite it is given.
+
+A full run also writes a manifest of the courses, students and terms that fed each table. When a new term of grades is
+added to id_term_course_grade.csv, the update mode uses it to rebuild only the rows of the students with new grades, in
+only the tables whose courses those grades are in.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from postrequisite_prediction import GradeCodec
+from postrequisite_prediction.PrereqTableBuilder import PrereqTableBuilder
+from postrequisite_prediction.TermLookup import TermLookup
+from postrequisite_prediction.TreeScripts.TreeMaker import TreeMaker
+
+__COMBINED_COURSE_STRUCTURE_FILEPATH = Path('../Data/combined_course_structure.csv')
+__STUDENT_GRADE_LIST_WITH_TERMS_FILEPATH = Path('data/student_grade_list_with_terms.csv')
+__TERM_GRADES_FILEPATH = Path('../Data/id_term_course_grade.csv')
+__OUTPUT_FOLDER = Path('data/')
+
+MANIFEST_FILENAME = 'PrereqTablesManifest.json'
+TREE_CACHE_FOLDERNAME = 'TreeCache'
+
+TREE_TYPES = ['ROOT', 'IMMEDIATE', 'ALL']
+STUDENT_ID = 'student_id'
+TERM_NUMBER = 'term_number'
+COURSE_NAME = 'course name'
+GRADE = 'grade'
+
+_tree_maker = None
+_generator = None
+
+
+class GeneratePrereqTables:
+    __STUDENT_ID = 'student_id'
+    __CUMULATIVE_GPA = 'cumulative_gpa'
+    __PREV_TERM_GPA = 'prev_term_gpa'
+    __STRUGGLE = 'struggle'
+    __CUMULATIVE_GPA_FILEPATH = Path('data/cumulative_gpa.csv')
+    __TERM_GPA_FILEPATH = Path('data/term_gpa.csv')
+    __STRUGGLING_PER_TERM_FILEPATH = Path('data/struggling_per_term.csv')
+
+    def __init__(self, grades):
+        """
+        The constructor for a GeneratePrereqTables object.
+        :param grades: data frame read from student_grade_list_with_terms.csv
+        """
+        self.__builder = PrereqTableBuilder(grades)
+
+    def get_last_term(self):
+        """
+        Gets the latest term of the grade list the tables are made from.
+        :return: the term number
+        """
+        return self.__builder.get_last_term()
+
+    def create_data_frames(self, tree):
+        """
+        Creates the ROOT, IMMEDIATE and ALL tables for a postrequisite. Each has column headers of student id,
+        postrequisite course name, the selected prerequisite course names, cumulative gpa, previous term gpa, struggle,
+        and term difference.
+        :param tree: the head node of the postrequisite's prerequisite tree
+        :return: dictionary of tree type to data frame
+        """
+        return {tree_type: data_frame for tree_type, (data_frame, _) in self.create_tables(tree).items()}
+
+    def create_tables(self, tree):
+        """
+        Creates the same tables as create_data_frames, along with the earliest prerequisite term of each student.
+        :param tree: the head node of the postrequisite's prerequisite tree
+        :return: dictionary of tree type to (data frame, earliest terms)
+        """
+        tables = self.__builder.build_selections(tree.get_name(), prereq_selections(tree))
+        data_frames = {}
+        for tree_type in TREE_TYPES:
+            data_frame, _, earliest_terms = tables[tree_type]
+            data_frames[tree_type] = (self.__add_student_features(data_frame, earliest_terms), earliest_terms)
+        return data_frames
+
+    def __add_student_features(self, data_frame, earliest_terms):
+        """
+        Fills the cumulative gpa, previous term gpa and struggle columns from the term before the earliest
+        prerequisite each student took.
+        :param data_frame: table from the PrereqTableBuilder
+        :param earliest_terms: the earliest prerequisite term of each student in the table
+        :return: data_frame
+        """
+        student_ids = data_frame[self.__STUDENT_ID].values
+        data_frame[self.__CUMULATIVE_GPA] = TermLookup.load(self.__CUMULATIVE_GPA_FILEPATH).lookup(
+            student_ids, earliest_terms)
+        data_frame[self.__PREV_TERM_GPA] = TermLookup.load(self.__TERM_GPA_FILEPATH).lookup(
+            student_ids, earliest_terms)
+        struggle = TermLookup.load(self.__STRUGGLING_PER_TERM_FILEPATH).lookup(student_ids, earliest_terms)
+        data_frame[self.__STRUGGLE] = np.where(struggle == TermLookup.MISSING, struggle,
+                                               GradeCodec.encode_struggle(struggle).astype(object))
+        return data_frame
+
+
+def table_folder(output_folder, tree_type):
+    """
+    Gets the folder a tree type's tables are saved in, named the way Predict reads them.
+    :param output_folder: folder that holds one '<TREE TYPE>PrereqTables' folder per tree type
+    :param tree_type: ROOT, IMMEDIATE or ALL
+    :return: the folder path
+    """
+    return Path(output_folder) / (tree_type + 'PrereqTables')
+
+
+def prereq_selections(tree):
+    """
+    Gets the prerequisites each tree type's table is made from.
+    :param tree: the head node of the postrequisite's prerequisite tree
+    :return: dictionary of tree type to list of prerequisite course names
+    """
+    return {
+        'ROOT': [k.get_name() for k in tree.get_root_prereqs()],
+        'IMMEDIATE': [k.get_name() for k in tree.get_unique_immediate_prereqs()],
+        'ALL': [k.get_name() for k in tree.get_unique_all_prereqs()]
+    }
+
+
+def output_filename(course_name):
+    """
+    Gets the csv filename a course's table is saved under.
+    :param course_name: the postrequisite course name
+    :return: the filename
+    """
+    return "".join([c for c in course_name if c.isalpha() or c.isdigit() or c == ' ' or c == '-']).rstrip() + '.csv'
+
+
+def manifest_entry(data_frame, earliest_terms):
+    """
+    Records what fed a table: its courses, and the earliest prerequisite term and postrequisite term of each student.
+    :param data_frame: the table
+    :param earliest_terms: the earliest prerequisite term of each student in the table
+    :return: dictionary with 'courses' and 'rows' keys
+    """
+    postreq_terms = earliest_terms + data_frame['term_difference'].to_numpy(dtype=np.int64)
+    return {
+        'courses': list(data_frame.columns[1:-4]),
+        'rows': {str(student_id): [int(earliest_term), int(postreq_term)] for student_id, earliest_term, postreq_term
+                 in zip(data_frame['student_id'], earliest_terms, postreq_terms)}
+    }
+
+
+def init_worker(structure_filepath, grades_filepath, output_folder):
+    """
+    Loads the course structure and the grade list once for the process that calls it.
+    :param structure_filepath: filepath of the combined course structure
+    :param grades_filepath: filepath of the student grade list with terms
+    :param output_folder: folder that holds the parsed tree cache
+    """
+    global _tree_maker, _generator
+    _tree_maker = TreeMaker(str(structure_filepath), Path(output_folder) / TREE_CACHE_FOLDERNAME)
+    _generator = GeneratePrereqTables(pd.read_csv(grades_filepath).fillna(''))
+
+
+def write_tables(postreq_name, output_folder):
+    """
+    Creates and writes the ROOT, IMMEDIATE and ALL tables of one postrequisite. init_worker must have been called in
+    this process first.
+    :param postreq_name: the postrequisite course name
+    :param output_folder: folder that holds one '<TREE TYPE>PrereqTables' folder per tree type
+    :return: the postrequisite course name, the manifest entry of each tree type's table, and the last term of the
+    grade list
+    """
+    tree = _tree_maker.process(postreq_name)
+    entries = {}
+    for tree_type, (data_frame, earliest_terms) in _generator.create_tables(tree).items():
+        data_frame.to_csv(table_folder(output_folder, tree_type) / output_filename(tree.get_name()), index=False)
+        entries[tree_type] = manifest_entry(data_frame, earliest_terms)
+    return postreq_name, entries, _generator.get_last_term()
+
+
+def generate(structure_filepath, grades_filepath, output_folder, n_jobs=None):
+    """
+    Writes the tables of every postrequisite in the course structure, spread across a pool of processes.
+    :param structure_filepath: filepath of the combined course structure
+    :param grades_filepath: filepath of the student grade list with terms
+    :param output_folder: folder that holds one '<TREE TYPE>PrereqTables' folder per tree type
+    :param n_jobs: number of processes, defaults to the number of processors
+    """
+    for tree_type in TREE_TYPES:
+        if not os.path.exists(table_folder(output_folder, tree_type)):
+            os.makedirs(table_folder(output_folder, tree_type))
+
+    manifest = {'last_term': -1, 'tables': {tree_type: {} for tree_type in TREE_TYPES}}
+    postreqs = pd.read_csv(structure_filepath).fillna('')['postreq']
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=init_worker,
+                             initargs=(structure_filepath, grades_filepath, output_folder)) as executor:
+        for count, (postreq_name, entries, last_term) in enumerate(executor.map(write_tables, postreqs,
+                                                                                [output_folder] * len(postreqs))):
+            for tree_type in TREE_TYPES:
+                manifest['tables'][tree_type][output_filename(postreq_name)] = entries[tree_type]
+            manifest['last_term'] = last_term
+            print(str(count + 1) + ': ' + postreq_name)
+
+    write_manifest(manifest, output_folder)
+
+
+def write_manifest(manifest, output_folder):
+    """
+    Saves the manifest next to the tree type folders.
+    :param manifest: dictionary with the last term of the grade list and the entry of every table
+    :param output_folder: folder that holds one '<TREE TYPE>PrereqTables' folder per tree type
+    """
+    replace_file(Path(output_folder) / MANIFEST_FILENAME, lambda file: json.dump(manifest, file))
+
+
+def replace_file(filepath, write):
+    """
+    Writes a file through a temporary file next to it that then replaces it in one step, so a reader or a crash never
+    leaves a partly written file.
+    :param filepath: the file to write
+    :param write: function that writes the contents to the open temporary file
+    """
+    filepath = Path(filepath)
+    temporary_filepath = filepath.with_name(filepath.name + '.tmp' + str(os.getpid()))
+    with open(temporary_filepath, 'w', newline='') as temporary_file:
+        write(temporary_file)
+    os.replace(temporary_filepath, filepath)
+
+
+def grade_list_order(term_numbers):
+    """
+    Gets the order the attempts of the student grade list with terms are picked in. The list keeps one attempt per
+    student and course, the first in the order of Grades.csv's year and then semester name (fall, spring, summer,
+    winter), so a fall retake is kept over a spring or summer attempt of the same year. Term numbers go up by 10 for
+    each spring, summer and fall, and a winter term is 5 before its year's spring.
+    :param term_numbers: the term numbers of the attempts
+    :return: array of sort keys, the attempt with the smallest key is the one kept
+    """
+    shifted = np.asarray(term_numbers, dtype=np.int64) + 5
+    semester = shifted % 30
+    # the semesters in name order: fall, spring, summer and winter
+    rank = np.select([semester == 25, semester == 5, semester == 15], [0, 1, 2], 3)
+    return (shifted // 30) * 4 + rank
+
+
+def add_term_grades(grades, term_grades):
+    """
+    Adds grades from the long grade file to the grade list with terms. A student keeps one grade per course, the
+    attempt grade_list_order picks like the rest of the grade list, so a new attempt only replaces a cell when it comes
+    before the attempt already there. Students and courses that are new to the grade list get their own row or column.
+    :param grades: data frame read from student_grade_list_with_terms.csv
+    :param term_grades: rows of id_term_course_grade.csv to add
+    :return: the grade list with the grades added
+    """
+    term_grades = term_grades.assign(order=grade_list_order(term_grades[TERM_NUMBER]))
+    term_grades = term_grades.sort_values('order', kind='stable').drop_duplicates([STUDENT_ID, COURSE_NAME])
+    new_students = [student_id for student_id in term_grades[STUDENT_ID].unique()
+                    if student_id not in set(grades[STUDENT_ID])]
+    new_courses = [course for course in term_grades[COURSE_NAME].unique() if course not in grades.columns]
+    if new_students:
+        grades = pd.concat([grades, pd.DataFrame({STUDENT_ID: new_students})], ignore_index=True).fillna('')
+    grades = grades.reindex(columns=list(grades.columns) + new_courses, fill_value='')
+
+    rows = pd.Index(grades[STUDENT_ID]).get_indexer(term_grades[STUDENT_ID])
+    columns = grades.columns.get_indexer(term_grades[COURSE_NAME])
+    cells = grades.to_numpy(dtype=object)
+    current = pd.Series(cells[rows, columns], dtype=object)
+    current_terms = pd.to_numeric(current.str.split(',', n=1).str[0], errors='coerce').to_numpy()
+    # an empty cell, or a cell whose attempt comes after the new one, takes the new grade
+    replace = (current == '').to_numpy() | (~np.isnan(current_terms) & (
+            term_grades['order'].to_numpy() < grade_list_order(np.nan_to_num(current_terms))))
+    cells[rows[replace], columns[replace]] = (term_grades[TERM_NUMBER].astype(str) + ',' +
+                                              term_grades[GRADE]).values[replace]
+    return pd.DataFrame(cells, columns=grades.columns)
+
+
+def update(structure_filepath, grades_filepath, term_grades_filepath, output_folder):
+    """
+    Brings the tables written by generate up to date with the terms added to the long grade file since the manifest
+    was written. Only the students with a grade in a new term are rebuilt, and only in the tables that have the course
+    of one of those grades. Their old rows are replaced and the tables stay in grade list order, so the result is the
+    same as a full run. The new grades are added to the grade list with terms once the tables and the manifest are
+    written, and the per term gpa and struggle files must already have the new terms.
+    :param structure_filepath: filepath of the combined course structure
+    :param grades_filepath: filepath of the student grade list with terms
+    :param term_grades_filepath: filepath of the long grade file, one row per student, term and course
+    :param output_folder: folder that holds one '<TREE TYPE>PrereqTables' folder per tree type and the manifest
+    """
+    with open(Path(output_folder) / MANIFEST_FILENAME) as manifest_file:
+        manifest = json.load(manifest_file)
+
+    term_grades = pd.read_csv(term_grades_filepath)
+    new_term_grades = term_grades[term_grades[TERM_NUMBER] > manifest['last_term']]
+    if new_term_grades.empty:
+        print('No terms after ' + str(manifest['last_term']) + ' were found, the tables are up to date.')
+        return
+
+    grades = add_term_grades(pd.read_csv(grades_filepath).fillna(''), new_term_grades)
+
+    changed_students = new_term_grades[STUDENT_ID].unique()
+    changed_student_ids = set(str(student_id) for student_id in changed_students)
+    changed_courses = set(new_term_grades[COURSE_NAME])
+    student_order = pd.Index(grades[STUDENT_ID].astype(np.int64))
+    generator = GeneratePrereqTables(grades[grades[STUDENT_ID].isin(changed_students)])
+    tree_maker = TreeMaker(str(structure_filepath), Path(output_folder) / TREE_CACHE_FOLDERNAME)
+
+    for postreq_name in pd.read_csv(structure_filepath).fillna('')['postreq']:
+        filename = output_filename(postreq_name)
+        entries = [manifest['tables'][tree_type].get(filename) for tree_type in TREE_TYPES]
+        if None in entries:
+            print(postreq_name + ' is not in the manifest, run a full generation to create its tables.')
+            continue
+        if all(changed_courses.isdisjoint(entry['courses']) for entry in entries):
+            continue
+
+        for tree_type, (data_frame, earliest_terms) in generator.create_tables(tree_maker.process(postreq_name)).items():
+            table_filepath = table_folder(output_folder, tree_type) / filename
+            table = pd.read_csv(table_filepath, dtype=str, keep_default_na=False)
+            table = table[~table[STUDENT_ID].isin(changed_student_ids)].reindex(columns=data_frame.columns,
+                                                                               fill_value='')
+            table = pd.concat([table, data_frame], ignore_index=True)
+            order = np.argsort(student_order.get_indexer(table[STUDENT_ID].astype(np.int64)), kind='stable')
+            replace_file(table_filepath, lambda file: table.iloc[order].to_csv(file, index=False))
+
+            entry = manifest['tables'][tree_type][filename]
+            rows = {student_id: terms for student_id, terms in entry['rows'].items()
+                    if student_id not in changed_student_ids}
+            rows.update(manifest_entry(data_frame, earliest_terms)['rows'])
+            entry['courses'] = list(data_frame.columns[1:-4])
+            entry['rows'] = rows
+        print(postreq_name)
+
+    manifest['last_term'] = int(new_term_grades[TERM_NUMBER].max())
+    write_manifest(manifest, output_folder)
+    # the grade list is written last, so an update that stops part way is run again from the same grade list
+    replace_file(grades_filepath, lambda file: grades.to_csv(file, index=False))
+
+
+if __name__ == "__main__":
+    mode = int(input("Enter one of the following: \n"
+                     "'1': Generate all tables \n"
+                     "'2': Update the tables with new terms of grades \n"))
+
+    if mode == 1:
+        generate(__COMBINED_COURSE_STRUCTURE_FILEPATH, __STUDENT_GRADE_LIST_WITH_TERMS_FILEPATH, __OUTPUT_FOLDER)
+    elif mode == 2:
+        update(__COMBINED_COURSE_STRUCTURE_FILEPATH, __STUDENT_GRADE_LIST_WITH_TERMS_FILEPATH, __TERM_GRADES_FILEPATH,
+               __OUTPUT_FOLDER)
+    else:
+        raise ValueError('An invalid mode was passed. Must be \'1\' or \'2\'')
+    print("Done!")
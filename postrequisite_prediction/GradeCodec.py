@@ -0,0 +1,145 @@
+"""
+Conversions between letter grades, struggle letters and their numeric codes. Whole columns are converted at once: letters
+are turned into codes through a pandas categorical (one hash lookup per value) and codes are turned into letters or into
+another grade scale by indexing a numpy lookup table, instead of calling an if/elif chain on every value with apply.
+
+How to use: encode and decode convert arrays or columns, convert_grade and reverse_convert_grade convert single values
+for code that works one value at a time. The grade codes are F = 0 up to A = 10. rescale turns those codes into one of the
+coarser scales used by the Bayesian network code, picked by its number of grades the same way num_grades is there:
+11 for every grade, 5 for whole letter grades (F, D, C, B, A) and 2 for fail/pass, where D and above pass.
+"""
+
+import numpy as np
+import pandas as pd
+
+GRADE_SCALE = ('F', 'D', 'D+', 'C-', 'C', 'C+', 'B-', 'B', 'B+', 'A-', 'A')
+STRUGGLE_SCALE = ('E', 'S', 'G')
+GRADE_DTYPE = pd.CategoricalDtype(GRADE_SCALE, ordered=True)
+MISSING = -1
+
+ELEVEN_LEVEL = 11
+WHOLE_LETTER = 5
+PASS_FAIL = 2
+SCALE_LETTERS = {
+    ELEVEN_LEVEL: GRADE_SCALE,
+    WHOLE_LETTER: ('F', 'D', 'C', 'B', 'A'),
+    PASS_FAIL: ('F', 'P')
+}
+# code on each scale for each of the 11 grade codes
+__SCALE_CODES = {
+    ELEVEN_LEVEL: np.arange(11, dtype=np.int8),
+    WHOLE_LETTER: np.array([0, 1, 1, 2, 2, 2, 3, 3, 3, 4, 4], dtype=np.int8),
+    PASS_FAIL: np.array([0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1], dtype=np.int8)
+}
+__GRADE_CODES = {grade: code for code, grade in enumerate(GRADE_SCALE)}
+__STRUGGLE_CODES = {struggle: code + 1 for code, struggle in enumerate(STRUGGLE_SCALE)}
+
+
+def encode(letters, num_grades=ELEVEN_LEVEL, missing=MISSING):
+    """
+    Converts letter grades to grade codes.
+    :param letters: array or column of letter grades
+    :param num_grades: the scale of the returned codes, ELEVEN_LEVEL, WHOLE_LETTER or PASS_FAIL
+    :param missing: the code given to empty values and values that are not letter grades
+    :return: int8 numpy array of codes, float when missing is NaN
+    """
+    codes = pd.Categorical(np.asarray(letters, dtype=object), dtype=GRADE_DTYPE).codes
+    return __lookup(__SCALE_CODES[num_grades], codes, missing)
+
+
+def decode(codes, num_grades=ELEVEN_LEVEL, missing=np.NaN):
+    """
+    Converts codes to letter grades.
+    :param codes: array or column of codes on the given scale, may hold floats and NaN
+    :param num_grades: the scale of the codes, ELEVEN_LEVEL, WHOLE_LETTER or PASS_FAIL
+    :param missing: the value given to codes that are not on the scale
+    :return: object numpy array of letters
+    """
+    letters = np.array(SCALE_LETTERS[num_grades] + (missing,), dtype=object)
+    return letters[__to_index(codes, len(letters) - 1)]
+
+
+def rescale(codes, num_grades):
+    """
+    Converts 11 level grade codes to the codes of another scale.
+    :param codes: array of 11 level grade codes, MISSING for empty values
+    :param num_grades: the scale to convert to, ELEVEN_LEVEL, WHOLE_LETTER or PASS_FAIL
+    :return: int8 numpy array of codes, MISSING where the given code was not a grade
+    """
+    return __lookup(__SCALE_CODES[num_grades], __to_index(codes, len(GRADE_SCALE)), MISSING)
+
+
+def encode_struggle(letters, missing=MISSING):
+    """
+    Converts struggle letters (E, S, G) to their codes 1, 2 and 3.
+    :param letters: array or column of struggle letters
+    :param missing: the code given to values that are not struggle letters
+    :return: int8 numpy array of codes, float when missing is NaN
+    """
+    codes = pd.Categorical(np.asarray(letters, dtype=object), categories=STRUGGLE_SCALE).codes
+    return __lookup(np.arange(1, len(STRUGGLE_SCALE) + 1, dtype=np.int8), codes, missing)
+
+
+def convert_grade(string_grade, missing=None):
+    """
+    Converts a single letter grade into its code.
+    :param string_grade: the letter grade
+    :param missing: the value returned when string_grade is not a letter grade
+    :return: 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10
+    """
+    return __GRADE_CODES.get(string_grade, missing)
+
+
+def reverse_convert_grade(int_grade, missing=None):
+    """
+    Converts a single grade code into its letter grade.
+    :param int_grade: the grade code
+    :param missing: the value returned when int_grade is not a grade code
+    :return: A, A-, B+, B, B-, C+, C, C-, D+, D, F
+    """
+    return GRADE_SCALE[int(int_grade)] if int_grade in range(len(GRADE_SCALE)) else missing
+
+
+def convert_struggle(string_struggle, missing=None):
+    """
+    Converts a single struggle letter into its code.
+    :param string_struggle: E, S or G
+    :param missing: the value returned when string_struggle is not a struggle letter
+    :return: 1, 2, 3
+    """
+    return __STRUGGLE_CODES.get(string_struggle, missing)
+
+
+def reverse_convert_struggle(int_struggle, missing='?'):
+    """
+    Converts a single struggle code into its struggle letter.
+    :param int_struggle: 1, 2 or 3
+    :param missing: the value returned when int_struggle is not a struggle code
+    :return: E, S, G
+    """
+    return STRUGGLE_SCALE[int(int_struggle) - 1] if int_struggle in range(1, len(STRUGGLE_SCALE) + 1) else missing
+
+
+def __lookup(table, index, missing):
+    """
+    Looks up values in a table, giving missing where the index is -1.
+    :param table: numpy lookup table
+    :param index: numpy array of indexes into the table, -1 for missing values
+    :param missing: the value for -1 indexes
+    :return: numpy array of the values, float when missing is NaN
+    """
+    if isinstance(missing, float) and np.isnan(missing):
+        table = table.astype(np.float64)
+    return np.append(table, np.array(missing, dtype=table.dtype))[index]
+
+
+def __to_index(codes, missing_index):
+    """
+    Turns codes into table indexes, pointing codes that are NaN, fractional or out of range at missing_index.
+    :param codes: array or column of codes
+    :param missing_index: the index used for codes that are not on the table
+    :return: numpy integer array of indexes
+    """
+    codes = np.asarray(codes, dtype=np.float64)
+    valid = np.isfinite(codes) & (codes >= 0) & (codes < missing_index) & (codes == np.floor(codes))
+    return np.where(valid, np.nan_to_num(codes), missing_index).astype(np.intp)
@@ -0,0 +1,151 @@
+"""
+On disk student by course term and grade matrices that are opened as numpy memory maps, so a process reads only the
+course columns it slices instead of loading the whole grade list. The dense format keeps an int16 term matrix and an
+int8 grade matrix in column major order, so each course is one contiguous block of the file. The sparse format keeps
+only the grades that exist, grouped by course like a compressed sparse column matrix: the entries of course i are
+entries indptr[i] to indptr[i + 1] of the student, term and grade arrays.
+
+How to use: Write the matrices of one attempt of a GradeStore with GradeMatrices.save, then open the folder with
+GradeMatrices.open and call columns with the course names to read. Opening the same folder again in the same process
+returns the already opened matrices. Check with is_current that the matrices were written after the last change of the
+grade list before reading them. Run this file to write data/GradeMatrices from the student grade list with terms.
+
+Note: The sparse format is grouped by course instead of by student, since every reader slices courses. Dense is better
+when most students have taken most courses, sparse when each student has taken a small part of a large catalog.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from postrequisite_prediction.GradeStore import GradeStore
+
+__STUDENT_GRADE_LIST_WITH_TERMS_FILEPATH = Path('data/student_grade_list_with_terms.csv')
+__GRADE_MATRICES_FOLDER = Path('data/GradeMatrices/')
+
+
+class GradeMatrices:
+    __INFO_FILENAME = 'info.json'
+    __DENSE = 'dense'
+    __SPARSE = 'sparse'
+    __OPENED = {}
+    MISSING = GradeStore.MISSING
+
+    def __init__(self, folder):
+        """
+        The constructor for a GradeMatrices object. Opens the arrays in a folder written by save as read only memory
+        maps.
+        :param folder: the folder the matrices were saved in
+        """
+        folder = Path(folder)
+        with open(folder / self.__INFO_FILENAME) as info_file:
+            info = json.load(info_file)
+        self._format = info['format']
+        self._courses = info['courses']
+        self._course_index = {course: code for code, course in enumerate(self._courses)}
+        self._student_ids = np.load(folder / 'student_ids.npy')
+        self._last_term = info['last_term']
+        arrays = ['terms', 'grades'] if self._format == self.__DENSE else ['indptr', 'students', 'terms', 'grades']
+        self._arrays = {name: np.load(folder / (name + '.npy'), mmap_mode='r') for name in arrays}
+
+    @classmethod
+    def open(cls, folder):
+        """
+        Returns the matrices in a folder, opening them the first time the folder is asked for in this process.
+        :param folder: the folder the matrices were saved in
+        :return: the GradeMatrices
+        """
+        key = str(Path(folder).resolve())
+        if key not in cls.__OPENED:
+            cls.__OPENED[key] = cls(folder)
+        return cls.__OPENED[key]
+
+    @classmethod
+    def is_current(cls, folder, source):
+        """
+        Checks that the matrices in a folder were written after the grade file they are made from last changed, so
+        readers do not use the grades of before an update of the grade list.
+        :param folder: the folder the matrices were saved in
+        :param source: the grade file the matrices are made from, the student grade list with terms
+        :return: True when the source is missing or not newer than the matrices, False otherwise
+        """
+        if not Path(source).exists():
+            return True
+        return (Path(folder) / cls.__INFO_FILENAME).stat().st_mtime_ns >= Path(source).stat().st_mtime_ns
+
+    @classmethod
+    def save(cls, store, folder, attempt=0, sparse=False):
+        """
+        Writes the term and grade matrices of one attempt of a GradeStore straight from its entries, without making
+        the wide matrices in memory. The dense matrices are filled in their memory mapped files.
+        :param store: the GradeStore
+        :param folder: the folder to write to, created if it does not exist
+        :param attempt: 0 for the first time each course was taken, 1 for the first retake, and so on
+        :param sparse: True to write the sparse format, False for the dense format
+        """
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        student, course, term, grade = store.entries(attempt)
+        np.save(folder / 'student_ids.npy', np.asarray(store.get_student_ids()))
+        if sparse:
+            indptr = np.searchsorted(course, np.arange(len(store.get_courses()) + 1))
+            np.save(folder / 'indptr.npy', indptr.astype(np.int64))
+            np.save(folder / 'students.npy', student.astype(np.int32))
+            np.save(folder / 'terms.npy', term.astype(np.int16))
+            np.save(folder / 'grades.npy', grade)
+        else:
+            shape = (len(store.get_student_ids()), len(store.get_courses()))
+            for name, values, dtype in [('terms', term, np.int16), ('grades', grade, np.int8)]:
+                matrix = np.lib.format.open_memmap(folder / (name + '.npy'), mode='w+', dtype=dtype, shape=shape,
+                                                   fortran_order=True)
+                matrix[:] = cls.MISSING
+                matrix[student, course] = values
+                matrix.flush()
+                del matrix
+        info = {'format': cls.__SPARSE if sparse else cls.__DENSE, 'courses': list(store.get_courses()),
+                'last_term': int(term.max(initial=cls.MISSING))}
+        with open(folder / cls.__INFO_FILENAME, 'w') as info_file:
+            json.dump(info, info_file)
+        cls.__OPENED.pop(str(folder.resolve()), None)
+
+    def get_student_ids(self):
+        return self._student_ids
+
+    def get_courses(self):
+        return self._courses
+
+    def has_course(self, course):
+        return course in self._course_index
+
+    def get_last_term(self):
+        return self._last_term
+
+    def columns(self, courses):
+        """
+        Reads the term and grade columns of some courses, touching only the parts of the files that hold them.
+        :param courses: list of course names
+        :return: int32 term matrix and int8 grade matrix with one row per student and one column per given course,
+        MISSING where the student has not taken the course
+        """
+        codes = [self._course_index[course] for course in courses]
+        if self._format == self.__DENSE:
+            return (self._arrays['terms'][:, codes].astype(np.int32),
+                    np.array(self._arrays['grades'][:, codes], dtype=np.int8))
+
+        terms = np.full((len(self._student_ids), len(codes)), self.MISSING, dtype=np.int32)
+        grades = np.full((len(self._student_ids), len(codes)), self.MISSING, dtype=np.int8)
+        indptr = self._arrays['indptr']
+        for position, code in enumerate(codes):
+            start, end = indptr[code], indptr[code + 1]
+            students = self._arrays['students'][start:end]
+            terms[students, position] = self._arrays['terms'][start:end]
+            grades[students, position] = self._arrays['grades'][start:end]
+        return terms, grades
+
+
+if __name__ == "__main__":
+    sparse = input("Enter one of the following for the matrix format: \n '1': Dense \n '2': Sparse \n") == '2'
+    GradeMatrices.save(GradeStore.read_grade_list(__STUDENT_GRADE_LIST_WITH_TERMS_FILEPATH), __GRADE_MATRICES_FOLDER,
+                       sparse=sparse)
+    print("Done!")
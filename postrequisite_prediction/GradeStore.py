@@ -0,0 +1,268 @@
+"""
+Typed columnar store of student grades. Every grade is one entry of a set of parallel numpy arrays: an integer student
+code, an integer course code, the term number, an int8 grade code and the attempt (0 for the first time the student took
+the course, 1 for the first retake, and so on). The entries are kept sorted by course, student and term, so the entries
+of one course are a slice of the arrays, and the wide student by course matrices of any attempt are made with a single
+scatter instead of parsing "term,grade" strings.
+
+How to use: Build a store from the long grade log (from_long, with the columns of id_term_course_grade.csv) or from the
+student grade list with terms (from_grade_list, one "term,grade" cell per student and course, or read_grade_list to
+read the file in chunks). Save it with save and open it again with GradeStore.load, which returns the already opened
+store when the same file is loaded again in the same process. Run this file to build data/grade_store.npz from
+../Data/id_term_course_grade.csv.
+
+Note: Grade codes are the GradeCodec codes, F is 0 and A is 10. Grades outside the scale are kept as entries with the
+MISSING grade code.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from postrequisite_prediction import GradeCodec
+
+__TERM_GRADES_FILEPATH = Path('../Data/id_term_course_grade.csv')
+__GRADE_STORE_FILEPATH = Path('data/grade_store.npz')
+
+
+class GradeStore:
+    __STUDENT_ID = 'student_id'
+    __TERM_NUMBER = 'term_number'
+    __COURSE_NAME = 'course name'
+    __GRADE = 'grade'
+    __ATTEMPT = 'attempt'
+    __LOADED = {}
+    GRADE_SCALE = GradeCodec.GRADE_SCALE
+    MISSING = GradeCodec.MISSING
+
+    def __init__(self, student_ids, courses, student, course, term, grade):
+        """
+        The constructor for a GradeStore object. The entries may be in any order, entries of the same student and
+        course are numbered into attempts by term, and by their given order within a term.
+        :param student_ids: array of the student ids, the student codes index into it
+        :param courses: list of the course names, the course codes index into it
+        :param student: array of the student code of each entry
+        :param course: array of the course code of each entry
+        :param term: array of the term number of each entry
+        :param grade: array of the grade code of each entry
+        """
+        self._student_ids = np.asarray(student_ids)
+        self._courses = list(courses)
+        self._course_index = {name: code for code, name in enumerate(self._courses)}
+
+        order = np.lexsort((np.arange(len(student)), term, student, course))
+        self._student = np.asarray(student, dtype=np.int32)[order]
+        self._course = np.asarray(course, dtype=np.int32)[order]
+        self._term = np.asarray(term, dtype=np.int32)[order]
+        self._grade = np.asarray(grade, dtype=np.int8)[order]
+
+        positions = np.arange(len(order))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (self._course[1:] != self._course[:-1]) | (self._student[1:] != self._student[:-1])
+        self._attempt = (positions - np.maximum.accumulate(np.where(first, positions, 0))).astype(np.int8)
+        self._course_offsets = np.searchsorted(self._course, np.arange(len(self._courses) + 1))
+        self.__wide = {}
+
+    @classmethod
+    def from_long(cls, data_frame):
+        """
+        Builds a store from a long grade log with one row per grade.
+        :param data_frame: data frame with the student_id, term_number, course name and grade columns
+        :return: the GradeStore, with the student ids and course names sorted
+        """
+        student, student_ids = pd.factorize(data_frame[cls.__STUDENT_ID], sort=True)
+        course, courses = pd.factorize(data_frame[cls.__COURSE_NAME], sort=True)
+        return cls(np.asarray(student_ids), courses, student, course, data_frame[cls.__TERM_NUMBER].values,
+                   cls.encode(data_frame[cls.__GRADE].values))
+
+    @classmethod
+    def from_grade_list(cls, data_frame):
+        """
+        Builds a store from a wide grade list, where every cell other than the student id is either empty or a
+        "term,grade" string.
+        :param data_frame: data frame read from student_grade_list_with_terms.csv
+        :return: the GradeStore, with the students and courses in the order of the grade list
+        """
+        courses = [course for course in data_frame.columns if course != cls.__STUDENT_ID]
+        student, course, term, grade = cls.__grade_list_entries(data_frame, courses)
+        return cls(data_frame[cls.__STUDENT_ID].values, courses, student, course, term, grade)
+
+    @classmethod
+    def read_grade_list(cls, filepath, chunk_rows=10000):
+        """
+        Builds a store from a student grade list with terms file like from_grade_list, reading the file a chunk of rows
+        at a time with the grade cells read as strings, so only the entries and one chunk of the wide grade list are
+        in memory at once.
+        :param filepath: the student grade list with terms csv
+        :param chunk_rows: the number of students read at a time
+        :return: the GradeStore, with the students and courses in the order of the grade list
+        """
+        courses = [course for course in pd.read_csv(filepath, nrows=0).columns if course != cls.__STUDENT_ID]
+        student_ids = []
+        entries = [[np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32),
+                    np.empty(0, dtype=np.int8)]]
+        number_read = 0
+        for chunk in pd.read_csv(filepath, dtype={course: str for course in courses}, chunksize=chunk_rows):
+            student, course, term, grade = cls.__grade_list_entries(chunk, courses)
+            entries.append([student + number_read, course, term, grade])
+            student_ids.append(chunk[cls.__STUDENT_ID].values)
+            number_read += len(chunk)
+        student, course, term, grade = (np.concatenate(arrays) for arrays in zip(*entries))
+        return cls(np.concatenate(student_ids) if student_ids else np.empty(0, dtype=np.int64), courses, student,
+                   course, term, grade)
+
+    @classmethod
+    def __grade_list_entries(cls, data_frame, courses):
+        """
+        Gets the entries of the "term,grade" cells of a wide grade list.
+        :return: student row, course position, term and grade code arrays of the cells that are not empty
+        """
+        cells = data_frame[courses].to_numpy(dtype=object)
+        taken = pd.notna(cells) & (cells != '')
+        student, course = np.nonzero(taken)
+        term = np.empty(0, dtype=np.int32)
+        grade = np.empty(0, dtype=np.int8)
+        if taken.any():
+            term_and_grade = pd.Series(cells[taken], dtype=object).str.split(',', n=1, expand=True)
+            term = term_and_grade[0].astype(np.int32).values
+            grade = cls.encode(term_and_grade[1].values)
+        return student, course, term, grade
+
+    @classmethod
+    def load(cls, filepath):
+        """
+        Opens a store written by save, reading the file only the first time it is asked for in this process.
+        :param filepath: the .npz file
+        :return: the GradeStore
+        """
+        if filepath not in cls.__LOADED:
+            with np.load(filepath, allow_pickle=False) as arrays:
+                cls.__LOADED[filepath] = cls(arrays['student_ids'], arrays['courses'].tolist(), arrays['student'],
+                                             arrays['course'], arrays['term'], arrays['grade'])
+        return cls.__LOADED[filepath]
+
+    def save(self, filepath):
+        """
+        Writes the store to a compressed .npz file.
+        :param filepath: the .npz file
+        """
+        np.savez_compressed(filepath, student_ids=self._student_ids, courses=np.array(self._courses, dtype=str),
+                            student=self._student, course=self._course, term=self._term, grade=self._grade)
+
+    @classmethod
+    def encode(cls, letters):
+        """
+        Converts letter grades to grade codes.
+        :param letters: array of letter grades
+        :return: int8 numpy array of grade codes, MISSING for grades outside GRADE_SCALE
+        """
+        return GradeCodec.encode(letters)
+
+    @classmethod
+    def decode(cls, codes):
+        """
+        Converts grade codes to letter grades.
+        :param codes: array of grade codes
+        :return: object numpy array of letter grades, NaN for MISSING
+        """
+        return GradeCodec.decode(codes)
+
+    def get_student_ids(self):
+        return self._student_ids
+
+    def get_courses(self):
+        return self._courses
+
+    def has_course(self, course):
+        return course in self._course_index
+
+    def get_course_code(self, course):
+        return self._course_index[course]
+
+    def get_last_term(self):
+        """
+        Gets the latest term that any grade in the store was earned in.
+        :return: the term number, MISSING if the store is empty
+        """
+        return int(self._term.max(initial=self.MISSING))
+
+    def course(self, course):
+        """
+        Gets the entries of one course. The arrays are views into the store and should not be modified.
+        :param course: the course name
+        :return: dictionary of the student ids, terms, grade codes and attempts of the course's entries
+        """
+        code = self._course_index[course]
+        start, end = self._course_offsets[code], self._course_offsets[code + 1]
+        return {self.__STUDENT_ID: self._student_ids[self._student[start:end]],
+                self.__TERM_NUMBER: self._term[start:end], self.__GRADE: self._grade[start:end],
+                self.__ATTEMPT: self._attempt[start:end]}
+
+    def long(self):
+        """
+        Gets every entry as a long data frame, sorted by course, student and term.
+        :return: data frame with the student_id, term_number, course name, grade and attempt columns
+        """
+        return pd.DataFrame({
+            self.__STUDENT_ID: self._student_ids[self._student],
+            self.__TERM_NUMBER: self._term,
+            self.__COURSE_NAME: pd.Categorical.from_codes(self._course, categories=self._courses),
+            self.__GRADE: pd.Categorical.from_codes(self._grade, categories=self.GRADE_SCALE),
+            self.__ATTEMPT: self._attempt
+        })
+
+    def entries(self, attempt=0):
+        """
+        Gets the entries of one attempt as code arrays, sorted by course and then student, without making the wide
+        matrices.
+        :param attempt: 0 for the first time each course was taken, 1 for the first retake, and so on
+        :return: int32 student code, int32 course code, int32 term and int8 grade code arrays
+        """
+        selected = self._attempt == attempt
+        return self._student[selected], self._course[selected], self._term[selected], self._grade[selected]
+
+    def wide(self, attempt=0):
+        """
+        Gets the student by course term and grade matrices of one attempt. The matrices are made the first time an
+        attempt is asked for and shared after that, they should not be modified.
+        :param attempt: 0 for the first time each course was taken, 1 for the first retake, and so on
+        :return: int32 term matrix and int8 grade code matrix, MISSING where the student has no such attempt
+        """
+        if attempt not in self.__wide:
+            shape = (len(self._student_ids), len(self._courses))
+            terms = np.full(shape, self.MISSING, dtype=np.int32)
+            grades = np.full(shape, self.MISSING, dtype=np.int8)
+            selected = self._attempt == attempt
+            terms[self._student[selected], self._course[selected]] = self._term[selected]
+            grades[self._student[selected], self._course[selected]] = self._grade[selected]
+            self.__wide[attempt] = (terms, grades)
+        return self.__wide[attempt]
+
+    def columns(self, courses, attempt=0):
+        """
+        Gets the term and grade columns of some courses from the wide matrices of one attempt.
+        :param courses: list of course names
+        :param attempt: 0 for the first time each course was taken, 1 for the first retake, and so on
+        :return: int32 term matrix and int8 grade matrix with one row per student and one column per given course
+        """
+        terms, grades = self.wide(attempt)
+        codes = [self._course_index[course] for course in courses]
+        return terms[:, codes], grades[:, codes]
+
+    def wide_letters(self, attempt=0):
+        """
+        Gets the letter grades of one attempt as a data frame in the layout of the student grade list.
+        :param attempt: 0 for the first time each course was taken, 1 for the first retake, and so on
+        :return: data frame with a student_id column and one column of letter grades per course, NaN where the
+        student has no such attempt
+        """
+        _, grades = self.wide(attempt)
+        data_frame = pd.DataFrame(self.decode(grades.ravel()).reshape(grades.shape), columns=self._courses)
+        data_frame.insert(0, self.__STUDENT_ID, self._student_ids)
+        return data_frame
+
+
+if __name__ == "__main__":
+    GradeStore.from_long(pd.read_csv(__TERM_GRADES_FILEPATH)).save(__GRADE_STORE_FILEPATH)
+    print("Done!")
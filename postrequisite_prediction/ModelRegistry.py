@@ -0,0 +1,183 @@
+"""
+Registry of the fitted postreq models of one model type and tree type. Every model is stored as a compressed joblib
+artifact next to a JSON manifest that records what is needed to use and trust it: the feature columns in the order the
+model expects them, the model parameters, the cross validation metrics of its model type, a fingerprint of the data it
+was fit on, the sklearn version it was fit with, and a version number that goes up each time the course's model is
+saved again. Older artifacts are kept, the manifest points at the current one.
+
+How to use: Save models with ModelRegistry.save (Predict's save_models does this for a whole folder). Open a folder
+with ModelRegistry.open, which only reads the manifests, and call get_model with a course name to load that course's
+model the first time it is asked for. Opening the same folder again in the same process returns the same registry, so
+models that were already loaded are not loaded again.
+
+Note: A model that was fit with another sklearn version is still loaded, with a warning, as unpickling across versions
+is not guaranteed to work.
+"""
+
+import hashlib
+import json
+import os
+import time
+import warnings
+from pathlib import Path
+
+import joblib
+import numpy as np
+import sklearn
+
+MANIFEST_SUFFIX = '.json'
+ARTIFACT_SUFFIX = '.joblib'
+
+
+class ModelRegistry:
+    __COMPRESSION = 3
+    __OPENED = {}
+
+    def __init__(self, folder):
+        """
+        The constructor for a ModelRegistry object. Reads the manifest of every model in the folder, the models
+        themselves are loaded by get_model.
+        :param folder: the folder the models were saved in
+        """
+        self._folder = Path(folder)
+        self._manifests = {}
+        self._models = {}
+        if self._folder.exists():
+            for manifest_filepath in sorted(self._folder.glob('*' + MANIFEST_SUFFIX)):
+                with open(manifest_filepath) as manifest_file:
+                    manifest = json.load(manifest_file)
+                self._manifests[manifest['course']] = manifest
+
+    @classmethod
+    def open(cls, folder):
+        """
+        Returns the registry in a folder, reading its manifests the first time the folder is asked for in this process.
+        :param folder: the folder the models were saved in
+        :return: the ModelRegistry
+        """
+        key = str(Path(folder).resolve())
+        if key not in cls.__OPENED:
+            cls.__OPENED[key] = cls(folder)
+        return cls.__OPENED[key]
+
+    @classmethod
+    def save(cls, folder, course, model, columns, x, y, metrics=None, **details):
+        """
+        Writes a fitted model and its manifest, as the next version of the course's model.
+        :param folder: the folder of the registry, created if it does not exist
+        :param course: the postreq course name, also the file name of the model
+        :param model: the fitted model
+        :param columns: the names of the feature columns of x
+        :param x: the feature matrix the model was fit on
+        :param y: the labels the model was fit on
+        :param metrics: optional dictionary of the cross validation metrics of the model type on the course
+        :param details: other values to record in the manifest, such as the model type and tree type
+        :return: the manifest
+        """
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        manifest_filepath = folder / (course + MANIFEST_SUFFIX)
+        version = 1
+        if manifest_filepath.exists():
+            with open(manifest_filepath) as manifest_file:
+                version = json.load(manifest_file)['version'] + 1
+
+        artifact = course + '_v' + str(version) + ARTIFACT_SUFFIX
+        cls.__replace(folder / artifact, lambda filepath: joblib.dump(model, filepath, compress=cls.__COMPRESSION))
+        manifest = cls.__to_json(dict(details, **{
+            'course': course,
+            'version': version,
+            'artifact': artifact,
+            'columns': list(columns),
+            'params': model.get_params(),
+            'classes': getattr(model, 'classes_', None),
+            'metrics': metrics or {},
+            'n_samples': len(y),
+            'data_fingerprint': cls.fingerprint(x, y),
+            'sklearn_version': sklearn.__version__,
+            'saved': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }))
+
+        def write_manifest(filepath):
+            with open(filepath, 'w') as manifest_file:
+                json.dump(manifest, manifest_file, indent=1)
+        cls.__replace(manifest_filepath, write_manifest)
+        cls.__OPENED.pop(str(folder.resolve()), None)
+        return manifest
+
+    @staticmethod
+    def fingerprint(x, y):
+        """
+        Hashes a feature matrix and labels, so a model can be matched to the data it was fit on.
+        :param x: the feature matrix
+        :param y: the labels
+        :return: hex sha256 of the shapes and float64 values of x and y
+        """
+        data_hash = hashlib.sha256()
+        for array in (np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)):
+            data_hash.update(str(array.shape).encode())
+            data_hash.update(np.ascontiguousarray(array).tobytes())
+        return data_hash.hexdigest()
+
+    def get_folder(self):
+        return self._folder
+
+    def get_courses(self):
+        return list(self._manifests)
+
+    def has_course(self, course):
+        return course in self._manifests
+
+    def get_manifest(self, course):
+        return self._manifests[course]
+
+    def get_columns(self, course):
+        return self._manifests[course]['columns']
+
+    def get_model(self, course):
+        """
+        Gets the model of a course, loading it the first time it is asked for.
+        :param course: the postreq course name
+        :return: the fitted model
+        """
+        if course not in self._models:
+            self._models[course] = self.load_model(course)
+        return self._models[course]
+
+    def load_model(self, course):
+        """
+        Loads the model of a course from its artifact without keeping it in the registry, for callers that keep their
+        own cache of models.
+        :param course: the postreq course name
+        :return: the fitted model
+        """
+        manifest = self._manifests[course]
+        if manifest['sklearn_version'] != sklearn.__version__:
+            warnings.warn('The model of ' + course + ' was saved with sklearn ' + manifest['sklearn_version']
+                          + ' and is loaded with sklearn ' + sklearn.__version__ + '.')
+        return joblib.load(self._folder / manifest['artifact'])
+
+    @staticmethod
+    def __replace(filepath, write):
+        """
+        Writes a file through a temporary file that then replaces it, so a reader never sees a partly written file.
+        """
+        temporary_filepath = filepath.with_name(filepath.name + '.tmp' + str(os.getpid()))
+        write(temporary_filepath)
+        os.replace(temporary_filepath, filepath)
+
+    @classmethod
+    def __to_json(cls, value):
+        """
+        Converts numpy values and containers of them to plain JSON values, and anything else JSON has no value for,
+        such as an estimator parameter, to its repr.
+        """
+        if isinstance(value, dict):
+            return {str(key): cls.__to_json(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple, np.ndarray)):
+            return [cls.__to_json(item) for item in value]
+        if isinstance(value, np.generic):
+            return value.item()
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        return repr(value)
@@ -15,6 +15,7 @@ from pathlib import Path
 from numpy.random import RandomState
 from joblib import Parallel, delayed
 from itertools import combinations
+from postrequisite_prediction import GradeCodec
 
 if not sys.warnoptions:
     warnings.simplefilter("ignore")
@@ -39,31 +40,6 @@ __tree_type = 0
 np.random.seed(__RANDOM_SEED)
 
 
-def convert_grade(string_grade):
-    if string_grade == 'A':
-        return 10
-    elif string_grade == 'A-':
-        return 9
-    elif string_grade == 'B+':
-        return 8
-    elif string_grade == 'B':
-        return 7
-    elif string_grade == 'B-':
-        return 6
-    elif string_grade == 'C+':
-        return 5
-    elif string_grade == 'C':
-        return 4
-    elif string_grade == 'C-':
-        return 3
-    elif string_grade == 'D+':
-        return 2
-    elif string_grade == 'D':
-        return 1
-    elif string_grade == 'F':
-        return 0
-
-
 def set_paths():
     results_folder1 = Path('results/' + __tree_type.name + 'Prereq_' + __model_enumA.name + '_Results/')
     results_folder2 = Path('results/' + __tree_type.name + 'Prereq_' + __model_enumB.name + '_Results/')
@@ -78,12 +54,12 @@ def get_pval():
                                                   + __model_enumA.name + '.csv'))
     results_B = pd.read_csv(__results_folder_B / ('ALL_COURSES_PREDICTIONS_' + __tree_type.name + "_"
                                                   + __model_enumB.name + '.csv'))
-    results_A['actual'] = results_A['actual'].apply(convert_grade)
-    results_A['predicted'] = results_A['predicted'].apply(convert_grade)
+    results_A['actual'] = GradeCodec.encode(results_A['actual'], missing=np.NaN)
+    results_A['predicted'] = GradeCodec.encode(results_A['predicted'], missing=np.NaN)
     results_A['diff^2'] = (results_A['actual'] - results_A['predicted']) ** 2
 
-    results_B['actual'] = results_B['actual'].apply(convert_grade)
-    results_B['predicted'] = results_B['predicted'].apply(convert_grade)
+    results_B['actual'] = GradeCodec.encode(results_B['actual'], missing=np.NaN)
+    results_B['predicted'] = GradeCodec.encode(results_B['predicted'], missing=np.NaN)
     results_B['diff^2'] = (results_B['actual'] - results_B['predicted']) ** 2
 
     nrmses_a = np.sqrt(results_A.groupby('student_id').sum()['diff^2'] / results_A.groupby('student_id').size()) / 10
@@ -2,49 +2,66 @@
 ___authors___: Austin FitzGerald, Chris Kott
 """
 
+import argparse
 import os
 import sys
 
 import pandas as pd
 import numpy as np
 import enum
+import importlib
 from sklearn import metrics
 from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor, RandomForestRegressor
 from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import StratifiedKFold, GridSearchCV, RandomizedSearchCV
+from sklearn.base import clone, is_classifier
+from sklearn.model_selection import StratifiedKFold, GridSearchCV, ParameterSampler
 from sklearn.dummy import DummyRegressor, DummyClassifier
 from sklearn.svm import NuSVR
 import warnings
 import time
+from functools import lru_cache
 from pathlib import Path
 from joblib import Parallel, delayed, parallel_backend
 import pickle
 from scipy.stats import loguniform
 from sklearn.utils import column_or_1d
+from postrequisite_prediction import GradeCodec
+from postrequisite_prediction.FoldCache import FOLD_CACHE_FILENAME, FoldCache
+from postrequisite_prediction.GeneratePrereqTables import TREE_CACHE_FOLDERNAME, output_filename, prereq_selections
+from postrequisite_prediction.GradeMatrices import GradeMatrices
+from postrequisite_prediction.ModelRegistry import ModelRegistry
+from postrequisite_prediction.PredictJob import MODEL_TYPES_ENUM, NUMBER_FOLDS, RANDOM_SEED, TREE_TYPES_ENUM, PredictJob
+from postrequisite_prediction.PrereqTableBuilder import PrereqTableBuilder
+from postrequisite_prediction.PrereqTableCache import PrereqTableCache
+from postrequisite_prediction.TreeScripts.TreeMaker import TreeMaker
+from postrequisite_prediction.TuningLog import LOG_SUFFIX, TuningLog
 
 if not sys.warnoptions:
     warnings.simplefilter("ignore")
     os.environ["PYTHONWARNINGS"] = "ignore"  # Also affect subprocesses
 
-__data_folder = Path()
-__folds_folder = Path()
-__results_folder = Path()
-__tuning_results_folder = Path()
-__model_output = Path()
-
-__model_enum = 0
-__tree_type = 0
-
+__COMBINED_COURSE_STRUCTURE_FILEPATH = Path('../Data/combined_course_structure.csv')
+__GRADE_MATRICES_FOLDER = Path('data/GradeMatrices/')
+__STUDENT_GRADE_LIST_WITH_TERMS_FILEPATH = Path('data/student_grade_list_with_terms.csv')
+__TREE_CACHE_FOLDER = Path('data/' + TREE_CACHE_FOLDERNAME)
 __TRAIN_PREFIX = 'train_'
 __TEST_PREFIX = 'test_'
-__NUMBER_FOLDS = 5
-__RANDOM_SEED = np.int64(313131)
+__JOBS_FOLDERNAME = 'jobs'
+__EXPORT_FOLD_CSVS = False  # also write every fold as train/test csv files next to the fold cache
 __MIN_SAMPLES_FOR_PREDICTING = 25
-__MODEL_TYPES_ENUM = enum.IntEnum('__MODEL_TYPES_ENUM', 'LOGISTIC_REGRESSION GBT_CLASSIFIER NU_SVR GBT_REGRESSOR '
-                                                        'RANDOM_FOREST_REGRESSOR MOD_ZEROR MEAN_ZEROR')
-__TREE_TYPES_ENUM = enum.IntEnum('__TREE_TYPES_ENUM', 'ROOT IMMEDIATE ALL')
-
-np.random.seed(__RANDOM_SEED)
+__TUNING_METHODS_ENUM = enum.IntEnum('__TUNING_METHODS_ENUM', 'RANDOM SUCCESSIVE_HALVING')
+# how hyperparameter_tuning tunes each model type, the boosted and random forest models are tuned by successive halving
+# on their number of estimators
+__TUNING_METHODS = {
+    MODEL_TYPES_ENUM.LOGISTIC_REGRESSION: __TUNING_METHODS_ENUM.RANDOM,
+    MODEL_TYPES_ENUM.GBT_CLASSIFIER: __TUNING_METHODS_ENUM.SUCCESSIVE_HALVING,
+    MODEL_TYPES_ENUM.NU_SVR: __TUNING_METHODS_ENUM.RANDOM,
+    MODEL_TYPES_ENUM.GBT_REGRESSOR: __TUNING_METHODS_ENUM.SUCCESSIVE_HALVING,
+    MODEL_TYPES_ENUM.RANDOM_FOREST_REGRESSOR: __TUNING_METHODS_ENUM.SUCCESSIVE_HALVING
+}
+__HALVING_FACTOR = 3
+
+np.random.seed(RANDOM_SEED)
 
 flatten = lambda l: [item for sublist in l for item in
                      sublist]  # https://stackoverflow.com/questions/952914/how-to-make-a-flat-list-out-of-list-of-lists
@@ -62,20 +79,31 @@ def round_school(x):
 
 
 def rounding_rmse_scorer(y, y_pred):
-    return -metrics.mean_squared_error(y, [round_school(num) for num in y_pred], squared=False)
-
-
-def set_paths():
-    data_folder = Path('data/' + __tree_type.name + 'PrereqTables/')
-    folds_output = Path('data/' + __tree_type.name + 'PrereqFolds/')
-    results_folder = Path('results/' + __tree_type.name + 'Prereq_' + __model_enum.name + '_Results/')
-    tuning_results_folder = Path('TuningResults/' + __tree_type.name + '/' + __model_enum.name + '/')
-    model_output = Path('models/' + __model_enum.name + '_model_' + __tree_type.name + '/')
-    return data_folder, folds_output, results_folder, tuning_results_folder, model_output
+    return -np.sqrt(metrics.mean_squared_error(y, [round_school(num) for num in y_pred]))
+
+
+# Gets the x, y and ids of a postreq's prereq table from the process's table cache, so the models of a batch run share
+# one parsed copy of each table. The table is read from its csv, or built from the grade matrices when the job has a
+# grade matrices folder, and made again when the files it comes from change. Grade matrices that are older than the
+# student grade list (for example after an update of the prereq tables) are refused instead of read.
+def get_prereq_table(job, filename):
+    matrices_folder = job.get_grade_matrices_folder()
+    if matrices_folder is not None:
+        if not GradeMatrices.is_current(matrices_folder, __STUDENT_GRADE_LIST_WITH_TERMS_FILEPATH):
+            raise ValueError('The grade matrices in ' + str(matrices_folder) + ' are older than '
+                             + str(__STUDENT_GRADE_LIST_WITH_TERMS_FILEPATH)
+                             + ', write them again with GradeMatrices.py')
+        sources = sorted(matrices_folder.iterdir()) + [__COMBINED_COURSE_STRUCTURE_FILEPATH]
+        make_table = lambda: get_prereq_table_from_matrices(job, filename)
+    else:
+        sources = [job.get_data_folder() / filename]
+        make_table = lambda: read_prereq_table(job, filename)
+    return PrereqTableCache.open(job.get_table_cache_folder()).get(job.get_tree_type().name, filename[:-4], sources,
+                                                                    make_table)
 
 
-def get_prereq_table(filename):
-    file = pd.read_csv(__data_folder / filename)
+def read_prereq_table(job, filename):
+    file = pd.read_csv(job.get_data_folder() / filename)
     y = file.iloc[:, 1]
     ids = file['student_id']
     x = file.drop([file.columns[1], file.columns[0]], axis=1)  # drop the postreq grade and student_id columns
@@ -85,36 +113,74 @@ def get_prereq_table(filename):
     return x, y, ids
 
 
+# Builds the same x, y and ids as the prereq table csv from the memory mapped grade matrices, reading only the columns
+# of the postreq and its prereqs. Used for jobs with a grade matrices folder (see GradeMatrices.py).
+def get_prereq_table_from_matrices(job, filename):
+    postreq_names, tree_maker = course_structure(*structure_stamp())
+    tree = tree_maker.process(postreq_names[filename])
+    builder = prereq_table_builder(str(job.get_grade_matrices_folder().resolve()))
+    file, _, _ = builder.build(tree.get_name(), prereq_selections(tree)[job.get_tree_type().name])
+    # same dtypes as reading the csv, ints for the columns without blanks and floats for the rest, objects when empty
+    file = file.iloc[:, :-4]
+    if file.empty:
+        file = file.astype(object).set_axis(pd.Index([], dtype=object), axis=0)
+    else:
+        file = file.apply(lambda column: column.astype(np.int64) if column.notna().all() else column.astype(np.float64))
+    return file.iloc[:, 2:], file.iloc[:, 1], file['student_id']
+
+
+# The modification time in nanoseconds and the size of the course structure file, so course_structure reads it again
+# when it changes.
+def structure_stamp():
+    status = os.stat(__COMBINED_COURSE_STRUCTURE_FILEPATH)
+    return status.st_mtime_ns, status.st_size
+
+
+# The postreq names by prereq table file name and the tree maker of the course structure file, made once per process
+# and structure file version.
+@lru_cache(maxsize=1)
+def course_structure(mtime_ns, size):
+    postreq_names = {output_filename(name): name for name in
+                     pd.read_csv(__COMBINED_COURSE_STRUCTURE_FILEPATH)['postreq']}
+    return postreq_names, TreeMaker(str(__COMBINED_COURSE_STRUCTURE_FILEPATH), __TREE_CACHE_FOLDER)
+
+
+# The prereq table builder of a grade matrices folder, made once per process like the GradeMatrices it reads.
+@lru_cache(maxsize=None)
+def prereq_table_builder(folder):
+    return PrereqTableBuilder(GradeMatrices.open(folder))
+
+
 # Automatic Sequenced tuning based on:
 # https://www.analyticsvidhya.com/blog/2016/02/complete-guide-parameter-tuning-gradient-boosting-gbm-python/
 # Note this was abandoned and is only here for legacy purposes. Will be removed in future commits. Logistic Regression
 # was never touched
-def tune(filename):
-    if __model_enum != __MODEL_TYPES_ENUM.GBT_CLASSIFIER:
-        raise NotImplementedError("This method has not been implemented for " + str(__model_enum.name))
+def tune(job, filename):
+    if job.get_model_type() != MODEL_TYPES_ENUM.GBT_CLASSIFIER:
+        raise NotImplementedError("This method has not been implemented for " + str(job.get_model_type().name))
     loop_time = time.time()
 
-    x, y, _ = get_prereq_table(filename)
+    x, y, _ = get_prereq_table(job, filename)
     x = x.fillna(-1).values
     y = y.fillna(-1).values
     if len(x) >= __MIN_SAMPLES_FOR_PREDICTING and len(y) >= __MIN_SAMPLES_FOR_PREDICTING:
         check_y = column_or_1d(y)
         unique_y, y_inversed = np.unique(check_y, return_inverse=True)
         y_counts = np.bincount(y_inversed)
-        if not np.all([__NUMBER_FOLDS] > y_counts):
+        if not np.all([job.get_number_folds()] > y_counts):
             # Round 1  2500 iterations
             scoring = metrics.make_scorer(rounding_rmse_scorer)
             params = {
                 "max_features": "sqrt",
                 "subsample": 0.8
             }
-            model = GradientBoostingClassifier(random_state=__RANDOM_SEED, **params)
+            model = GradientBoostingClassifier(random_state=job.get_seed(), **params)
             param_grid = {
                 "learning_rate": list(np.logspace(np.log10(0.005), np.log10(0.5), num=50)),
                 "n_estimators": list(np.unique(np.logspace(np.log10(10), np.log10(1500), num=50, dtype=int)))
             }
 
-            skf = StratifiedKFold(n_splits=__NUMBER_FOLDS, shuffle=True, random_state=__RANDOM_SEED)
+            skf = StratifiedKFold(n_splits=job.get_number_folds(), shuffle=True, random_state=job.get_seed())
             clf = GridSearchCV(model, param_grid, cv=skf, scoring=scoring, verbose=True)
             clf.fit(x, y)
             params.update(clf.best_params_)
@@ -123,12 +189,12 @@ def tune(filename):
             print(clf.best_score_)
 
             # Round 2  12 * len(y) iterations
-            model = GradientBoostingClassifier(random_state=__RANDOM_SEED, **params)
+            model = GradientBoostingClassifier(random_state=job.get_seed(), **params)
             param_grid = {
                 "max_depth": range(3, 15, 1),
                 "min_samples_split": range(1, len(y), 1)
             }
-            skf = StratifiedKFold(n_splits=__NUMBER_FOLDS, shuffle=True, random_state=__RANDOM_SEED)
+            skf = StratifiedKFold(n_splits=job.get_number_folds(), shuffle=True, random_state=job.get_seed())
             clf = GridSearchCV(model, param_grid, cv=skf, scoring=scoring)
             clf.fit(x, y)
             params.update(clf.best_params_)
@@ -136,11 +202,11 @@ def tune(filename):
             print(clf.best_score_)
 
             # Round 3  len(y) iterations
-            model = GradientBoostingClassifier(random_state=__RANDOM_SEED, **params)
+            model = GradientBoostingClassifier(random_state=job.get_seed(), **params)
             param_grid = {
                 "min_samples_leaf": range(1, len(y), 1)
             }
-            skf = StratifiedKFold(n_splits=__NUMBER_FOLDS, shuffle=True, random_state=__RANDOM_SEED)
+            skf = StratifiedKFold(n_splits=job.get_number_folds(), shuffle=True, random_state=job.get_seed())
             clf = GridSearchCV(model, param_grid, cv=skf, scoring=scoring)
             clf.fit(x, y)
             params.update(clf.best_params_)
@@ -148,12 +214,12 @@ def tune(filename):
             print(clf.best_score_)
 
             # Round 4  2 * n_features iterations (around 10-16)
-            model = GradientBoostingClassifier(random_state=__RANDOM_SEED, **params)
+            model = GradientBoostingClassifier(random_state=job.get_seed(), **params)
             param_grid = [
                 {"max_features": range(1, x.shape[1], 1)},
                 {"max_features": ['log2', 'sqrt']}
             ]
-            skf = StratifiedKFold(n_splits=__NUMBER_FOLDS, shuffle=True, random_state=__RANDOM_SEED)
+            skf = StratifiedKFold(n_splits=job.get_number_folds(), shuffle=True, random_state=job.get_seed())
             clf = GridSearchCV(model, param_grid, cv=skf, scoring=scoring)
             clf.fit(x, y)
             params.update(clf.best_params_)
@@ -161,29 +227,29 @@ def tune(filename):
             print(clf.best_score_)
 
             # Round 5  60 iterations
-            model = GradientBoostingClassifier(random_state=__RANDOM_SEED, **params)
+            model = GradientBoostingClassifier(random_state=job.get_seed(), **params)
             param_grid = {
                 "loss": ['deviance', 'exponential'],
                 'subsample': np.arange(0.1, 1.1, 0.1),
                 'criterion': ['friedman_mse', 'mse', 'mae']
             }
-            skf = StratifiedKFold(n_splits=__NUMBER_FOLDS, shuffle=True, random_state=__RANDOM_SEED)
+            skf = StratifiedKFold(n_splits=job.get_number_folds(), shuffle=True, random_state=job.get_seed())
             clf = GridSearchCV(model, param_grid, cv=skf, scoring=scoring)
             clf.fit(x, y)
             params.update(clf.best_params_)
 
-            # np.save(__tuning_results_folder / filename[:-4], params)
+            # np.save(job.get_tuning_results_folder() / filename[:-4], params)
             print(filename[:-4] + " " + str(round(time.time() - loop_time, 2)) + "s.: " + str(params))
             print(clf.best_score_)
             print()
 
 
 # Grid based exhaustive search tuning on small amount of parameters. Based on the existing code.
-def tune_grid(filename):
+def tune_grid(job, filename):
     loop_time = time.time()
     scoring = metrics.make_scorer(rounding_rmse_scorer)
-    if __model_enum == __MODEL_TYPES_ENUM.LOGISTIC_REGRESSION:
-        model = LogisticRegression(random_state=__RANDOM_SEED)
+    if job.get_model_type() == MODEL_TYPES_ENUM.LOGISTIC_REGRESSION:
+        model = LogisticRegression(random_state=job.get_seed())
         c_space = list(np.logspace(-7, 7, 60))
         param_grid = [
             {'penalty': ['l1', 'l2'], 'solver': ['liblinear'], "C": c_space, "class_weight": ['balanced', None]},
@@ -192,13 +258,13 @@ def tune_grid(filename):
             {'penalty': ['l1', 'l2', 'none', 'elasticnet'], 'solver': ['saga'], "C": c_space,
              "class_weight": ['balanced', None]}
         ]
-    elif __model_enum == __MODEL_TYPES_ENUM.NU_SVR:
+    elif job.get_model_type() == MODEL_TYPES_ENUM.NU_SVR:
         model = NuSVR()
         c_space = list(np.logspace(-3, 3, 20))
         nu_space = np.arange(0.1, 1.1, 0.05)
         param_grid = {'nu': nu_space, 'C': c_space, 'kernel': ['linear', 'rbf', 'sigmoid'], 'gamma': ['scale', 'auto']}
-    elif __model_enum == __MODEL_TYPES_ENUM.GBT_CLASSIFIER:
-        model = GradientBoostingClassifier(random_state=__RANDOM_SEED)
+    elif job.get_model_type() == MODEL_TYPES_ENUM.GBT_CLASSIFIER:
+        model = GradientBoostingClassifier(random_state=job.get_seed())
         param_grid = {
             "loss": ["deviance"],
             "learning_rate": [0.1],
@@ -211,36 +277,32 @@ def tune_grid(filename):
             "n_estimators": [100]
         }
     else:
-        raise NotImplementedError("This method has not been implemented for " + str(__model_enum.name))
+        raise NotImplementedError("This method has not been implemented for " + str(job.get_model_type().name))
 
-    skf = StratifiedKFold(n_splits=__NUMBER_FOLDS, shuffle=True, random_state=__RANDOM_SEED)
+    skf = StratifiedKFold(n_splits=job.get_number_folds(), shuffle=True, random_state=job.get_seed())
     clf = GridSearchCV(model, param_grid, cv=skf, scoring=scoring, verbose=True)
 
-    x, y, _ = get_prereq_table(filename)
+    x, y, _ = get_prereq_table(job, filename)
     x = x.fillna(-1).values
     y = y.fillna(-1).values
     if len(x) >= __MIN_SAMPLES_FOR_PREDICTING and len(y) >= __MIN_SAMPLES_FOR_PREDICTING:
         check_y = column_or_1d(y)
         unique_y, y_inversed = np.unique(check_y, return_inverse=True)
         y_counts = np.bincount(y_inversed)
-        if not np.all([__NUMBER_FOLDS] > y_counts):
+        if not np.all([job.get_number_folds()] > y_counts):
             best_clf = clf.fit(x, y)
 
-            if os.path.exists(__tuning_results_folder / (filename[:-4] + ".npy")):
+            if os.path.exists(job.get_tuning_results_folder() / (filename[:-4] + ".npy")):
                 print("file exists")
-            np.save(__tuning_results_folder / filename[:-4], best_clf.best_params_)
+            np.save(job.get_tuning_results_folder() / filename[:-4], best_clf.best_params_)
             print(filename[:-4] + " " + str(round(time.time() - loop_time, 2)) + "s.: " + str(best_clf.best_score_))
             print(best_clf.best_params_)
             print()
 
 
-# Random tuning based on extended parameter grid. Preferred method at the moment based on:
-# https://medium.com/rants-on-machine-learning/smarter-parameter-sweeps-or-why-grid-search-is-plain-stupid-c17d97a0e881
-def tune_rand(filename):
-    loop_time = time.time()
-    x, y, _ = get_prereq_table(filename)
-    rng = np.random.RandomState(__RANDOM_SEED)
-    if __model_enum == __MODEL_TYPES_ENUM.LOGISTIC_REGRESSION:
+# The model, the extended parameter grid and the number of trials used to tune each model type.
+def search_space(job, y, rng):
+    if job.get_model_type() == MODEL_TYPES_ENUM.LOGISTIC_REGRESSION:
         num_trials = 2400
         model = LogisticRegression(random_state=rng)
         c_space = list(np.logspace(-7, 7, 100))
@@ -251,7 +313,7 @@ def tune_rand(filename):
             {'penalty': ['l1', 'l2', 'none', 'elasticnet'], 'solver': ['saga'], "C": c_space,
              "class_weight": ['balanced', None]}
         ]
-    elif __model_enum == __MODEL_TYPES_ENUM.RANDOM_FOREST_REGRESSOR:
+    elif job.get_model_type() == MODEL_TYPES_ENUM.RANDOM_FOREST_REGRESSOR:
         model = RandomForestRegressor(random_state=rng)
         num_trials = 1500
         param_grid = {
@@ -261,7 +323,7 @@ def tune_rand(filename):
             "min_samples_leaf": list(range(1, len(y), 1)),
             "max_features": ["auto", "sqrt", "log2"]
         }
-    elif __model_enum == __MODEL_TYPES_ENUM.GBT_CLASSIFIER:
+    elif job.get_model_type() == MODEL_TYPES_ENUM.GBT_CLASSIFIER:
         num_trials = 2000
         model = GradientBoostingClassifier(random_state=rng)
         param_grid = {
@@ -275,13 +337,13 @@ def tune_rand(filename):
             "subsample": list(np.arange(0.1, 1.1, 0.05)),
             "n_estimators": np.logspace(np.log10(10), np.log10(1500), 100, dtype='int64')
         }
-    elif __model_enum == __MODEL_TYPES_ENUM.NU_SVR:
+    elif job.get_model_type() == MODEL_TYPES_ENUM.NU_SVR:
         num_trials = 2500
         model = NuSVR()
         c_space = list(np.logspace(-3, 3, 25))
         nu_space = np.arange(0.1, 1.1, 0.05)
         param_grid = [{'nu': nu_space, 'C': c_space, 'kernel': ['linear', 'rbf'], 'gamma': ['scale', 'auto']}]
-    elif __model_enum == __MODEL_TYPES_ENUM.GBT_REGRESSOR:
+    elif job.get_model_type() == MODEL_TYPES_ENUM.GBT_REGRESSOR:
         num_trials = 2000
         model = GradientBoostingRegressor(random_state=rng)
         param_grid = {
@@ -296,12 +358,22 @@ def tune_rand(filename):
             "n_estimators": np.logspace(np.log10(10), np.log10(1500), 100, dtype='int64')
         }
     else:
-        raise NotImplementedError("This method has not been implemented for " + str(__model_enum.name))
+        raise NotImplementedError("This method has not been implemented for " + str(job.get_model_type().name))
 
-    scoring = metrics.make_scorer(rounding_rmse_scorer)
-    skf = StratifiedKFold(n_splits=__NUMBER_FOLDS, shuffle=True, random_state=rng)
-    clf = RandomizedSearchCV(model, param_grid, cv=skf, scoring=scoring, n_iter=num_trials, random_state=rng,
-                             verbose=True)
+    return model, param_grid, num_trials
+
+
+# Random tuning based on extended parameter grid. Preferred method at the moment based on:
+# https://medium.com/rants-on-machine-learning/smarter-parameter-sweeps-or-why-grid-search-is-plain-stupid-c17d97a0e881
+# Every scored trial is checkpointed to the course's tuning log, so a stopped search carries on where it stopped. The
+# boosted models sample the parameters other than n_estimators and every sample is fit once with the largest
+# n_estimators, its best number of estimators in the grid is found from the staged predictions of that fit, see
+# cross_validate_staged.
+def tune_rand(job, filename):
+    loop_time = time.time()
+    x, y, _ = get_prereq_table(job, filename)
+    rng = np.random.RandomState(job.get_seed())
+    model, param_grid, num_trials = search_space(job, y, rng)
 
     x = x.fillna(-1).values
     y = y.fillna(-1).values
@@ -309,195 +381,408 @@ def tune_rand(filename):
         check_y = column_or_1d(y)
         unique_y, y_inversed = np.unique(check_y, return_inverse=True)
         y_counts = np.bincount(y_inversed)
-        if not np.all([__NUMBER_FOLDS] > y_counts):
-            best_clf = clf.fit(x, y)
+        if not np.all([job.get_number_folds()] > y_counts):
+            staged = is_staged(model, param_grid)
+            search = {'method': __TUNING_METHODS_ENUM.RANDOM.name, 'candidates': num_trials, 'staged': staged}
+            if staged:
+                param_grid = dict(param_grid)
+                stages = sorted(set(int(value) for value in param_grid.pop('n_estimators')))
+                search['stages'] = stages
+            log = open_tuning_log(job, filename, search)
+            if log is None:
+                return
+            candidates = list(enumerate(ParameterSampler(param_grid, num_trials, random_state=rng)))
+            skf = StratifiedKFold(n_splits=job.get_number_folds(), shuffle=True, random_state=job.get_seed())
+            if staged:
+                scores, best_stages = score_candidates_staged(model, candidates, stages, x, y,
+                                                              list(skf.split(x, y)), log)
+            else:
+                scores = score_candidates(model, candidates, x, y, list(skf.split(x, y)), log)
+
+            best_trial = ranked_trials(scores)[0]
+            best_params = candidates[best_trial][1]
+            if staged:
+                # the largest stage when no candidate could be fit
+                best_params = dict(best_params, n_estimators=best_stages[best_trial] or stages[-1])
+            save_tuning_results(job, filename, log, best_params, scores[best_trial], loop_time)
+
+
+# Successive halving tuning over the same parameter grids as tune_rand. Every candidate is first scored on a small
+# budget and only the best 1 / __HALVING_FACTOR of them are scored again on a __HALVING_FACTOR times larger budget, and
+# the last rung is scored on the full budget. The budget is the number of estimators for models that have an n_estimators grid, and the number
+# of training samples for the rest. The boosted models are not fit again from the first stage at every rung, the fits
+# of the kept candidates are carried on to the next budget with warm_start. Writes the same parameter files as
+# tune_rand, including the n_estimators of the best candidate. Every scored trial is checkpointed to the course's tuning
+# log like in tune_rand.
+# Based on: https://scikit-learn.org/stable/modules/grid_search.html#successive-halving-user-guide
+def tune_halving(job, filename):
+    loop_time = time.time()
+    x, y, _ = get_prereq_table(job, filename)
+    rng = np.random.RandomState(job.get_seed())
+    model, param_grid, num_trials = search_space(job, y, rng)
+
+    if isinstance(param_grid, dict) and 'n_estimators' in param_grid:
+        param_grid = dict(param_grid)
+        n_estimators = param_grid.pop('n_estimators')
+        resource, min_resources, max_resources = 'n_estimators', int(min(n_estimators)), int(max(n_estimators))
+    else:
+        # the smallest budget halving starts from, two samples of every class in every fold
+        resource = 'n_samples'
+        min_resources = 2 * job.get_number_folds() * (y.fillna(-1).nunique() if is_classifier(model) else 1)
+        max_resources = len(y)
+        if max_resources < min_resources * __HALVING_FACTOR:
+            print(filename[:-4] + " has too few samples to tune by successive halving, tuning randomly instead.")
+            tune_rand(job, filename)
+            return
 
-            if os.path.exists(__tuning_results_folder / (filename[:-4] + '.npy')) and False:
-                old_params = np.load(__tuning_results_folder / (filename[:-4] + '.npy'), allow_pickle=True).item()
-                for key in old_params:
-                    old_params[key] = [old_params[key]]
-                new_params = {}
-                for key in best_clf.best_params_:
-                    new_params[key] = [best_clf.best_params_[key]]
-                print('old ', old_params)
-                print('new ', new_params)
-                if old_params != new_params:
-                    param_grid = [new_params, old_params]
-                    clf2 = GridSearchCV(model, param_grid, cv=skf, scoring=scoring, verbose=True)
-                    best_clf = clf2.fit(x, y)
-
-            np.save(__tuning_results_folder / filename[:-4], best_clf.best_params_)
-            print(filename[:-4] + " " + str(round(time.time() - loop_time, 2)) + "s.: " + str(best_clf.best_score_))
-            print(best_clf.best_params_)
-            print()
+    x = x.fillna(-1).values
+    y = y.fillna(-1).values
+    if len(x) >= __MIN_SAMPLES_FOR_PREDICTING and len(y) >= __MIN_SAMPLES_FOR_PREDICTING:
+        check_y = column_or_1d(y)
+        unique_y, y_inversed = np.unique(check_y, return_inverse=True)
+        y_counts = np.bincount(y_inversed)
+        if not np.all([job.get_number_folds()] > y_counts):
+            number_rungs = 1 + min(int(np.log(max_resources / min_resources) / np.log(__HALVING_FACTOR) + 1e-9),
+                                   int(np.log(num_trials) / np.log(__HALVING_FACTOR) + 1e-9))
+            # like the 'exhaust' min_resources of sklearn's halving searches, the first budget is raised so the last
+            # rung is scored on the full budget
+            min_resources = max(min_resources, max_resources // __HALVING_FACTOR ** (number_rungs - 1))
+            rung_resources = [min_resources * __HALVING_FACTOR ** rung for rung in range(number_rungs - 1)] + \
+                             [max_resources]
+            log = open_tuning_log(job, filename, {'method': __TUNING_METHODS_ENUM.SUCCESSIVE_HALVING.name,
+                                                  'candidates': num_trials, 'resource': resource,
+                                                  'rung_resources': rung_resources})
+            if log is None:
+                return
+            candidates = list(enumerate(ParameterSampler(param_grid, num_trials, random_state=rng)))
+            # the same folds are used at every budget, the sample budgets train on nested subsets of each fold
+            skf = StratifiedKFold(n_splits=job.get_number_folds(), shuffle=True, random_state=job.get_seed())
+            folds = list(skf.split(x, y))
+            shuffled_trains = [np.random.RandomState(job.get_seed()).permutation(train) for train, _ in folds]
+
+            # the boosted models carry on the fits of the kept candidates from one rung to the next
+            warm = resource == 'n_estimators' and hasattr(model, 'staged_predict')
+            fits = {}
+            for rung in range(number_rungs):
+                resources = rung_resources[rung]
+                if resource == 'n_estimators':
+                    rung_candidates = [(trial, dict(params, n_estimators=resources)) for trial, params in candidates]
+                    rung_folds = folds
+                else:
+                    rung_candidates = candidates
+                    rung_folds = [(np.sort(shuffled[:len(shuffled) * resources // max_resources]), test)
+                                  for shuffled, (_, test) in zip(shuffled_trains, folds)]
+                print(filename[:-4] + " rung " + str(rung) + ": " + str(len(rung_candidates)) + " candidates on "
+                      + str(resources) + " " + resource)
+                number_kept = int(np.ceil(len(candidates) / __HALVING_FACTOR))
+                if warm:
+                    scores, fits = score_candidates_warm(model, rung_candidates, x, y, rung_folds, log, rung,
+                                                         resources, fits, number_kept if rung < number_rungs - 1 else 0)
+                else:
+                    scores = score_candidates(model, rung_candidates, x, y, rung_folds, log, rung, resources)
+                kept = ranked_trials(scores)[:number_kept]
+                if rung < number_rungs - 1:
+                    candidates = [(trial, params) for trial, params in candidates if trial in kept]
+
+            best_trial = ranked_trials(scores)[0]
+            best_params = dict(rung_candidates)[best_trial]
+            save_tuning_results(job, filename, log, best_params, scores[best_trial], loop_time)
+
+
+# Opens the tuning log of a postreq for a search. Returns None when that search is already complete and its
+# parameter file exists, so batch tuning skips the postreqs it has finished.
+def open_tuning_log(job, filename, search):
+    search = dict(search, seed=job.get_seed(), folds=job.get_number_folds())
+    log = TuningLog(job.get_tuning_logs_folder() / (filename[:-4] + LOG_SUFFIX), search)
+    if log.is_complete() and os.path.exists(job.get_tuning_results_folder() / (filename[:-4] + '.npy')):
+        print(filename[:-4] + " is already tuned, skipping.")
+        return None
+    if log.get_number_scored() > 0:
+        print(filename[:-4] + " resuming tuning from " + str(log.get_number_scored()) + " logged trials.")
+    return log
+
+
+# Mean cross validation score of one set of parameters, NaN when the model can not be fit with them like in the
+# sklearn searches.
+def cross_validate_params(model, params, x, y, folds):
+    scoring = metrics.make_scorer(rounding_rmse_scorer)
+    fold_scores = []
+    for train_index, test_index in folds:
+        estimator = clone(model).set_params(**params)
+        try:
+            estimator.fit(x[train_index], y[train_index])
+        except Exception:
+            return np.NaN
+        fold_scores.append(scoring(estimator, x[test_index], y[test_index]))
+    return float(np.mean(fold_scores))
+
+
+# Whether a model's n_estimators grid can be scored from the stages of one fit, true for the boosted models.
+def is_staged(model, param_grid):
+    return hasattr(model, 'staged_predict') and isinstance(param_grid, dict) and 'n_estimators' in param_grid
+
+
+# Mean cross validation score of a boosted model at every stage of the given stages, its n_estimators grid, from one fit
+# per fold with the largest stage. Scored the same as fitting each number of estimators on its own, since the stages of
+# a boosted model do not depend on how many come after them. Returns the best mean score and its stage, the smallest
+# stage of a tie, or NaN and None when the model can not be fit with the parameters.
+def cross_validate_staged(model, params, stages, x, y, folds):
+    estimator_params = dict(params, n_estimators=stages[-1])
+    scored_stages = set(stages)
+    fold_scores = np.empty((len(folds), len(stages)))
+    for fold, (train_index, test_index) in enumerate(folds):
+        estimator = clone(model).set_params(**estimator_params)
+        try:
+            estimator.fit(x[train_index], y[train_index])
+        except Exception:
+            return np.NaN, None
+        stage_predictions = [y_pred for stage, y_pred in enumerate(estimator.staged_predict(x[test_index]), start=1)
+                             if stage in scored_stages]
+        fold_scores[fold] = staged_rounding_rmse_scores(y[test_index], np.array(stage_predictions))
+    mean_scores = fold_scores.mean(axis=0)
+    best = int(np.argmax(mean_scores))
+    return float(mean_scores[best]), stages[best]
+
+
+# rounding_rmse_scorer of every row of stage_predictions at once, with round_school done on the whole array.
+def staged_rounding_rmse_scores(y, stage_predictions):
+    whole, fraction = np.divmod(stage_predictions, 1)
+    rounded = np.clip(whole + np.where(stage_predictions > 0, fraction >= 0.5, fraction > 0.5), 0, 10)
+    return -np.sqrt(np.mean((y - rounded) ** 2, axis=1))
+
+
+# Scores candidates, a list of (trial number, parameters), across the processes of the current joblib backend. Scores
+# that are already in the log are reused and every new score is logged as soon as its trial finishes. Returns a
+# dictionary of the score of each trial number.
+def score_candidates(model, candidates, x, y, folds, log, rung=0, resources=None):
+    scores = {}
+    remaining = []
+    for trial, params in candidates:
+        score = log.score(rung, trial, params)
+        if score is None:
+            remaining.append((trial, params))
+        else:
+            scores[trial] = score
+
+    results = Parallel(return_as='generator')(delayed(cross_validate_params)(model, params, x, y, folds)
+                                              for _, params in remaining)
+    for (trial, params), score in zip(remaining, results):
+        log.record(rung, trial, params, score, resources)
+        scores[trial] = score
+    return scores
+
+
+# Scores the candidates of a random search of a boosted model like score_candidates, every candidate is the parameters
+# other than n_estimators and is fit once with cross_validate_staged. One record per candidate is logged, with the score
+# of its best stage. Returns the score and the best stage of each trial number.
+def score_candidates_staged(model, candidates, stages, x, y, folds, log):
+    scores = {}
+    best_stages = {}
+    remaining = []
+    for trial, params in candidates:
+        score = log.score(0, trial, params)
+        if score is None:
+            remaining.append((trial, params))
+        else:
+            scores[trial] = score
+            best_stages[trial] = log.get_stage(0, trial)
+
+    results = Parallel(return_as='generator')(delayed(cross_validate_staged)(model, params, stages, x, y, folds)
+                                              for _, params in remaining)
+    for (trial, params), (score, stage) in zip(remaining, results):
+        log.record(0, trial, params, score, stage=stage)
+        scores[trial] = score
+        best_stages[trial] = stage
+    return scores, best_stages
+
+
+# Mean cross validation score of one set of parameters of a boosted model like cross_validate_params, that carries on
+# the given per fold fits of the same parameters with fewer estimators with warm_start instead of fitting from the first
+# stage. Returns the score and the per fold fits, to carry on at the next rung, with None when a fit failed.
+def cross_validate_warm(model, params, x, y, folds, estimators=None):
+    scoring = metrics.make_scorer(rounding_rmse_scorer)
+    if estimators is None:
+        estimators = [clone(model).set_params(**params) for _ in folds]
+    else:
+        estimators = [estimator.set_params(n_estimators=params['n_estimators'], warm_start=True)
+                      for estimator in estimators]
+    fold_scores = []
+    for estimator, (train_index, test_index) in zip(estimators, folds):
+        try:
+            estimator.fit(x[train_index], y[train_index])
+        except Exception:
+            return np.NaN, None
+        fold_scores.append(scoring(estimator, x[test_index], y[test_index]))
+    return float(np.mean(fold_scores)), estimators
+
+
+# Scores a successive halving rung of a boosted model on its n_estimators like score_candidates, carrying on the fits
+# of the previous rung with cross_validate_warm, as a boosted model with the budget of a rung is the one of the previous
+# rung with more stages. Only the fits of the best number_kept trials are held, for the next rung. Returns the score
+# of each trial number and the fits that were held.
+def score_candidates_warm(model, candidates, x, y, folds, log, rung, resources, fits, number_kept):
+    scores = {}
+    remaining = []
+    for trial, params in candidates:
+        score = log.score(rung, trial, params)
+        if score is None:
+            remaining.append((trial, params))
+        else:
+            scores[trial] = score
+
+    results = Parallel(return_as='generator')(delayed(cross_validate_warm)(model, params, x, y, folds,
+                                                                           fits.pop(trial, None))
+                                              for trial, params in remaining)
+    kept_fits = {}
+    for (trial, params), (score, estimators) in zip(remaining, results):
+        log.record(rung, trial, params, score, resources)
+        scores[trial] = score
+        if estimators is not None and not np.isnan(score):
+            kept_fits[trial] = estimators
+            if len(kept_fits) > number_kept:
+                # the worst held trial in the order of ranked_trials, the lowest score and then the latest trial
+                del kept_fits[min(kept_fits, key=lambda held: (scores[held], -held))]
+    return scores, kept_fits
+
+
+# Trial numbers from the best score to the worst, NaN scores last and ties in trial order.
+def ranked_trials(scores):
+    trials = sorted(scores)
+    ranking = np.array([scores[trial] for trial in trials], dtype=np.float64)
+    ranking[np.isnan(ranking)] = -np.inf
+    return [trials[position] for position in np.argsort(-ranking, kind='stable')]
+
+
+def save_tuning_results(job, filename, log, best_params, best_score, loop_time):
+    np.save(job.get_tuning_results_folder() / filename[:-4], best_params)
+    log.complete(best_params, best_score)
+    print(filename[:-4] + " " + str(round(time.time() - loop_time, 2)) + "s.: " + str(best_score))
+    print(best_params)
+    print()
+
+
+# Tunes a postreq with the tuning method chosen for the current model type.
+def tune_course(job, filename):
+    if __TUNING_METHODS[job.get_model_type()] == __TUNING_METHODS_ENUM.SUCCESSIVE_HALVING:
+        tune_halving(job, filename)
+    else:
+        tune_rand(job, filename)
 
 
-def hyperparameter_tuning():
+# Tunes every postreq of a job (or the given postreq file names), scoring the candidates of each across a pool of
+# n_jobs processes.
+def hyperparameter_tuning(job, n_jobs=-1, filenames=None):
     print('Hyperparameter tuning beginning. Run time will print after the completion of each tuning. \n')
 
     start_time = time.time()
-    if not os.path.exists(__tuning_results_folder):
-        os.makedirs(__tuning_results_folder)
+    if not os.path.exists(job.get_tuning_results_folder()):
+        os.makedirs(job.get_tuning_results_folder())
 
-    with parallel_backend('loky', n_jobs=-1):
-        for filename in sorted(os.listdir(__data_folder)):
-            # tune(filename)
-            # tune_grid(filename)
-            if filename == 'Programming in COBOL.csv':
-                print(filename)
-                tune_rand(filename)
+    with parallel_backend('loky', n_jobs=n_jobs):
+        for filename in job.get_filenames() if filenames is None else filenames:
+            # tune(job, filename)
+            # tune_grid(job, filename)
+            print(filename)
+            tune_course(job, filename)
 
     print('Hyperparameter tuning completed in ' + str(round(time.time() - start_time, 2)) + 's. Files saved to: \''
-          + str(__tuning_results_folder) + '\' \n')
-
-
-def reverse_convert_grade(int_grade):
-    if int_grade == 10:
-        return 'A'
-    elif int_grade == 9:
-        return 'A-'
-    elif int_grade == 8:
-        return 'B+'
-    elif int_grade == 7:
-        return 'B'
-    elif int_grade == 6:
-        return 'B-'
-    elif int_grade == 5:
-        return 'C+'
-    elif int_grade == 4:
-        return 'C'
-    elif int_grade == 3:
-        return 'C-'
-    elif int_grade == 2:
-        return 'D+'
-    elif int_grade == 1:
-        return 'D'
-    elif int_grade == 0:
-        return 'F'
-
-
-def reverse_convert_struggle(int_struggle):
-    if int_struggle == 1:
-        return 'E'
-    elif int_struggle == 2:
-        return 'S'
-    elif int_struggle == 3:
-        return 'G'
-    else:
-        return '?'
+          + str(job.get_tuning_results_folder()) + '\' \n')
 
 
-def predict(postreq_name, x_train, x_test, y_train, y_test, x_columns):
-    if not os.path.exists(__tuning_results_folder / (postreq_name + '.npy')):
+def predict(job, postreq_name, x_train, x_test, y_train, y_test, x_columns):
+    if not os.path.exists(job.get_tuning_results_folder() / (postreq_name + '.npy')):
         read_dictionary = None
     else:
-        read_dictionary = np.load(__tuning_results_folder / (postreq_name + '.npy'), allow_pickle=True).item()
+        read_dictionary = np.load(job.get_tuning_results_folder() / (postreq_name + '.npy'), allow_pickle=True).item()
 
-    print(__model_enum.name + " " + postreq_name + " Parameter Dictionary: " + str(read_dictionary))
+    print(job.get_model_type().name + " " + postreq_name + " Parameter Dictionary: " + str(read_dictionary))
 
-    if __model_enum == __MODEL_TYPES_ENUM.LOGISTIC_REGRESSION:
+    if job.get_model_type() == MODEL_TYPES_ENUM.LOGISTIC_REGRESSION:
         if read_dictionary is None:
-            model = LogisticRegression(random_state=__RANDOM_SEED)
+            model = LogisticRegression(random_state=job.get_seed())
         else:
-            model = LogisticRegression(random_state=__RANDOM_SEED, **read_dictionary)
-    elif __model_enum == __MODEL_TYPES_ENUM.GBT_CLASSIFIER:
+            model = LogisticRegression(random_state=job.get_seed(), **read_dictionary)
+    elif job.get_model_type() == MODEL_TYPES_ENUM.GBT_CLASSIFIER:
         if read_dictionary is None:
-            model = GradientBoostingClassifier(random_state=__RANDOM_SEED)
+            model = GradientBoostingClassifier(random_state=job.get_seed())
         else:
-            model = GradientBoostingClassifier(random_state=__RANDOM_SEED, **read_dictionary)
-    elif __model_enum == __MODEL_TYPES_ENUM.NU_SVR:
+            model = GradientBoostingClassifier(random_state=job.get_seed(), **read_dictionary)
+    elif job.get_model_type() == MODEL_TYPES_ENUM.NU_SVR:
         if read_dictionary is None:
             model = NuSVR()
         else:
             model = NuSVR(**read_dictionary)
-    elif __model_enum == __MODEL_TYPES_ENUM.GBT_REGRESSOR:
-        model = GradientBoostingRegressor(random_state=__RANDOM_SEED)
-    elif __model_enum == __MODEL_TYPES_ENUM.RANDOM_FOREST_REGRESSOR:
+    elif job.get_model_type() == MODEL_TYPES_ENUM.GBT_REGRESSOR:
+        model = GradientBoostingRegressor(random_state=job.get_seed())
+    elif job.get_model_type() == MODEL_TYPES_ENUM.RANDOM_FOREST_REGRESSOR:
         if read_dictionary is None:
-            model = RandomForestRegressor(random_state=__RANDOM_SEED)
+            model = RandomForestRegressor(random_state=job.get_seed())
         else:
-            model = RandomForestRegressor(**read_dictionary, random_state=__RANDOM_SEED)
-    elif __model_enum == __MODEL_TYPES_ENUM.MOD_ZEROR:
+            model = RandomForestRegressor(**read_dictionary, random_state=job.get_seed())
+    elif job.get_model_type() == MODEL_TYPES_ENUM.MOD_ZEROR:
         model = DummyClassifier('most_frequent')
-    elif __model_enum == __MODEL_TYPES_ENUM.MEAN_ZEROR:
+    elif job.get_model_type() == MODEL_TYPES_ENUM.MEAN_ZEROR:
         model = DummyRegressor('mean')
 
     y_preds = []
-    #   F,  D,  D+, C-, C,  C+, B-, B,  B+, A-, A
-    y_grades = [[], [], [], [], [], [], [], [], [], [], []]
+    # probability of each letter grade, F to A, for the models that give probabilities
+    y_grades = []
+    trained_grades = set()
+    gives_probabilities = job.get_model_type() == MODEL_TYPES_ENUM.LOGISTIC_REGRESSION or \
+        job.get_model_type() == MODEL_TYPES_ENUM.GBT_CLASSIFIER
 
-    for fold_num in range(0, __NUMBER_FOLDS):
+    for fold_num in range(0, job.get_number_folds()):
         # print(x_train[fold_num])
         model.fit(x_train[fold_num], y_train[fold_num])
         y_pred = model.predict(x_test[fold_num])
         y_preds += list(y_pred)
 
-        if __model_enum == __MODEL_TYPES_ENUM.LOGISTIC_REGRESSION or __model_enum == __MODEL_TYPES_ENUM.GBT_CLASSIFIER:
-            temp = model.predict_proba(x_test[fold_num])
-
-            for t in temp:
-                count = 0
-                not_filled = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
-                for f in t:
-                    y_grades[model.classes_[count]].append(f)
-                    not_filled.remove(model.classes_[count])
-                    count += 1
-                for q in not_filled:
-                    y_grades[q].append(0)
+        if gives_probabilities:
+            # grades missing from the fold's training labels keep a probability of 0
+            fold_grades = np.zeros((len(x_test[fold_num]), len(GradeCodec.GRADE_SCALE)))
+            fold_grades[:, np.asarray(model.classes_, dtype=np.intp)] = model.predict_proba(x_test[fold_num])
+            y_grades.append(fold_grades)
+            trained_grades.update(model.classes_)
 
     y_preds = [round_school(num) for num in y_preds]
 
     rr = metrics.r2_score(flatten(y_test), y_preds)
-    rmse = metrics.mean_squared_error(flatten(y_test), y_preds, squared=False)
+    rmse = np.sqrt(metrics.mean_squared_error(flatten(y_test), y_preds))
     acc = metrics.accuracy_score(flatten(y_test), y_preds)
 
-    with open(__results_folder / (postreq_name + '.txt'), "w") as text_file:
+    with open(job.get_results_folder() / (postreq_name + '.txt'), "w") as text_file:
         text_file.write(
             'R^2 = ' + str(rr) + ', Accuracy = ' + str(acc) + ' , RMSE = ' + str(rmse) + ', NRMSE = ' + str(rmse / 10))
 
-    x_df = pd.concat([pd.DataFrame(x_test[0]),
-                      pd.DataFrame(x_test[1]),
-                      pd.DataFrame(x_test[2]),
-                      pd.DataFrame(x_test[3]),
-                      pd.DataFrame(x_test[4])], ignore_index=True)
-
-    x_df.columns = x_columns
-    # x_df['struggle'] = x_df['struggle'].apply(reverse_convert_struggle)
+    x_df = pd.DataFrame(np.concatenate(x_test), columns=x_columns)
+    # x_df['struggle'] = x_df['struggle'].apply(GradeCodec.reverse_convert_struggle)
 
-    y_df = pd.concat([pd.DataFrame(y_test[0]),
-                      pd.DataFrame(y_test[1]),
-                      pd.DataFrame(y_test[2]),
-                      pd.DataFrame(y_test[3]),
-                      pd.DataFrame(y_test[4])], ignore_index=True)
+    y_df = pd.DataFrame({postreq_name: GradeCodec.decode(np.concatenate(y_test), missing=None)})
 
-    y_df.columns = [postreq_name]
-    y_df[postreq_name] = y_df[postreq_name].apply(reverse_convert_grade)
+    y_predict_df = pd.DataFrame({'predicted score': GradeCodec.decode(y_preds, missing=None)})
 
-    y_predict_df = pd.DataFrame(y_preds, columns=['predicted score'])
-    y_predict_df['predicted score'] = y_predict_df['predicted score'].apply(reverse_convert_grade)
-
-    if __model_enum == __MODEL_TYPES_ENUM.LOGISTIC_REGRESSION or __model_enum == __MODEL_TYPES_ENUM.GBT_CLASSIFIER:
-        y_grades_df = pd.DataFrame(
-            {'F': y_grades[0], 'D': y_grades[1], 'D+': y_grades[2], 'C-': y_grades[3], 'C': y_grades[4],
-             'C+': y_grades[5], 'B-': y_grades[6], 'B': y_grades[7], 'B+': y_grades[8],
-             'A-': y_grades[9], 'A': y_grades[10]})
+    if gives_probabilities:
+        y_grades_df = pd.DataFrame(np.concatenate(y_grades), columns=GradeCodec.GRADE_SCALE)
+        # grades no fold was trained on are written as 0, not 0.0
+        y_grades_df = y_grades_df.astype({grade: int for code, grade in enumerate(GradeCodec.GRADE_SCALE)
+                                          if code not in trained_grades})
         predictions = pd.concat([x_df, y_df, y_predict_df, y_grades_df], axis=1)
     else:
         predictions = pd.concat([x_df, y_df, y_predict_df], axis=1)
 
-    predictions.to_csv(__results_folder / ('PREDICTION_' + postreq_name + '.csv'), index=False)
+    predictions.to_csv(job.get_results_folder() / ('PREDICTION_' + postreq_name + '.csv'), index=False)
 
     return predictions['predicted score'].values, y_df[postreq_name].values, rr, acc, (rmse / 10), model
 
 
-def stratify_and_split(filename):
+def stratify_and_split(job, filename):
     x_trains = []
     x_tests = []
     y_trains = []
     y_tests = []
     id_tests = []
 
-    x, y, ids = get_prereq_table(filename)
+    x, y, ids = get_prereq_table(job, filename)
     x = x.fillna(-1)
     y = y.fillna(-1)
     x_columns = list(x.columns.values)
@@ -505,9 +790,8 @@ def stratify_and_split(filename):
     y = y.values
 
     if len(x) >= __MIN_SAMPLES_FOR_PREDICTING and len(y) >= __MIN_SAMPLES_FOR_PREDICTING:
-        skf = StratifiedKFold(n_splits=__NUMBER_FOLDS, shuffle=True, random_state=__RANDOM_SEED)
-        loop_count = 0
-        for train_index, test_index in skf.split(x, y):
+        folds = open_fold_cache(job).split(filename[:-4], y, job.get_seed())
+        for loop_count, (train_index, test_index) in enumerate(folds):
             x_train, x_test = x[train_index], x[test_index]
             y_train, y_test = y[train_index], y[test_index]
 
@@ -517,182 +801,369 @@ def stratify_and_split(filename):
             y_trains.append(y_train)
             y_tests.append(y_test)
 
-            (pd.concat(
-                [pd.DataFrame(x_train, columns=x_columns),
-                 pd.DataFrame(y_train, columns=[filename[:-4]])],
-                axis=1)).to_csv(__folds_folder / (filename[:-4] + '_' +
-                                                  __TRAIN_PREFIX + str(loop_count + 1) + '.csv'), encoding='utf-8',
-                                index=False)
-
-            (pd.concat(
-                [pd.DataFrame(x_test, columns=x_columns),
-                 pd.DataFrame(y_test, columns=[filename[:-4]])],
-                axis=1)).to_csv(__folds_folder / (filename[:-4] + '_' +
-                                                  __TEST_PREFIX + str(loop_count + 1) + '.csv'), encoding='utf-8',
-                                index=False)
-            loop_count += 1
+            if __EXPORT_FOLD_CSVS:
+                (pd.concat(
+                    [pd.DataFrame(x_train, columns=x_columns),
+                     pd.DataFrame(y_train, columns=[filename[:-4]])],
+                    axis=1)).to_csv(job.get_folds_folder() / (filename[:-4] + '_' +
+                                                            __TRAIN_PREFIX + str(loop_count + 1) + '.csv'),
+                                    encoding='utf-8', index=False)
+
+                (pd.concat(
+                    [pd.DataFrame(x_test, columns=x_columns),
+                     pd.DataFrame(y_test, columns=[filename[:-4]])],
+                    axis=1)).to_csv(job.get_folds_folder() / (filename[:-4] + '_' +
+                                                            __TEST_PREFIX + str(loop_count + 1) + '.csv'),
+                                    encoding='utf-8', index=False)
 
     return x_trains, x_tests, y_trains, y_tests, x_columns, len(x), id_tests
 
 
-def read_predict_write():
-    print('Training and testing beginning. A counter will print after the completion of each training set. \n')
-    if not os.path.exists(__folds_folder):
-        os.makedirs(__folds_folder)
-    if not os.path.exists(__results_folder):
-        os.makedirs(__results_folder)
+# Trains and evaluates the job's model on one postreq's prereq table. Returns the postreq's test set predictions and
+# stats, or None when it has too few samples to predict.
+def predict_course(job, filename):
+    filename = str(filename[:-4] + '.csv')
+    x_train, x_test, y_train, y_test, x_columns, n_samples, ids = stratify_and_split(job, filename)
+    if n_samples <= __MIN_SAMPLES_FOR_PREDICTING:
+        return None
+    predicted, actual, rr, acc, nrmse, _ = predict(job, filename[:-4], x_train, x_test, y_train, y_test, x_columns)
+    return {'postreq': filename[:-4], 'predicted': list(predicted), 'actual': list(actual), 'ids': list(ids),
+            'r^2': rr, 'accuracy': acc, 'nrmse': nrmse, 'n': n_samples}
+
+
+# Runs predict_course for one postreq of a job in a worker process and writes its result to a file of its own in the
+# job's jobs folder, along with the seed and number of folds it was run with. Returns the result file, or None when the
+# postreq was not predicted, in which case a result file left from an earlier run is removed.
+def run_job(job, filename):
+    job_filepath = job_result_filepath(job, filename)
+    result = predict_course(job, filename)
+    if result is None:
+        job_filepath.unlink(missing_ok=True)
+        return None
+    result = dict(result, seed=int(job.get_seed()), folds=job.get_number_folds())
+    job_filepath.parent.mkdir(parents=True, exist_ok=True)
+    temporary_filepath = job_filepath.with_suffix('.tmp' + str(os.getpid()))
+    with open(temporary_filepath, 'wb') as job_file:
+        pickle.dump(result, job_file)
+    os.replace(temporary_filepath, job_filepath)
+    return job_filepath
+
+
+# Reads a result file run_job wrote for a job. Raises a ValueError when it was run with another seed or number of
+# folds, so the results of runs with different settings are never put together.
+def read_job_result(job, job_filepath):
+    with open(job_filepath, 'rb') as job_file:
+        result = pickle.load(job_file)
+    if result.get('seed') != int(job.get_seed()) or result.get('folds') != job.get_number_folds():
+        raise ValueError(str(job_filepath) + ' was run with seed ' + str(result.get('seed')) + ' and '
+                         + str(result.get('folds')) + ' folds, not seed ' + str(job.get_seed()) + ' and '
+                         + str(job.get_number_folds()) + ' folds. Run its shard again with the same settings.')
+    return result
+
+
+# The file run_job writes the result of one postreq of a job to.
+def job_result_filepath(job, filename):
+    return job.get_results_folder() / __JOBS_FOLDERNAME / (filename[:-4] + '.pkl')
+
+
+# The fold cache of a job's tree type. The folds of each number of folds are kept in a file of their own, so jobs with
+# different numbers of folds do not overwrite each other's folds.
+def open_fold_cache(job):
+    filename = FOLD_CACHE_FILENAME
+    if job.get_number_folds() != NUMBER_FOLDS:
+        filename = filename[:-4] + '_' + str(job.get_number_folds()) + filename[-4:]
+    return FoldCache.open(job.get_folds_folder() / filename, job.get_number_folds())
+
+
+# Makes and saves the folds of the job's postreqs (or of the given postreq file names) before the jobs start, so the
+# workers only read the fold cache and never write it at the same time.
+def prepare_folds(job, filenames=None):
+    fold_cache = open_fold_cache(job)
+    for filename in job.get_filenames() if filenames is None else filenames:
+        x, y, _ = get_prereq_table(job, str(filename[:-4] + '.csv'))
+        if len(x) >= __MIN_SAMPLES_FOR_PREDICTING:
+            fold_cache.split(filename[:-4], y.fillna(-1).values, job.get_seed())
+    fold_cache.save()
+
+
+# Writes the ALL_COURSES_PREDICTIONS and ALL_COURSES_STATS files of a job from the results of its postreqs, given in
+# postreq file name order.
+def write_all_results(job, results):
+    big_predicted = flatten([result['predicted'] for result in results])
+    big_actual = flatten([result['actual'] for result in results])
+    big_ids = flatten([result['ids'] for result in results])
 
-    big_predicted = []
-    big_actual = []
-    big_ids = []
+    studentIds = pd.DataFrame(big_ids, columns=['student_id'])
+    predictions = pd.DataFrame(big_predicted, columns=['predicted'])
+    actuals = pd.DataFrame(big_actual, columns=['actual'])
+    all_results = pd.concat([studentIds, predictions, actuals], axis=1)
+    run_name = job.get_tree_type().name + "_" + job.get_model_type().name
+    all_results.to_csv(job.get_results_folder() / ('ALL_COURSES_PREDICTIONS_' + run_name + '.csv'), index=False)
 
-    results_each_postreq = [[], [], [], [], []]
+    all_stats = pd.DataFrame({column: [result[column] for result in results]
+                              for column in ['postreq', 'r^2', 'accuracy', 'nrmse', 'n']})
+    all_stats.to_csv(job.get_results_folder() / ('ALL_COURSES_STATS_' + run_name + '.csv'), index=False)
+
+
+def read_predict_write(job, n_jobs=1):
+    if n_jobs != 1:
+        run_predictions([job], n_jobs)
+        return
+
+    print('Training and testing beginning. A counter will print after the completion of each training set. \n')
+    if not os.path.exists(job.get_folds_folder()):
+        os.makedirs(job.get_folds_folder())
+    if not os.path.exists(job.get_results_folder()):
+        os.makedirs(job.get_results_folder())
 
+    results = []
     counter = 0
-    for filename in sorted(os.listdir(__data_folder)):
-        filename = str(filename[:-4] + '.csv')
-        x_train, x_test, y_train, y_test, x_columns, n_samples, ids = stratify_and_split(filename)
-        if n_samples > __MIN_SAMPLES_FOR_PREDICTING:
-            predicted, actual, rr, acc, nrmse, model = predict(filename[:-4], x_train, x_test, y_train, y_test,
-                                                               x_columns)
-
-            big_predicted += list(predicted)
-            big_actual += list(actual)
-            big_ids += list(ids)
-            results_each_postreq[0].append(filename[:-4])
-            results_each_postreq[1].append(rr)
-            results_each_postreq[2].append(acc)
-            results_each_postreq[3].append(nrmse)
-            results_each_postreq[4].append(n_samples)
+    for filename in job.get_filenames():
+        result = predict_course(job, filename)
+        if result is not None:
+            results.append(result)
             print(counter)
             counter += 1
+    open_fold_cache(job).save()
+    write_all_results(job, results)
 
-    studentIds = pd.DataFrame(big_ids, columns=['student_id'])
-    predictions = pd.DataFrame(big_predicted, columns=['predicted'])
-    actuals = pd.DataFrame(big_actual, columns=['actual'])
-    all_results = pd.concat([studentIds, predictions, actuals], axis=1)
-    all_results.to_csv(__results_folder / ('ALL_COURSES_PREDICTIONS_' + __tree_type.name + "_" + __model_enum.name
-                                           + '.csv'), index=False)
+    print('Model training, testing, and evaluation completed. Files saved to: \'' + str(job.get_results_folder())
+          + '\' \n')
 
-    all_stats = pd.DataFrame(
-        {'postreq': results_each_postreq[0], 'r^2': results_each_postreq[1], 'accuracy': results_each_postreq[2],
-         'nrmse': results_each_postreq[3], 'n': results_each_postreq[4]})
-    all_stats.to_csv(__results_folder / ('ALL_COURSES_STATS_' + __tree_type.name + "_" + __model_enum.name + '.csv'),
-                     index=False)
 
-    print('Model training, testing, and evaluation completed. Files saved to: \'' + str(__results_folder) + '\' \n')
+# Lists the (job, postreq file name) tasks of jobs in a fixed order and keeps every shards-th one, starting from the
+# shard-th. Machines given the same jobs and different shard numbers split the tasks between them.
+def shard_tasks(jobs, shard=0, shards=1):
+    if not 0 <= shard < shards:
+        raise ValueError('The shard must be from 0 to ' + str(shards - 1) + ', got: ' + str(shard))
+    tasks = [(job, filename) for job in jobs for filename in job.get_filenames()]
+    return tasks[shard::shards]
 
 
-def save_models():
+# Runs the predictions of several jobs with every (job, postreq) task spread across a pool of n_jobs processes. Each
+# task writes its own result file, and the results of each job are put together in postreq file name order afterwards,
+# so the ALL_COURSES files are the same as those of a serial run. When the tasks are split into shards only the tasks
+# of the given shard are run, and merge_results writes the ALL_COURSES files once every shard has completed.
+def run_predictions(jobs, n_jobs=-1, shard=0, shards=1):
+    print('Training and testing beginning in parallel. Files will be saved once every job has completed. \n')
+    start_time = time.time()
+    tasks = shard_tasks(jobs, shard, shards)
+    prepared = set()
+    for job in jobs:
+        if not os.path.exists(job.get_results_folder()):
+            os.makedirs(job.get_results_folder())
+        fold_key = (job.get_folds_folder(), job.get_number_folds(), job.get_seed())
+        filenames = [filename for task_job, filename in tasks
+                     if task_job is job and (fold_key, filename) not in prepared]
+        prepare_folds(job, filenames)
+        prepared.update((fold_key, filename) for filename in filenames)
+
+    # run_job is taken from the imported module, so the workers import it by name instead of being sent a copy of the
+    # functions of the script this was started from.
+    job_function = importlib.import_module('postrequisite_prediction.Predict').run_job
+    with parallel_backend('loky', n_jobs=n_jobs):
+        job_filepaths = Parallel(verbose=5)(delayed(job_function)(job, filename) for job, filename in tasks)
+
+    if shards > 1:
+        print('Shard ' + str(shard) + ' of ' + str(shards) + ' completed in ' + str(round(time.time() - start_time, 2))
+              + 's. Merge the results once every shard has completed. \n')
+        return
+
+    for job in jobs:
+        results = []
+        for (task_job, _), job_filepath in zip(tasks, job_filepaths):
+            if task_job is job and job_filepath is not None:
+                results.append(read_job_result(job, job_filepath))
+        write_all_results(job, results)
+        print(job.get_tree_type().name + ":" + job.get_model_type().name + ' saved to: \''
+              + str(job.get_results_folder()) + '\'')
+
+    print('Model training, testing, and evaluation completed in ' + str(round(time.time() - start_time, 2)) + 's. \n')
+
+
+# Writes the ALL_COURSES files of a job from the result files its tasks wrote, for runs split into shards. Every result
+# file must have been written with the job's seed and number of folds.
+def merge_results(job):
+    results = []
+    for filename in job.get_filenames():
+        job_filepath = job_result_filepath(job, filename)
+        if os.path.exists(job_filepath):
+            results.append(read_job_result(job, job_filepath))
+    write_all_results(job, results)
+    print(job.get_tree_type().name + ":" + job.get_model_type().name + ' merged ' + str(len(results))
+          + ' postreqs to: \'' + str(job.get_results_folder()) + '\'')
+
+
+# Fits and saves the model of every tuned postreq of a job (or of the given postreq file names).
+def save_models(job, n_jobs=-1, filenames=None):
     print('Model saving beginning. \n')
     start_time = time.time()
-    if not os.path.exists(__model_output):
-        os.makedirs(__model_output)
+    if not os.path.exists(job.get_model_output()):
+        os.makedirs(job.get_model_output())
 
-    with parallel_backend('loky', n_jobs=-1):
-        Parallel()(delayed(dump_model)(filename) for filename in os.listdir(__tuning_results_folder))
+    filenames = set(job.get_filenames() if filenames is None else filenames)
+    with parallel_backend('loky', n_jobs=n_jobs):
+        Parallel()(delayed(dump_model)(job, filename) for filename in os.listdir(job.get_tuning_results_folder())
+                   if filename.endswith('.npy') and filename[:-4] + '.csv' in filenames)
 
     print('Model saving completed in ' + str(round(time.time() - start_time, 2)) + 's. Files saved to: '
-          + str(__model_output) + '\n')
+          + str(job.get_model_output()) + '\n')
 
 
-def dump_model(filename):
+def dump_model(job, filename):
     filename = str(filename[:-4] + '.csv')
-    x, y, _ = get_prereq_table(filename)
+    x, y, _ = get_prereq_table(job, filename)
     x_columns = list(x.columns.values)
     x = x.fillna(-1).values
     y = y.fillna(-1).values
 
-    if not os.path.exists(__tuning_results_folder / (filename[:-4] + '.npy')):
+    if not os.path.exists(job.get_tuning_results_folder() / (filename[:-4] + '.npy')):
         read_dictionary = None
     else:
-        read_dictionary = np.load(__tuning_results_folder / (filename[:-4] + '.npy'), allow_pickle=True).item()
+        read_dictionary = np.load(job.get_tuning_results_folder() / (filename[:-4] + '.npy'), allow_pickle=True).item()
 
-    if __model_enum == __MODEL_TYPES_ENUM.LOGISTIC_REGRESSION:
+    if job.get_model_type() == MODEL_TYPES_ENUM.LOGISTIC_REGRESSION:
         if read_dictionary is None:
-            model = LogisticRegression(random_state=__RANDOM_SEED)
+            model = LogisticRegression(random_state=job.get_seed())
         else:
-            model = LogisticRegression(random_state=__RANDOM_SEED, **read_dictionary)
-    elif __model_enum == __MODEL_TYPES_ENUM.GBT_CLASSIFIER:
+            model = LogisticRegression(random_state=job.get_seed(), **read_dictionary)
+    elif job.get_model_type() == MODEL_TYPES_ENUM.GBT_CLASSIFIER:
         if read_dictionary is None:
-            model = GradientBoostingClassifier(random_state=__RANDOM_SEED)
+            model = GradientBoostingClassifier(random_state=job.get_seed())
         else:
-            model = GradientBoostingClassifier(random_state=__RANDOM_SEED, **read_dictionary)
-    elif __model_enum == __MODEL_TYPES_ENUM.NU_SVR:
+            model = GradientBoostingClassifier(random_state=job.get_seed(), **read_dictionary)
+    elif job.get_model_type() == MODEL_TYPES_ENUM.NU_SVR:
         if read_dictionary is None:
             model = NuSVR()
         else:
             model = NuSVR(**read_dictionary)
-    elif __model_enum == __MODEL_TYPES_ENUM.GBT_REGRESSOR:
-        model = GradientBoostingRegressor(random_state=__RANDOM_SEED)
-    elif __model_enum == __MODEL_TYPES_ENUM.RANDOM_FOREST_REGRESSOR:
+    elif job.get_model_type() == MODEL_TYPES_ENUM.GBT_REGRESSOR:
+        # fit with the default parameters like in predict, whose cross validation stats are saved with the model
+        read_dictionary = None
+        model = GradientBoostingRegressor(random_state=job.get_seed())
+    elif job.get_model_type() == MODEL_TYPES_ENUM.RANDOM_FOREST_REGRESSOR:
         if read_dictionary is None:
-            model = RandomForestRegressor(random_state=__RANDOM_SEED)
+            model = RandomForestRegressor(random_state=job.get_seed())
         else:
-            model = RandomForestRegressor(**read_dictionary, random_state=__RANDOM_SEED)
+            model = RandomForestRegressor(**read_dictionary, random_state=job.get_seed())
 
     model.fit(x, y)
 
-    pickle.dump(model, open(__model_output / (filename[:-4] + '.pkl'), 'wb'))
-
-
-def model_selection_string():
-    string = "Enter one of the following for model type: \n"
-    for m_type in __MODEL_TYPES_ENUM:
-        string += " '" + str(m_type.value) + "': " + m_type.name + " \n"
-    return string
-
-
-if __name__ == "__main__":
-
-    tune_or_predict = int(input("Enter one of the following process types: \n"
-                                "'1': Tune hyperparameters \n"
-                                "'2': Run predictions \n"
-                                "'3': Save models \n"
-                                "'4': Run All Predictions \n"
-                                "'5': Tuning batch \n"))
-
-    if tune_or_predict != 1 and tune_or_predict != 2 and tune_or_predict != 3 and tune_or_predict != 4 and tune_or_predict != 5:
-        raise ValueError('An invalid process type was passed. Must be \'1\', \'2\',\'3\', or \'4\'')
-
-    if tune_or_predict == 4:
-        for tree_type in __TREE_TYPES_ENUM:
-            for model_type in __MODEL_TYPES_ENUM:
-                __model_enum = model_type
-                __tree_type = tree_type
-                __data_folder, __folds_folder, __results_folder, __tuning_results_folder, __model_output = set_paths()
-                print(str(__tree_type.name) + ":" + str(__model_enum.name))
-                read_predict_write()
-    elif tune_or_predict == 5:
-        for tree_type in __TREE_TYPES_ENUM:
-            for model_type in __MODEL_TYPES_ENUM:
-                if not (model_type == __MODEL_TYPES_ENUM.MEAN_ZEROR or model_type == __MODEL_TYPES_ENUM.MOD_ZEROR):
-                    __model_enum = model_type
-                    __tree_type = tree_type
-                    __data_folder, __folds_folder, __results_folder, __tuning_results_folder, __model_output = set_paths()
-                    print(str(__tree_type.name) + ":" + str(__model_enum.name))
-                    hyperparameter_tuning()
-    else:
-        __tree_type = int(input("Enter one of the following for prereq type: \n '1': Root prerequisites \n"
-                                " '2': Immediate prerequisites \n '3': All prerequisites \n"))
-
-        if __tree_type not in __TREE_TYPES_ENUM._value2member_map_:
-            raise ValueError('An invalid tree type was passed.')
+    ModelRegistry.save(job.get_model_output(), filename[:-4], model, x_columns, x, y, course_metrics(job, filename),
+                       model_type=job.get_model_type().name, tree_type=job.get_tree_type().name,
+                       tuned=read_dictionary is not None)
+
+
+# The cross validation stats of a job's model type on a postreq, empty when its predictions have not been run.
+def course_metrics(job, filename):
+    metrics_filepath = job.get_results_folder() / ('ALL_COURSES_STATS_' + job.get_tree_type().name + "_"
+                                                   + job.get_model_type().name + '.csv')
+    if not os.path.exists(metrics_filepath):
+        return {}
+    all_stats = pd.read_csv(metrics_filepath)
+    course_stats = all_stats[all_stats['postreq'] == filename[:-4]]
+    if course_stats.empty:
+        return {}
+    return course_stats.iloc[0].drop('postreq').to_dict()
+
+
+# Moves the models older versions of save_models pickled to <model output>/<postreq>.pkl into the job's ModelRegistry,
+# so they can be used by BatchPredictor and the PredictionService without being fit again. The feature columns and the
+# data fingerprint are those of the postreq's current prereq table, a model whose number of features does not match it
+# is skipped. The .pkl files are left where they are.
+def import_legacy_models(job, filenames=None):
+    filenames = set(job.get_filenames() if filenames is None else filenames)
+    if not os.path.exists(job.get_model_output()):
+        return
+    for legacy_filename in sorted(os.listdir(job.get_model_output())):
+        filename = legacy_filename[:-4] + '.csv'
+        if not legacy_filename.endswith('.pkl') or filename not in filenames:
+            continue
+        with open(job.get_model_output() / legacy_filename, 'rb') as legacy_file:
+            model = pickle.load(legacy_file)
+        x, y, _ = get_prereq_table(job, filename)
+        if getattr(model, 'n_features_in_', len(x.columns)) != len(x.columns):
+            print(legacy_filename + ' was fit on ' + str(model.n_features_in_) + ' prereqs, its table now has '
+                  + str(len(x.columns)) + '. Skipping it, save it again instead.')
+            continue
+        ModelRegistry.save(job.get_model_output(), filename[:-4], model, list(x.columns), x.fillna(-1).values,
+                           y.fillna(-1).values, course_metrics(job, filename), model_type=job.get_model_type().name,
+                           tree_type=job.get_tree_type().name, imported_from=legacy_filename)
+        print(legacy_filename + ' imported.')
+
+
+# Makes a job for every combination of the given tree types and model types, all with the same settings.
+def make_jobs(tree_types, model_types, courses=None, number_folds=NUMBER_FOLDS, seed=RANDOM_SEED, output_root='.',
+              table_cache=None, grade_matrices=None):
+    return [PredictJob(tree_type, model_type, courses, number_folds, seed, output_root, table_cache, grade_matrices)
+            for tree_type in tree_types for model_type in model_types]
+
+
+def parse_arguments(arguments=None):
+    parser = argparse.ArgumentParser(
+        description='Tunes, runs and saves the postreq grade models of every combination of the given tree types and '
+                    'model types.',
+        epilog='Arguments can also be read from a file given as @file, one argument per line, so an experiment grid '
+               'can be kept in a config file.', fromfile_prefix_chars='@')
+    parser.add_argument('process', choices=['tune', 'predict', 'merge', 'save', 'import'],
+                        help='tune hyperparameters, run predictions, merge the results of a sharded prediction run, '
+                             'save the tuned models or import the .pkl models of older versions into the registry')
+    parser.add_argument('--tree-types', nargs='+', choices=[tree_type.name for tree_type in TREE_TYPES_ENUM],
+                        default=[tree_type.name for tree_type in TREE_TYPES_ENUM])
+    parser.add_argument('--model-types', nargs='+', choices=[model_type.name for model_type in MODEL_TYPES_ENUM],
+                        help='every model type by default, every tunable one for tune, save and import')
+    parser.add_argument('--courses', nargs='+', help='postreq course names, every postreq by default')
+    parser.add_argument('--folds', type=int, default=NUMBER_FOLDS, help='number of cross validation folds')
+    parser.add_argument('--seed', type=int, default=RANDOM_SEED, help='random seed of the folds and the models')
+    parser.add_argument('--output-root', default='.', help='folder the results, tuning results and models go under')
+    parser.add_argument('--table-cache', help='folder to also cache the parsed prereq tables in, for the workers and '
+                                              'later runs')
+    parser.add_argument('--grade-matrices', nargs='?', const=str(__GRADE_MATRICES_FOLDER),
+                        help='build the prereq tables from the grade matrices in this folder ('
+                             + str(__GRADE_MATRICES_FOLDER) + ' when no folder is given) instead of reading the '
+                             'prereq table csvs')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='number of processes, -1 for one per CPU')
+    parser.add_argument('--shard', type=int, default=0, help='the shard of the tasks to run, from 0')
+    parser.add_argument('--shards', type=int, default=1, help='the number of shards the tasks are split into')
+    arguments = parser.parse_args(arguments)
+
+    if arguments.model_types is None:
+        if arguments.process in ('tune', 'save', 'import'):
+            arguments.model_types = [model_type.name for model_type in __TUNING_METHODS]
         else:
-            __tree_type = __TREE_TYPES_ENUM(__tree_type)
-
-        __model_enum = int(input(model_selection_string()))
-        print(__model_enum)
-        if __model_enum not in __MODEL_TYPES_ENUM._value2member_map_:
-            raise ValueError('An invalid model type was passed.')
-        else:
-            __model_enum = __MODEL_TYPES_ENUM(__model_enum)
+            arguments.model_types = [model_type.name for model_type in MODEL_TYPES_ENUM]
+    untunable = [name for name in arguments.model_types if MODEL_TYPES_ENUM[name] not in __TUNING_METHODS]
+    if arguments.process in ('tune', 'save') and untunable:
+        parser.error('These model types can not be tuned or saved: ' + ', '.join(untunable))
+    if not 0 <= arguments.shard < arguments.shards:
+        parser.error('--shard must be from 0 to --shards - 1')
+    return arguments
+
+
+def main(arguments=None):
+    arguments = parse_arguments(arguments)
+    jobs = make_jobs(arguments.tree_types, arguments.model_types, arguments.courses, arguments.folds, arguments.seed,
+                     arguments.output_root, arguments.table_cache, arguments.grade_matrices)
+
+    if arguments.process == 'predict':
+        run_predictions(jobs, arguments.n_jobs, arguments.shard, arguments.shards)
+    elif arguments.process == 'merge':
+        for job in jobs:
+            merge_results(job)
+    else:
+        tasks = shard_tasks(jobs, arguments.shard, arguments.shards)
+        for job in jobs:
+            filenames = [filename for task_job, filename in tasks if task_job is job]
+            if not filenames:
+                continue
+            print(job.get_tree_type().name + ":" + job.get_model_type().name)
+            if arguments.process == 'tune':
+                hyperparameter_tuning(job, arguments.n_jobs, filenames)
+            elif arguments.process == 'import':
+                import_legacy_models(job, filenames)
+            else:
+                save_models(job, arguments.n_jobs, filenames)
 
-        __data_folder, __folds_folder, __results_folder, __tuning_results_folder, __model_output = set_paths()
 
-        if tune_or_predict == 1:
-            hyperparameter_tuning()
-        elif tune_or_predict == 2:
-            read_predict_write()
-        elif tune_or_predict == 3:
-            save_models()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Configuration of one Predict experiment: a tree type, a model type, the postreqs to run it on, the number of folds, the
+random seed, the root folder its outputs are written under, an optional folder to cache the parsed prereq tables in
+and an optional grade matrices folder to build the prereq tables from. Predict's functions take the job they work for
+instead of reading module level settings, so several jobs can be run in one process, sent to worker processes, or split
+across machines.
+
+How to use: Make jobs with PredictJob (or Predict's make_jobs for a whole grid of tree types and model types) and
+hand them to Predict's read_predict_write, run_predictions, hyperparameter_tuning or save_models. Running Predict.py
+does the same from the command line.
+
+Note: The prereq tables and folds are read from data/ in the working folder, the prereq tables are only built from
+grade matrices when the job is given their folder. Only the results, tuning results, tuning logs and models go under
+the output root, which is the working folder by default so the outputs are where they always were.
+"""
+
+import enum
+import os
+from pathlib import Path
+
+import numpy as np
+
+from postrequisite_prediction.GeneratePrereqTables import output_filename
+
+MODEL_TYPES_ENUM = enum.IntEnum('MODEL_TYPES_ENUM', 'LOGISTIC_REGRESSION GBT_CLASSIFIER NU_SVR GBT_REGRESSOR '
+                                                    'RANDOM_FOREST_REGRESSOR MOD_ZEROR MEAN_ZEROR')
+TREE_TYPES_ENUM = enum.IntEnum('TREE_TYPES_ENUM', 'ROOT IMMEDIATE ALL')
+NUMBER_FOLDS = 5
+RANDOM_SEED = 313131
+
+
+class PredictJob:
+    def __init__(self, tree_type, model_type, courses=None, number_folds=NUMBER_FOLDS, seed=RANDOM_SEED,
+                 output_root='.', table_cache=None, grade_matrices=None):
+        """
+        The constructor for a PredictJob object.
+        :param tree_type: TREE_TYPES_ENUM member or name, 'ROOT', 'IMMEDIATE' or 'ALL'
+        :param model_type: MODEL_TYPES_ENUM member or name, for example 'GBT_CLASSIFIER'
+        :param courses: optional list of the postreq course names to run, every postreq with a prereq table by default
+        :param number_folds: the number of cross validation folds
+        :param seed: the random seed of the folds and the models
+        :param output_root: the folder the results, tuning results, tuning logs and models are written under
+        :param table_cache: optional folder to cache the parsed prereq tables in as .npz files, by default they are
+        only cached in the memory of each process
+        :param grade_matrices: optional folder of the grade matrices (see GradeMatrices.py) to build the prereq tables
+        from, by default the prereq table csvs are read
+        """
+        self._tree_type = tree_type if isinstance(tree_type, TREE_TYPES_ENUM) else TREE_TYPES_ENUM[tree_type]
+        self._model_type = model_type if isinstance(model_type, MODEL_TYPES_ENUM) else MODEL_TYPES_ENUM[model_type]
+        self._courses = None if courses is None else tuple(courses)
+        if number_folds < 2:
+            raise ValueError('A job needs at least 2 folds, got: ' + str(number_folds))
+        self._number_folds = int(number_folds)
+        self._seed = np.int64(seed)
+        self._output_root = Path(output_root)
+        self._table_cache = None if table_cache is None else Path(table_cache)
+        self._grade_matrices = None if grade_matrices is None else Path(grade_matrices)
+
+    def __repr__(self):
+        return 'PredictJob(' + self._tree_type.name + ', ' + self._model_type.name + ')'
+
+    def get_tree_type(self):
+        return self._tree_type
+
+    def get_model_type(self):
+        return self._model_type
+
+    def get_number_folds(self):
+        return self._number_folds
+
+    def get_seed(self):
+        return self._seed
+
+    def get_data_folder(self):
+        return Path('data/' + self._tree_type.name + 'PrereqTables/')
+
+    def get_folds_folder(self):
+        return Path('data/' + self._tree_type.name + 'PrereqFolds/')
+
+    def get_table_cache_folder(self):
+        return self._table_cache
+
+    def get_grade_matrices_folder(self):
+        return self._grade_matrices
+
+    def get_results_folder(self):
+        return self._output_root / ('results/' + self._tree_type.name + 'Prereq_' + self._model_type.name + '_Results/')
+
+    def get_tuning_results_folder(self):
+        return self._output_root / ('TuningResults/' + self._tree_type.name + '/' + self._model_type.name + '/')
+
+    def get_tuning_logs_folder(self):
+        return self._output_root / ('TuningLogs/' + self._tree_type.name + '/' + self._model_type.name + '/')
+
+    def get_model_output(self):
+        return self._output_root / ('models/' + self._model_type.name + '_model_' + self._tree_type.name + '/')
+
+    def get_filenames(self):
+        """
+        Gets the prereq table file names of the job's postreqs.
+        :return: sorted list of the file names in the data folder, only those of the job's courses when it has any
+        """
+        filenames = sorted(os.listdir(self.get_data_folder()))
+        if self._courses is None:
+            return filenames
+        wanted = set(output_filename(course) for course in self._courses)
+        unknown = [course for course in self._courses if output_filename(course) not in filenames]
+        if unknown:
+            raise ValueError('No ' + self._tree_type.name + ' prereq table for: ' + ', '.join(unknown))
+        return [filename for filename in filenames if filename in wanted]
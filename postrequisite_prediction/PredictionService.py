@@ -0,0 +1,415 @@
+"""
+Local HTTP/JSON service for postreq grade and graduation predictions, built only on the standard library so it runs
+fully offline. Loaded models are kept in a bounded least recently used cache shared by every model type, tree type and
+graduation term, so the service only holds the models it is being asked about. Requests that arrive within a few
+milliseconds of each other are micro-batched: they are put together by model so each model runs once on the rows of all
+of them. Every response reports the latency of its request and the latency percentiles of the recent requests.
+
+How to use: Run this file (see --help for the options), then send JSON requests:
+    POST /predict/postreq     {"model_type": "GBT_CLASSIFIER", "tree_type": "ALL", "students": [...], "courses": [...]}
+    POST /predict/graduation  {"term": "first_term", "rows": [{"first term gpa": 3.1, "first term standing": 1}, ...]}
+Either endpoint also takes {"requests": [...]} with several requests, answered in the same order, where a request
+that can not be answered gets {"error": ...} in place of its predictions. GET /stats gives the latency percentiles and
+the model cache use, GET /health checks that the service is up.
+
+Note: Postreq models are read from the registries Predict's save_models writes (see BatchPredictor). Graduation
+models are read from a ModelRegistry folder given with --graduation-models, saved with ModelRegistry.save under their
+term name (first_term, second_term, ...) with their feature columns. Without that folder the graduation endpoint
+answers with an error.
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from postrequisite_prediction.BatchPredictor import BatchPredictor, default_grades
+from postrequisite_prediction.GeneratePrereqTables import output_filename
+from postrequisite_prediction.ModelRegistry import ModelRegistry
+from postrequisite_prediction.PredictJob import MODEL_TYPES_ENUM, TREE_TYPES_ENUM
+
+
+class ModelCache:
+    def __init__(self, maximum_size):
+        """
+        The constructor for a ModelCache object, a thread safe least recently used cache of loaded models.
+        :param maximum_size: the most models to keep loaded
+        """
+        self._maximum_size = maximum_size
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, registry, course):
+        """
+        Gets a model, loading it from its registry when it is not in the cache and dropping the least recently used
+        model when the cache is full.
+        :param registry: the ModelRegistry of the model
+        :param course: the course (or term) name of the model in the registry
+        :return: the fitted model
+        """
+        key = (str(registry.get_folder()), course)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self._hits += 1
+                return self._models[key]
+            self._misses += 1
+        model = registry.load_model(course)
+        with self._lock:
+            self._models[key] = model
+            self._models.move_to_end(key)
+            while len(self._models) > self._maximum_size:
+                self._models.popitem(last=False)
+        return model
+
+    def info(self):
+        with self._lock:
+            return {'size': len(self._models), 'maximum_size': self._maximum_size, 'hits': self._hits,
+                    'misses': self._misses}
+
+
+class MicroBatcher:
+    def __init__(self, handle_batch, maximum_batch_size=64, maximum_wait=0.005):
+        """
+        The constructor for a MicroBatcher object. Starts a thread that takes submitted requests off a queue, waits up
+        to maximum_wait seconds for more, and hands the requests with the same key to handle_batch together. When a
+        batch fails its requests are handled again one at a time, so an error only fails the request that caused it.
+        :param handle_batch: function of a key and a list of request payloads that returns the list of their results
+        :param maximum_batch_size: the most requests to put in one batch
+        :param maximum_wait: seconds to wait for more requests after the first one of a batch
+        """
+        self._handle_batch = handle_batch
+        self._maximum_batch_size = maximum_batch_size
+        self._maximum_wait = maximum_wait
+        self._queue = queue.Queue()
+        threading.Thread(target=self.__run, daemon=True).start()
+
+    def submit(self, key, payload):
+        """
+        Submits a request without waiting for it, so several requests of one caller can share a batch.
+        :param key: requests with equal keys can be batched together
+        :param payload: the request
+        :return: Future of the result handle_batch gives for the request, or of the error it raised for the request
+        """
+        future = Future()
+        self._queue.put((key, payload, future))
+        return future
+
+    def __run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._maximum_wait
+            while len(batch) < self._maximum_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            groups = OrderedDict()
+            for key, payload, future in batch:
+                groups.setdefault(key, []).append((payload, future))
+            for key, requests in groups.items():
+                try:
+                    results = self._handle_batch(key, [payload for payload, _ in requests])
+                except Exception as error:
+                    if len(requests) == 1:
+                        requests[0][1].set_exception(error)
+                    else:
+                        self.__run_one_at_a_time(key, requests)
+                    continue
+                for (_, future), result in zip(requests, results):
+                    future.set_result(result)
+
+    def __run_one_at_a_time(self, key, requests):
+        for payload, future in requests:
+            try:
+                future.set_result(self._handle_batch(key, [payload])[0])
+            except Exception as error:
+                future.set_exception(error)
+
+
+class PredictionService:
+    __POSTREQ = 'postreq'
+    __GRADUATION = 'graduation'
+    __PERCENTILES = (50, 90, 95, 99)
+
+    def __init__(self, models_folder=None, grades=None, graduation_folder=None, cache_size=64, maximum_batch_size=64,
+                 maximum_wait=0.005, latency_window=10000):
+        """
+        The constructor for a PredictionService object.
+        :param models_folder: the folder Predict's save_models saves into, models/ by default
+        :param grades: optional GradeStore or GradeMatrices to read prereq grades from, see BatchPredictor.open
+        :param graduation_folder: optional ModelRegistry folder of the graduation models
+        :param cache_size: the most models to keep loaded
+        :param maximum_batch_size: the most requests to put in one micro-batch
+        :param maximum_wait: seconds to wait for more requests to put in a micro-batch
+        :param latency_window: the number of recent requests the latency percentiles are taken over
+        """
+        self._models_folder = models_folder
+        self._grades = default_grades() if grades is None else grades
+        self._graduation_registry = None if graduation_folder is None else ModelRegistry.open(graduation_folder)
+        self._model_cache = ModelCache(cache_size)
+        self._predictors = {}
+        self._predictors_lock = threading.Lock()
+        self._batcher = MicroBatcher(self.__handle_batch, maximum_batch_size, maximum_wait)
+        self._latencies = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+
+    def predict(self, kind, body):
+        """
+        Answers a request body of an endpoint, with its latency and the recent latency percentiles.
+        :param kind: 'postreq' or 'graduation'
+        :param body: the decoded JSON body, one request or {"requests": [...]}
+        :return: dictionary to send back as JSON
+        """
+        start = time.perf_counter()
+        if not self.has_endpoint(kind):
+            raise ValueError('Unknown endpoint: ' + str(kind))
+        if not isinstance(body, dict):
+            raise ValueError('A request body must be a JSON object.')
+        if 'requests' in body:
+            if not isinstance(body['requests'], list):
+                raise ValueError('requests must be a list.')
+            results = [self.__error_result(future) for future in
+                       [self.__submit(kind, request) for request in body['requests']]]
+        else:
+            results = [self.__submit(kind, body).result()]
+        latency = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._latencies.append(latency)
+        response = {'results': results} if 'requests' in body else results[0]
+        response['latency_ms'] = latency
+        response['latency_percentiles_ms'] = self.latency_percentiles()
+        return response
+
+    def has_endpoint(self, kind):
+        return kind in (self.__POSTREQ, self.__GRADUATION)
+
+    def latency_percentiles(self):
+        with self._lock:
+            latencies = np.array(self._latencies)
+        if len(latencies) == 0:
+            return {}
+        return {'p' + str(percentile): float(value) for percentile, value in
+                zip(self.__PERCENTILES, np.percentile(latencies, self.__PERCENTILES))}
+
+    def stats(self):
+        with self._lock:
+            number_requests = len(self._latencies)
+        return {'requests': number_requests, 'latency_percentiles_ms': self.latency_percentiles(),
+                'model_cache': self._model_cache.info()}
+
+    def __submit(self, kind, request):
+        """
+        Checks a request and submits it to the micro-batcher, a request that fails its checks gets a Future of the
+        error so it does not reach a batch.
+        """
+        try:
+            key = self.__key(kind, request)
+        except ValueError as error:
+            future = Future()
+            future.set_exception(error)
+            return future
+        return self._batcher.submit(key, request)
+
+    @staticmethod
+    def __error_result(future):
+        """
+        The result of one request of a {"requests": [...]} body, {"error": ...} when the request failed.
+        """
+        try:
+            return future.result()
+        except (KeyError, ValueError, TypeError) as error:
+            return {'error': str(error)}
+        except Exception as error:
+            return {'error': type(error).__name__ + ': ' + str(error)}
+
+    def __key(self, kind, request):
+        """
+        Gets the micro-batch key of a request, requests for the same models are batched together. Checks every field
+        the batch reads, so one malformed request can not fail the others of its batch, and the model and tree types
+        against their enums before they are used in a model folder path.
+        """
+        if not isinstance(request, dict):
+            raise ValueError('A request must be a JSON object.')
+        if kind == self.__POSTREQ:
+            for field in ('model_type', 'tree_type', 'students', 'courses'):
+                if field not in request:
+                    raise ValueError('A postreq request needs a ' + field + '.')
+            if request['model_type'] not in MODEL_TYPES_ENUM.__members__:
+                raise ValueError('Unknown model_type: ' + str(request['model_type']))
+            if request['tree_type'] not in TREE_TYPES_ENUM.__members__:
+                raise ValueError('Unknown tree_type: ' + str(request['tree_type']))
+            if not isinstance(request['students'], list) or \
+                    not all(isinstance(student, (int, str)) and not isinstance(student, bool)
+                            for student in request['students']):
+                raise ValueError('students must be a list of student ids (numbers or strings).')
+            if not isinstance(request['courses'], list) or \
+                    not all(isinstance(course, str) for course in request['courses']):
+                raise ValueError('courses must be a list of course names.')
+            predictor = self.__predictor(request['model_type'], request['tree_type'])
+            unknown = [course for course in request['courses']
+                       if not predictor.get_registry().has_course(output_filename(course)[:-4])]
+            if unknown:
+                raise ValueError('No model is saved for: ' + ', '.join(unknown))
+            return kind, request['model_type'], request['tree_type']
+
+        for field in ('term', 'rows'):
+            if field not in request:
+                raise ValueError('A graduation request needs ' + field + '.')
+        term = request['term']
+        if not isinstance(term, str) or self._graduation_registry is None or \
+                not self._graduation_registry.has_course(term):
+            raise ValueError('No graduation model is saved for: ' + str(term))
+        if not isinstance(request['rows'], list) or not all(isinstance(row, dict) for row in request['rows']):
+            raise ValueError('rows must be a list of JSON objects.')
+        missing = [column for column in self._graduation_registry.get_columns(term)
+                   if any(column not in row for row in request['rows'])]
+        if missing:
+            raise ValueError('Graduation rows of ' + term + ' need: ' + ', '.join(missing))
+        return kind, term
+
+    def __predictor(self, model_type, tree_type):
+        """
+        Gets the BatchPredictor of a model type and tree type, opening it the first time it is asked for.
+        """
+        with self._predictors_lock:
+            if (model_type, tree_type) not in self._predictors:
+                self._predictors[(model_type, tree_type)] = BatchPredictor.open(
+                    model_type, tree_type, self._models_folder, self._grades, self._model_cache)
+            return self._predictors[(model_type, tree_type)]
+
+    def __handle_batch(self, key, requests):
+        if key[0] == self.__POSTREQ:
+            return self.__predict_postreq(key[1], key[2], requests)
+        return self.__predict_graduation(key[1], requests)
+
+    def __predict_postreq(self, model_type, tree_type, requests):
+        """
+        Predicts a batch of postreq requests of one model type and tree type, running each course's model once on the
+        students of every request that asks for that course.
+        """
+        predictor = self.__predictor(model_type, tree_type)
+
+        course_rows = {}
+        for course in dict.fromkeys(course for request in requests for course in request['courses']):
+            students = list(dict.fromkeys(student for request in requests if course in request['courses']
+                                          for student in request['students']))
+            predictions = predictor.predict_batch(students, [course])
+            course_rows[course] = dict(zip(students, self.__to_records(predictions)))
+        return [{'predictions': [course_rows[course][student] for course in request['courses']
+                                 for student in request['students']]} for request in requests]
+
+    def __predict_graduation(self, term, requests):
+        """
+        Predicts a batch of graduation requests of one term with one run of the term's model.
+        """
+        if self._graduation_registry is None or not self._graduation_registry.has_course(term):
+            raise ValueError('No graduation model is saved for: ' + str(term))
+        columns = self._graduation_registry.get_columns(term)
+        rows = [row for request in requests for row in request['rows']]
+        missing = [column for column in columns if any(column not in row for row in rows)]
+        if missing:
+            raise ValueError('Graduation rows of ' + str(term) + ' need: ' + ', '.join(missing))
+
+        features = pd.DataFrame(rows, columns=columns).to_numpy(dtype=np.float64)
+        model = self._model_cache.get(self._graduation_registry, term)
+        predictions = pd.DataFrame({'graduated': model.predict(features) if len(features) else []})
+        if len(features) and hasattr(model, 'predict_proba'):
+            predictions['probability_graduated'] = model.predict_proba(features)[:, list(model.classes_).index(1)]
+        records = self.__to_records(predictions)
+
+        results = []
+        start = 0
+        for request in requests:
+            results.append({'predictions': records[start:start + len(request['rows'])]})
+            start += len(request['rows'])
+        return results
+
+    @staticmethod
+    def __to_records(data_frame):
+        """
+        Converts a data frame to a list of JSON ready dictionaries, with None for NaN and plain Python numbers.
+        """
+        data_frame = data_frame.astype(object).where(data_frame.notna(), None)
+        return [{column: value.item() if isinstance(value, np.generic) else value for column, value in record.items()}
+                for record in data_frame.to_dict('records')]
+
+
+class PredictionRequestHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.__send(200, {'status': 'ok'})
+        elif self.path == '/stats':
+            self.__send(200, self.service.stats())
+        else:
+            self.__send(404, {'error': 'Unknown path: ' + self.path})
+
+    def do_POST(self):
+        prefix = '/predict/'
+        kind = self.path[len(prefix):]
+        if not self.path.startswith(prefix) or not self.service.has_endpoint(kind):
+            self.__send(404, {'error': 'Unknown path: ' + self.path})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            self.__send(200, self.service.predict(kind, body))
+        except KeyError as error:
+            self.__send(400, {'error': 'Missing: ' + str(error)})
+        except (ValueError, TypeError) as error:
+            self.__send(400, {'error': str(error)})
+        except Exception as error:
+            self.__send(500, {'error': type(error).__name__ + ': ' + str(error)})
+
+    def log_message(self, format, *args):
+        pass
+
+    def __send(self, status, response):
+        content = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def serve(service, host='127.0.0.1', port=8080):
+    """
+    Serves a PredictionService over HTTP until the process is stopped, answering each connection on its own thread.
+    :param service: the PredictionService
+    :param host: the address to listen on
+    :param port: the port to listen on
+    """
+    handler = type('BoundPredictionRequestHandler', (PredictionRequestHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    print('Serving predictions on http://' + host + ':' + str(server.server_port) + '/')
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serves postreq grade and graduation predictions over HTTP/JSON.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--models', default=None, help="the folder save_models saves into, 'models' by default")
+    parser.add_argument('--graduation-models', default=None, help='ModelRegistry folder of the graduation models')
+    parser.add_argument('--cache-size', type=int, default=64, help='the most models to keep loaded')
+    parser.add_argument('--batch-size', type=int, default=64, help='the most requests in one micro-batch')
+    parser.add_argument('--batch-wait-ms', type=float, default=5, help='milliseconds to wait to fill a micro-batch')
+    arguments = parser.parse_args()
+    serve(PredictionService(arguments.models, graduation_folder=arguments.graduation_models,
+                            cache_size=arguments.cache_size, maximum_batch_size=arguments.batch_size,
+                            maximum_wait=arguments.batch_wait_ms / 1000), arguments.host, arguments.port)
@@ -0,0 +1,133 @@
+"""
+Columnar builder for the prerequisite tables. The student grade list with terms is parsed a single time by GradeStore
+into an integer term matrix and an integer grade matrix (one row per student, one column per course). Each
+postrequisite table is then produced with masked numpy operations over those matrices instead of walking every student
+row and re-splitting the "term,grade" strings for every postrequisite.
+
+How to use: Create a PrereqTableBuilder from the grade list data frame, then call build with a postrequisite name and
+the names of its prerequisites. The data frame returned has the same columns and values as the original row by row
+generators, with the gpa and struggle columns left for the caller to fill.
+"""
+
+import numpy as np
+import pandas as pd
+
+from postrequisite_prediction.GradeMatrices import GradeMatrices
+from postrequisite_prediction.GradeStore import GradeStore
+
+
+class PrereqTableBuilder:
+    __STUDENT_ID = 'student_id'
+    __CUMULATIVE_GPA = 'cumulative_gpa'
+    __PREV_TERM_GPA = 'prev_term_gpa'
+    __STRUGGLE = 'struggle'
+    __TERM_DIFFERENCE = 'term_difference'
+    MISSING = GradeStore.MISSING
+
+    def __init__(self, grades):
+        """
+        The constructor for a PrereqTableBuilder object. Takes in the student grade list with terms, where every cell
+        other than the student id is either empty or a "term,grade" string, or a GradeStore already made from it, or
+        GradeMatrices saved from one. The first attempt of each course is used. With GradeMatrices only the columns of
+        the courses in each table are read.
+        :param grades: data frame read from student_grade_list_with_terms.csv, a GradeStore or GradeMatrices
+        """
+        self._source = grades if isinstance(grades, (GradeStore, GradeMatrices)) else GradeStore.from_grade_list(grades)
+        self._student_ids = self._source.get_student_ids()
+        self._course_index = {course: idx for idx, course in enumerate(self._source.get_courses())}
+
+    def has_course(self, course):
+        """
+        Checks if a course is in the list of taken and existing courses.
+        :param course: the course name
+        :return: True, False
+        """
+        return course in self._course_index
+
+    def get_last_term(self):
+        """
+        Gets the latest term that any grade in the grade list was earned in.
+        :return: the term number, MISSING if the grade list is empty
+        """
+        return self._source.get_last_term()
+
+    def build(self, postrequisite, prerequisite):
+        """
+        Builds the table for one postrequisite. A student is added when they took the postrequisite and at least one
+        prerequisite in or before the postrequisite term. Only those prerequisites get a grade, the earliest of their
+        terms is used for the term difference.
+        :param postrequisite: the postrequisite course name
+        :param prerequisite: list of prerequisite course names, may contain duplicates
+        :return: the data frame, the row of each added student in the grade list, and the earliest prerequisite term
+        of each added student
+        """
+        return self.build_selections(postrequisite, {postrequisite: prerequisite})[postrequisite]
+
+    def build_selections(self, postrequisite, selections):
+        """
+        Builds one table per selection of prerequisites for the same postrequisite, like build. The terms of every
+        prerequisite in any of the selections are compared to the postrequisite term once, and each table is made from
+        its own columns of that comparison.
+        :param postrequisite: the postrequisite course name
+        :param selections: dictionary of lists of prerequisite course names, for example the root, immediate and all
+        prerequisites of the postrequisite
+        :return: dictionary with the same keys as selections, holding what build returns for each selection
+        """
+        selections = {key: [course for course in dict.fromkeys(prerequisite) if course != postrequisite]
+                      for key, prerequisite in selections.items()}
+        if not self.has_course(postrequisite):
+            return {key: (pd.DataFrame(columns=self.__get_columns(postrequisite, prerequisite)),
+                          np.empty(0, dtype=np.intp), np.empty(0, dtype=np.int32))
+                    for key, prerequisite in selections.items()}
+
+        union = list(dict.fromkeys(course for prerequisite in selections.values() for course in prerequisite
+                                   if self.has_course(course)))
+        union_position = {course: position for position, course in enumerate(union)}
+        terms, grades = self._source.columns([postrequisite] + union)
+        postreq_terms = terms[:, 0]
+        union_terms = terms[:, 1:]
+        union_taken = (union_terms != self.MISSING) & (union_terms <= postreq_terms[:, None])
+
+        tables = {}
+        for key, prerequisite in selections.items():
+            taken_prerequisite = [course for course in prerequisite if self.has_course(course)]
+            positions = [union_position[course] for course in taken_prerequisite]
+            taken = union_taken[:, positions]
+            rows = np.flatnonzero((postreq_terms != self.MISSING) & taken.any(axis=1))
+
+            taken = taken[rows]
+            not_taken = np.iinfo(np.int32).max
+            earliest_terms = np.where(taken, union_terms[rows][:, positions], not_taken).min(axis=1,
+                                                                                            initial=not_taken)
+
+            data_frame = pd.DataFrame(index=range(len(rows)), columns=self.__get_columns(postrequisite, prerequisite),
+                                      dtype=object)
+            data_frame[self.__STUDENT_ID] = self._student_ids[rows]
+            data_frame[postrequisite] = self.__to_column(grades[rows, 0])
+            for taken_position, course in enumerate(taken_prerequisite):
+                data_frame[course] = self.__to_column(np.where(taken[:, taken_position],
+                                                               grades[rows, union_position[course] + 1],
+                                                               self.MISSING))
+            data_frame[self.__TERM_DIFFERENCE] = self.__to_column(postreq_terms[rows] - earliest_terms)
+            tables[key] = (data_frame, rows, earliest_terms)
+        return tables
+
+    def __get_columns(self, postrequisite, prerequisite):
+        """
+        Gets the column headers of a table: student id, the postrequisite, the prerequisites, cumulative gpa, previous
+        term gpa, struggle, and term difference.
+        :param postrequisite: the postrequisite course name
+        :param prerequisite: list of unique prerequisite course names
+        :return: list of column headers
+        """
+        return [self.__STUDENT_ID, postrequisite] + prerequisite + \
+               [self.__CUMULATIVE_GPA, self.__PREV_TERM_GPA, self.__STRUGGLE, self.__TERM_DIFFERENCE]
+
+    def __to_column(self, values):
+        """
+        Converts an integer array that uses MISSING for empty cells into a nullable integer column, so that the
+        written csv has empty cells instead of floats.
+        :param values: integer numpy array
+        :return: pandas Int64 array
+        """
+        return pd.arrays.IntegerArray(values.astype(np.int64), values == self.MISSING)
@@ -0,0 +1,144 @@
+"""
+Cache of the prereq tables Predict trains on, so a batch run that goes through every model type of a tree type parses
+each table once per process instead of once per model type. A table is kept as one float32 matrix of its postreq grade
+and prereq grade columns, its student ids, and the column metadata needed to give back the same data frames as reading
+it: the column names and which of the columns hold integers. The tables can also be cached as .npz files, so worker
+processes and later runs load them instead of parsing them again.
+
+How to use: Open the cache with PrereqTableCache.open, with a folder to also cache the tables on disk, and call get with
+the tree type, the course, the files the table is made from and a function that makes it. The function is only called
+when the table is not cached, it returns the (x, y, ids) of get_prereq_table in Predict.
+
+Note: A cached table is made again when the modification time or size of one of its source files changed. Empty
+tables, tables that float32 can not hold exactly and tables with repeated or non number columns are not cached.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+TABLE_SUFFIX = '.npz'
+
+
+class PrereqTableCache:
+    __OPENED = {}
+
+    def __init__(self, folder=None):
+        """
+        The constructor for a PrereqTableCache object.
+        :param folder: optional folder to cache the tables in as .npz files, by default they are only kept in memory
+        """
+        self._folder = None if folder is None else Path(folder)
+        self._tables = {}
+
+    @classmethod
+    def open(cls, folder=None):
+        """
+        Returns the cache of a folder, making it the first time the folder is asked for in this process.
+        :param folder: optional folder to cache the tables in as .npz files
+        :return: the PrereqTableCache
+        """
+        key = None if folder is None else str(Path(folder).resolve())
+        if key not in cls.__OPENED:
+            cls.__OPENED[key] = cls(folder)
+        return cls.__OPENED[key]
+
+    def get(self, tree_type, course, sources, make_table):
+        """
+        Gets a prereq table, from memory, from its .npz file or by making it.
+        :param tree_type: the tree type name of the table
+        :param course: the postreq course name of the table
+        :param sources: the files the table is made from
+        :param make_table: function that makes the table, returning the x, y and ids of get_prereq_table
+        :return: x data frame of the prereq grades, y series of the postreq grades, ids series of the student ids
+        """
+        key = (tree_type, course)
+        stamp = self.__stamp(sources)
+        table = self._tables.get(key)
+        if table is None or not np.array_equal(table['stamp'], stamp):
+            table = self.__read(tree_type, course, stamp)
+            if table is None:
+                x, y, ids = make_table()
+                table = self.__to_table(x, y, ids, stamp)
+                if table is None:
+                    return x, y, ids
+                self.__write(tree_type, course, table)
+            self._tables[key] = table
+        return self.__to_frames(table)
+
+    @staticmethod
+    def __stamp(sources):
+        """
+        The modification time in nanoseconds and the size of every source file, a missing file counts as -1 and -1.
+        """
+        stamp = []
+        for source in sources:
+            try:
+                status = os.stat(source)
+                stamp += [status.st_mtime_ns, status.st_size]
+            except FileNotFoundError:
+                stamp += [-1, -1]
+        return np.array(stamp, dtype=np.int64)
+
+    @staticmethod
+    def __to_table(x, y, ids, stamp):
+        """
+        Packs a table into its float32 values and metadata, None when it can not be packed without changing it.
+        """
+        frame = pd.concat([y, x], axis=1)
+        if frame.empty or frame.columns.duplicated().any() or \
+                not all(pd.api.types.is_numeric_dtype(dtype) for dtype in frame.dtypes) or \
+                not pd.api.types.is_integer_dtype(ids.dtype):
+            return None
+        values = frame.to_numpy(dtype=np.float64)
+        packed = values.astype(np.float32)
+        if not np.array_equal(packed, values, equal_nan=True):
+            return None
+        return {
+            'values': packed,
+            'ids': np.asarray(ids, dtype=np.int64),
+            'columns': np.array([str(column) for column in frame.columns]),
+            'integer': np.array([pd.api.types.is_integer_dtype(dtype) for dtype in frame.dtypes], dtype=bool),
+            'stamp': stamp
+        }
+
+    @staticmethod
+    def __to_frames(table):
+        """
+        Unpacks a table into the data frames of get_prereq_table, with integer columns for the columns that were read
+        as integers.
+        """
+        values = table['values']
+        frame = pd.DataFrame({str(column): values[:, position].astype(np.int64 if integer else np.float64)
+                              for position, (column, integer) in enumerate(zip(table['columns'], table['integer']))})
+        return frame.iloc[:, 1:], frame.iloc[:, 0], pd.Series(table['ids'], name='student_id')
+
+    def __filepath(self, tree_type, course):
+        return self._folder / tree_type / (course + TABLE_SUFFIX)
+
+    def __read(self, tree_type, course, stamp):
+        """
+        Reads a table's .npz file, None when there is no folder, no file, or the file was made from other sources.
+        """
+        if self._folder is None or not self.__filepath(tree_type, course).exists():
+            return None
+        with np.load(self.__filepath(tree_type, course), allow_pickle=False) as arrays:
+            if not np.array_equal(arrays['stamp'], stamp):
+                return None
+            return {key: arrays[key] for key in arrays.files}
+
+    def __write(self, tree_type, course, table):
+        """
+        Writes a table's .npz file when there is a folder. The file is replaced in one step, so a reader never sees a
+        partly written table.
+        """
+        if self._folder is None:
+            return
+        filepath = self.__filepath(tree_type, course)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        temporary_filepath = filepath.with_name(filepath.name[:-len(TABLE_SUFFIX)] + '.tmp' + str(os.getpid())
+                                                + TABLE_SUFFIX)
+        np.savez(temporary_filepath, **table)
+        os.replace(temporary_filepath, filepath)
@@ -2,9 +2,8 @@
 ___authors___: Austin FitzGerald
 """
 
-from numpy.core.defchararray import upper
-
 from TreeScripts.TreeMaker import TreeMaker
+from postrequisite_prediction import GradeCodec
 import pandas as pd
 
 __COMBINED_STRUCTURE = '..\\Data\\combined_course_structure.csv'
@@ -14,31 +13,8 @@ __OUTPUT_FILEPATH = 'results\\failed_prereq_took_postreq_probability.csv'
 
 
 def convert_grade(string_grade):
-    string_grade = upper(string_grade)
-    if string_grade == 'A':
-        return 10
-    elif string_grade == 'A-':
-        return 9
-    elif string_grade == 'B+':
-        return 8
-    elif string_grade == 'B':
-        return 7
-    elif string_grade == 'B-':
-        return 6
-    elif string_grade == 'C+':
-        return 5
-    elif string_grade == 'C':
-        return 4
-    elif string_grade == 'C-':
-        return 3
-    elif string_grade == 'D+':
-        return 2
-    elif string_grade == 'D':
-        return 1
-    elif string_grade == 'F':
-        return 0
-    else:
-        return 1
+    # the grade requirements in the course structure are lower case, anything that is not a grade counts as a D
+    return GradeCodec.convert_grade(str(string_grade).upper(), missing=1)
 
 
 def append_if_division_allowed(append_to, divide_this, by_this):
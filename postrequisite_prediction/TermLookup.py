@@ -0,0 +1,61 @@
+"""
+In memory lookup for the per term student files (cumulative_gpa.csv, term_gpa.csv and struggling_per_term.csv). Each
+file is read once per process and forward filled across its term columns, so the last non-empty value at or before a
+term is a single index into the filled matrix instead of a walk back through the columns of a freshly read csv.
+
+How to use: Call TermLookup.load with the filepath of one of the per term files, then call lookup with arrays of student
+ids and terms. Loading the same filepath again returns the already built lookup, so every prereq table generator in the
+process shares it.
+
+Note: The term columns are used in the order they appear in the file, which is the order the original column walk used.
+struggling_per_term.csv does not list its terms in numeric order, so the order of the file has to be kept for the
+generated tables to stay the same.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class TermLookup:
+    __STUDENT_ID = 'student_id'
+    __LOADED = {}
+    MISSING = '$'
+
+    def __init__(self, filepath):
+        """
+        The constructor for a TermLookup object. Takes in the filepath of a csv with a "student_id" column followed by
+        one column per term number.
+        :param filepath: the per term file to load
+        """
+        table = pd.read_csv(filepath)
+        values = table.drop(columns=[self.__STUDENT_ID])
+        self._students = pd.Index(table[self.__STUDENT_ID].values)
+        self._terms = pd.Index([int(term) for term in values.columns])
+        self._filled = values.ffill(axis=1).to_numpy(dtype=object)
+
+    @classmethod
+    def load(cls, filepath):
+        """
+        Returns the lookup for a file, building it the first time the file is asked for in this process.
+        :param filepath: the per term file to load
+        :return: the TermLookup for the file
+        """
+        if filepath not in cls.__LOADED:
+            cls.__LOADED[filepath] = cls(filepath)
+        return cls.__LOADED[filepath]
+
+    def lookup(self, student_ids, terms):
+        """
+        Gets the last non-empty value at or before the given term for each student.
+        :param student_ids: array of student ids
+        :param terms: array of term numbers, one per student id
+        :return: object array of the values found, MISSING where the student has no value at or before the term
+        """
+        rows = self._students.get_indexer(np.asarray(student_ids))
+        columns = self._terms.get_indexer(np.asarray(terms))
+        if (columns == -1).any():
+            raise ValueError('A term was passed that is not a column of the term file.')
+
+        values = self._filled[rows, columns]
+        found = (rows != -1) & pd.notna(values)
+        return np.where(found, values, self.MISSING)
@@ -0,0 +1,190 @@
+"""
+Whole catalog prerequisite graph. Every class in a course structure file is given an integer id, and the immediate
+prerequisite edges of the catalog are read once from the parsed logical expressions. From those edges the graph keeps a
+topological order and a boolean reachability matrix, so asking if one class is a prereq of another is a single index
+and the ancestors of a class are a single row of the matrix.
+
+How to use: Create a CourseGraph object, giving it the filepath of a course structure file in the same format as
+TreeMaker. Ask it with class names (is_prereq, get_ancestors, get_descendants), or translate the names once with
+get_ids and use the id methods for many questions at once.
+
+Note: The logical relationships are dropped, every class named anywhere in the expression of a postrequisite is an
+immediate prereq of it, the same classes that Node.get_immediate_prereqs returns. A class that is only ever used as a
+prereq is added with no prereqs of its own.
+"""
+
+import numpy as np
+import pandas as pd
+from postrequisite_prediction.TreeScripts.PrereqExpression import Course
+from postrequisite_prediction.TreeScripts.TreeMaker import TreeMaker
+
+
+class CourseGraph:
+    __POSTREQ = 'postreq'
+
+    def __init__(self, file):
+        """
+        The constructor for a CourseGraph object. Takes in a string that contains the filepath for the course structure
+        logical list, with the "postreq" and "prereqs" columns TreeMaker needs.
+        :param file: the course structure filepath
+        """
+        tree_maker = TreeMaker(file)
+        self.__names = []
+        self.__ids = {}
+        immediate = {}
+        for postreq in pd.read_csv(file)[self.__POSTREQ]:
+            postreq_id = self.__add_course(postreq)
+            if postreq_id not in immediate:
+                immediate[postreq_id] = [self.__add_course(course.name) for course in
+                                         self.__get_courses(tree_maker.get_expression(postreq))]
+
+        self.__immediate = [tuple(dict.fromkeys(immediate.get(course_id, ()))) for course_id in range(len(self.__names))]
+        self.__order = self.__sort(self.__immediate)
+        self.__reachable = np.zeros((len(self.__names), len(self.__names)), dtype=bool)
+        for course_id in self.__order:
+            for prereq_id in self.__immediate[course_id]:
+                self.__reachable[course_id] |= self.__reachable[prereq_id]
+                self.__reachable[course_id, prereq_id] = True
+        self.__ancestors = {}
+        self.__descendants = {}
+
+    def __add_course(self, name):
+        """
+        Gets the id of a class, giving it the next id the first time it is seen.
+        :param name: the class name
+        :return: the integer id of the class
+        """
+        if name not in self.__ids:
+            self.__ids[name] = len(self.__names)
+            self.__names.append(name)
+        return self.__ids[name]
+
+    def __get_courses(self, expression):
+        """
+        Gets every class in a parsed logical expression, in the order they are written.
+        :param expression: an Expression from PrereqExpression, or None
+        :return: list of Course objects
+        """
+        if expression is None:
+            return []
+        courses = []
+        for item in expression.items:
+            if isinstance(item, Course):
+                courses.append(item)
+            else:
+                courses.extend(self.__get_courses(item))
+        return courses
+
+    def __sort(self, immediate):
+        """
+        Orders the classes so that every class comes after all of its prereqs.
+        :param immediate: list of the immediate prereq ids of each class id
+        :return: numpy array of class ids in topological order
+        """
+        remaining = [len(prereq_ids) for prereq_ids in immediate]
+        postreqs = [[] for _ in immediate]
+        for course_id, prereq_ids in enumerate(immediate):
+            for prereq_id in prereq_ids:
+                postreqs[prereq_id].append(course_id)
+
+        order = [course_id for course_id, count in enumerate(remaining) if count == 0]
+        for course_id in order:
+            for postreq_id in postreqs[course_id]:
+                remaining[postreq_id] -= 1
+                if remaining[postreq_id] == 0:
+                    order.append(postreq_id)
+        if len(order) != len(immediate):
+            cycle = [self.__names[course_id] for course_id, count in enumerate(remaining) if count > 0]
+            raise ValueError('The course structure has a prerequisite cycle between: ' + ', '.join(cycle))
+        return np.array(order, dtype=np.intp)
+
+    def get_course_count(self):
+        return len(self.__names)
+
+    def get_id(self, name):
+        """
+        Gets the integer id of a class.
+        :param name: the class name
+        :return: the id, raises ValueError if the class is not in the catalog
+        """
+        if name not in self.__ids:
+            raise ValueError('The class ' + str(name) + ' is not in the course structure.')
+        return self.__ids[name]
+
+    def get_ids(self, names):
+        """
+        Gets the integer ids of many classes.
+        :param names: iterable of class names
+        :return: numpy array of ids
+        """
+        return np.array([self.get_id(name) for name in names], dtype=np.intp)
+
+    def get_name(self, course_id):
+        return self.__names[course_id]
+
+    def get_topological_order(self):
+        """
+        Gets the class names ordered so that every class comes after all of its prereqs.
+        :return: tuple of class names
+        """
+        return tuple(self.__names[course_id] for course_id in self.__order)
+
+    def get_immediate_prereqs(self, name):
+        return tuple(self.__names[prereq_id] for prereq_id in self.__immediate[self.get_id(name)])
+
+    def get_reachability(self):
+        """
+        Gets the reachability matrix, where [postreq id, prereq id] is True when the prereq is an immediate or
+        transitive prerequisite of the postreq. The matrix is shared, it should not be modified.
+        :return: square numpy boolean matrix indexed by class id
+        """
+        return self.__reachable
+
+    def is_prereq(self, prereq, postreq):
+        """
+        Checks if a class is an immediate or transitive prerequisite of another class.
+        :param prereq: the prereq class name
+        :param postreq: the postreq class name
+        :return: True, False
+        """
+        return bool(self.__reachable[self.get_id(postreq), self.get_id(prereq)])
+
+    def are_prereqs(self, prereq_ids, postreq_ids):
+        """
+        Checks many prereq and postreq pairs at once.
+        :param prereq_ids: array of prereq class ids
+        :param postreq_ids: array of postreq class ids, one per prereq id
+        :return: numpy boolean array, one value per pair
+        """
+        return self.__reachable[np.asarray(postreq_ids), np.asarray(prereq_ids)]
+
+    def get_ancestors(self, name):
+        """
+        Gets every immediate and transitive prerequisite of a class. The result is kept, so asking again is a lookup.
+        :param name: the class name
+        :return: tuple of class names in topological order
+        """
+        course_id = self.get_id(name)
+        if course_id not in self.__ancestors:
+            self.__ancestors[course_id] = self.__get_names(self.__reachable[course_id])
+        return self.__ancestors[course_id]
+
+    def get_descendants(self, name):
+        """
+        Gets every class that has the given class as an immediate or transitive prerequisite. The result is kept, so
+        asking again is a lookup.
+        :param name: the class name
+        :return: tuple of class names in topological order
+        """
+        course_id = self.get_id(name)
+        if course_id not in self.__descendants:
+            self.__descendants[course_id] = self.__get_names(self.__reachable[:, course_id])
+        return self.__descendants[course_id]
+
+    def __get_names(self, mask):
+        """
+        Gets the names of the classes selected by a boolean mask over class ids.
+        :param mask: numpy boolean array indexed by class id
+        :return: tuple of class names in topological order
+        """
+        return tuple(self.__names[course_id] for course_id in self.__order[mask[self.__order]])
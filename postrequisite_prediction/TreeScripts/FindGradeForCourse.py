@@ -4,6 +4,7 @@ Makes a csv of the grades that each student has gotten in every single course th
 their retakes.
 """
 
+import numpy as np
 import pandas as pd
 
 
@@ -15,40 +16,32 @@ GRADE = 'grade'
 RETAKE_COUNT = 'count'
 
 """
-Finds each time a grade occurs in the grades file and calls add_grade.
+Finds the attempt number of every grade in the grades file by counting each student's grades in a course in the order
+they appear in the file, then places every grade in its course's retake columns of the students data frame in one pass
+per column. The count column is left holding the number of grades found for the last course, like a course by course
+search would leave it.
 Parameters: None
 Returns: None
 """
 def grade_finder():
-    count = 0
-    for i, row in courses.iterrows():
-        print(count)
-        count = count + 1
-        if (count % 100) == 0:
-            students.to_csv('data\\studentGradesPerCourse.csv', index=False)
-        reset_count()
-        for j, tier in grades.iterrows():
-            if grades.at[j, COURSE] == courses.at[i, UNIQUE_COURSE]:
-                add_grade(grades.at[j, STUDENT_ID], grades.at[j, GRADE], courses.at[i, START_COLUMN])
-
-"""
-Adds the grade found in the grade_finder to the data frame under the correct class.
-Parameters: id, grade, course_column
-Returns: None
-"""
-def add_grade(id, grade, course_column):
-    index = students.loc[students[STUDENT_ID] == id].index[0]
-    grade_index = course_column + students.at[index, RETAKE_COUNT] + 1
-    students.loc[index, students.columns[grade_index]] = grade
-    students.at[index, RETAKE_COUNT] = students.at[index, RETAKE_COUNT] + 1
-
-"""
-resets the count that keeps track of how many times it has found a grade for each class that each student has taken.
-Parameters: None
-Returns: None
-"""
-def reset_count():
-    students[RETAKE_COUNT] = 0
+    start_columns = pd.Series(courses[START_COLUMN].values, index=courses[UNIQUE_COURSE].values)
+    start_columns = start_columns[~start_columns.index.duplicated()]
+    found = grades.loc[grades[COURSE].isin(start_columns.index), [STUDENT_ID, COURSE, GRADE]]
+    attempts = found.groupby([COURSE, STUDENT_ID], sort=False).cumcount().values
+
+    rows = pd.Index(students[STUDENT_ID]).get_indexer(found[STUDENT_ID])
+    if (rows == -1).any():
+        raise ValueError('A student in the grades file is not in the students file.')
+    grade_columns = start_columns[found[COURSE]].values + attempts + 1
+
+    placed = pd.DataFrame({'row': rows, 'column': grade_columns, GRADE: found[GRADE].values})
+    for grade_column, column_grades in placed.groupby('column'):
+        name = students.columns[grade_column]
+        students[name] = students[name].astype(object)
+        students.iloc[column_grades['row'].values, grade_column] = column_grades[GRADE].values
+
+    last_course = (found[COURSE] == courses[UNIQUE_COURSE].values[-1]).values
+    students[RETAKE_COUNT] = np.bincount(rows[last_course], minlength=len(students))
 
 
 if __name__ == "__main__":
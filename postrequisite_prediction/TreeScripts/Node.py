@@ -1,9 +1,22 @@
 """
 ___authors___: Austin FitzGerald and Evan Majerus
+
+Note: get_immediate_prereqs and get_all_prereqs walk the tree on every call and return a node for every path to a class.
+The get_unique_* and get_root_prereqs methods return tuples with one node per class name, in the order the class is first
+reached, and are computed once per node from the cached tuples of its prereqs. The cache of a node is cleared when a
+prereq is added to it, trees should not be changed below a node once its unique prereqs have been asked for.
+
+Nodes use __slots__ and only make their coreq and postreq lists when one is added, since most trees never use them.
+
+Nodes compare and hash by identity, since they change while a tree is built and are kept in sets and dictionaries.
+is_same_tree and tree_hash compare and hash a whole tree by the name, relationship, grade, virtual type and prereqs of
+its nodes, so the same tree built in another process or loaded from the tree cache can be recognized. They walk the
+tree on every call. Coreqs and postreqs are not compared.
 """
 
 
 class Node:
+    __slots__ = ('_relationship', '_name', '_prereqs', '_coreq', '_postreq', '_grade', '_virtual', '_closure')
     __SINGLE_RELATIONSHIP = 'SINGLE'
     __AND_RELATIONSHIP = 'AND'
     __OR_RELATIONSHIP = 'OR'
@@ -15,18 +28,24 @@ class Node:
             self._relationship = relationship
         self._name = name
         self._prereqs = []
-        self._coreq = []
-        self._postreq = []
+        self._coreq = None
+        self._postreq = None
         self._grade = ''
         self._virtual = 0
+        self._closure = None
 
     def add_prereq(self, prereq):
         self._prereqs.append(prereq)
+        self._closure = None
 
     def add_coreq(self, coreq):
+        if self._coreq is None:
+            self._coreq = []
         self._coreq.append(coreq)
 
     def add_postreq(self, postreq):
+        if self._postreq is None:
+            self._postreq = []
         self._postreq.append(postreq)
 
     def set_name(self, name):
@@ -50,6 +69,9 @@ class Node:
     def get_name(self):
         return self._name
 
+    def get_prereqs(self):
+        return self._prereqs
+
     def does_have_prereq(self):
         if len(self._prereqs) > 0:
             return 1
@@ -87,6 +109,40 @@ class Node:
 
         return temp_list
 
+    def get_unique_immediate_prereqs(self):
+        return self.__get_closure()[0]
+
+    def get_unique_all_prereqs(self):
+        return self.__get_closure()[1]
+
+    def get_root_prereqs(self):
+        return self.__get_closure()[2]
+
+    def __get_closure(self):
+        """
+        Builds the immediate, all and root prereqs of this node the first time they are asked for. A virtual prereq
+        passes its own immediate and all prereqs through, a class prereq adds itself followed by its all prereqs, which
+        is the order get_all_prereqs returns. Roots are the classes in all prereqs that have no prereqs of their own.
+        :return: tuple of (immediate, all, root) tuples of nodes, one node per class name
+        """
+        if self._closure is None:
+            immediate = {}
+            every = {}
+            for prereq in self._prereqs:
+                if prereq.get_virtual() == self.VIRTUAL_TYPE:
+                    prereq_immediate, prereq_all, _ = prereq.__get_closure()
+                    for n in prereq_immediate:
+                        immediate.setdefault(n.get_name(), n)
+                else:
+                    immediate.setdefault(prereq.get_name(), prereq)
+                    every.setdefault(prereq.get_name(), prereq)
+                    prereq_all = prereq.__get_closure()[1]
+                for n in prereq_all:
+                    every.setdefault(n.get_name(), n)
+            self._closure = (tuple(immediate.values()), tuple(every.values()),
+                             tuple(n for n in every.values() if n.does_have_prereq() == 0))
+        return self._closure
+
     def set_relationship(self, relationship):
         if self.__check_relationship(relationship) == 1:
             self._relationship = relationship
@@ -101,11 +157,59 @@ class Node:
         else:
             return 1
 
+    def is_same_tree(self, other):
+        """
+        Checks that two trees have the same nodes, by name, relationship, grade, virtual type and prereqs.
+        :param other: the Node to compare with
+        :return: True when the trees are the same
+        """
+        return isinstance(other, Node) and self.__equals(other, set())
+
+    def tree_hash(self):
+        """
+        Hashes the tree of this node, trees that are the same by is_same_tree have the same hash in one process.
+        :return: the hash
+        """
+        return self.__hash({})
+
+    def __equals(self, other, equal_pairs):
+        """
+        Compares two trees node by node. Subtrees are shared between the nodes of a tree, so each pair of nodes that was
+        found equal is remembered and not compared again.
+        :param other: the Node to compare with
+        :param equal_pairs: set of the (id, id) pairs of the nodes found equal so far
+        :return: True when the trees are equal
+        """
+        if self is other or (id(self), id(other)) in equal_pairs:
+            return True
+        if (self._name, self._relationship, self._grade, self._virtual, len(self._prereqs)) != \
+                (other._name, other._relationship, other._grade, other._virtual, len(other._prereqs)):
+            return False
+        for prereq, other_prereq in zip(self._prereqs, other._prereqs):
+            if not prereq.__equals(other_prereq, equal_pairs):
+                return False
+        equal_pairs.add((id(self), id(other)))
+        return True
+
+    def __hash(self, hashes):
+        """
+        Hashes a tree from the hashes of its prereqs, hashing each shared subtree once.
+        :param hashes: dictionary of the id of each node hashed so far to its hash
+        :return: the hash
+        """
+        if id(self) not in hashes:
+            hashes[id(self)] = hash((self._name, self._relationship, self._grade, self._virtual,
+                                     tuple(prereq.__hash(hashes) for prereq in self._prereqs)))
+        return hashes[id(self)]
+
     def __copy__(self):
         copy = Node(self._name, self._relationship)
-        copy.add_prereq(self._prereqs)
-        copy.add_coreq(self._coreq)
-        copy.add_postreq(self._postreq)
+        for prereq in self._prereqs:
+            copy.add_prereq(prereq)
+        for coreq in self._coreq or []:
+            copy.add_coreq(coreq)
+        for postreq in self._postreq or []:
+            copy.add_postreq(postreq)
         copy.set_grade(self._grade)
         copy.set_virtual(self._virtual)
         return copy
\ No newline at end of file
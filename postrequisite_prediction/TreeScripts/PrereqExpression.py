@@ -0,0 +1,113 @@
+"""
+Tokenizer and recursive descent parser for the logical prerequisite expressions in the course structure files, for
+example AND({Discrete Mathematics#c-},OR({Precalculus#c-},{College Algebra#})).
+
+How to use: Call parse with an expression string. It returns an immutable Expression whose items are Course objects or
+other Expressions. Parsed expressions are cached by their string, so parsing the same expression again returns the same
+object without reading the string.
+
+Note: Follows the same grammar as TreeMaker. An AND/OR expression has exactly 2 items and a SINGLE expression has
+exactly 1. Items are either classes, written as {class name#minimum grade}, or other logical expressions.
+"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+SINGLE_RELATIONSHIP = 'SINGLE'
+AND_RELATIONSHIP = 'AND'
+OR_RELATIONSHIP = 'OR'
+
+Course = namedtuple('Course', ['name', 'grade'])
+Expression = namedtuple('Expression', ['relationship', 'items'])
+
+_ITEM_COUNTS = {SINGLE_RELATIONSHIP: 1, AND_RELATIONSHIP: 2, OR_RELATIONSHIP: 2}
+_TOKEN_PATTERN = re.compile(r'\s*(?:\{(?P<course>[^}]*)\}|(?P<operator>AND|OR|SINGLE)|(?P<symbol>[(),]))')
+
+
+def tokenize(expression):
+    """
+    Splits an expression into its tokens in a single pass.
+    :param expression: the logical expression string
+    :return: list of (kind, value) tuples, where kind is 'course', 'operator' or 'symbol'. Course values are Course
+    objects, the other values are the matched text.
+    """
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN_PATTERN.match(expression, position)
+        if match is None:
+            raise ValueError('Unexpected character in prerequisite expression at position ' + str(position) + ': '
+                             + expression)
+        if match.group('course') is not None:
+            name, _, grade = match.group('course').rpartition('#')
+            tokens.append(('course', Course(name, grade)))
+        elif match.group('operator') is not None:
+            tokens.append(('operator', match.group('operator')))
+        else:
+            tokens.append(('symbol', match.group('symbol')))
+        position = match.end()
+    return tokens
+
+
+@lru_cache(maxsize=None)
+def parse(expression):
+    """
+    Parses an expression into its immutable tree. The result is cached by the expression string.
+    :param expression: the logical expression string, an empty string for a class without prerequisites
+    :return: the Expression, or None when the expression is empty
+    """
+    tokens = tokenize(expression)
+    if len(tokens) == 0:
+        return None
+    parsed, position = _parse_expression(tokens, 0, expression)
+    if position != len(tokens):
+        raise ValueError('Unexpected text after the end of prerequisite expression: ' + expression)
+    return parsed
+
+
+def _parse_expression(tokens, position, expression):
+    """
+    Parses the logical expression that starts at the given token.
+    :param tokens: the tokens from tokenize
+    :param position: index of the operator token
+    :param expression: the expression string, used for error messages
+    :return: the Expression and the index of the token after it
+    """
+    relationship = _expect(tokens, position, 'operator', None, expression)
+    _expect(tokens, position + 1, 'symbol', '(', expression)
+    position += 2
+    items = []
+    while True:
+        if position < len(tokens) and tokens[position][0] == 'course':
+            items.append(tokens[position][1])
+            position += 1
+        else:
+            item, position = _parse_expression(tokens, position, expression)
+            items.append(item)
+        if _expect(tokens, position, 'symbol', None, expression) == ')':
+            break
+        _expect(tokens, position, 'symbol', ',', expression)
+        position += 1
+
+    if len(items) != _ITEM_COUNTS[relationship]:
+        raise ValueError('A ' + relationship + ' expression must have ' + str(_ITEM_COUNTS[relationship])
+                         + ' item(s): ' + expression)
+    return Expression(relationship, tuple(items)), position + 1
+
+
+def _expect(tokens, position, kind, value, expression):
+    """
+    Checks that the token at a position is of the given kind, and has the given value if one is passed.
+    :param tokens: the tokens from tokenize
+    :param position: index of the token to check
+    :param kind: the kind the token must be
+    :param value: the value the token must have, None for any value
+    :param expression: the expression string, used for error messages
+    :return: the value of the token
+    """
+    if position >= len(tokens) or tokens[position][0] != kind or (value is not None and tokens[position][1] != value):
+        raise ValueError('Malformed prerequisite expression, expected ' + (value or kind) + ' at token '
+                         + str(position) + ': ' + expression)
+    return tokens[position][1]
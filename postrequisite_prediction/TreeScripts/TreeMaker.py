@@ -2,16 +2,26 @@
 ___authors___: Austin FitzGerald, Evan Majerus, Nate Braukhoff, Zhiwei Yang
 
 How to use: Create a TreeMaker object, giving it a file that contains a proper formatted logical prerequisite structure.
-Call the process method on that object, giving it a class name, it will return the root node in the tree.
+Call the process method on that object, giving it a class name, it will return the root node in the tree. The
+prerequisite subtree of each class is parsed once per TreeMaker and shared by every tree that contains that class, so
+the nodes of a returned tree should not be modified. Given a cache folder, the parsed trees of the whole structure file
+and their unique prereqs are pickled there, and later TreeMakers for an unchanged structure file load them instead of
+parsing.
 
 Note: The words operator and relationship are used interchangeably throughout the code. An item is what is contained
 inside a logical expression. There are exactly 2 items per AND/OR logical expression, and 1 item for a SINGLE logical
-expression. Items can either be classes or other logical expressions.
+expression. Items can either be classes or other logical expressions. The expressions are parsed by PrereqExpression,
+which caches the parsed form of each expression string. Virtual nodes are named by their class and position in the
+expression, so the same structure file always gives the same trees.
 """
 
-import random
+import hashlib
+import os
+import pickle
+from pathlib import Path
 import pandas as pd
 from postrequisite_prediction.TreeScripts.Node import Node
+from postrequisite_prediction.TreeScripts.PrereqExpression import Course, parse
 
 
 class TreeMaker:
@@ -22,113 +32,122 @@ class TreeMaker:
     __PREREQ = 'prereqs'
     __READ_FILE = ''
     __OUTPUT_NAME = ''
-    virtual_node_name = 0
+    __CACHE_PREFIX = 'trees_v2_'
+    __VIRTUAL_SEPARATOR = '#'
 
-    def __init__(self, file):
+    def __init__(self, file, cache_folder=None):
         """
         The constructor for a TreeMaker object. Takes in a string that contains the filepath for the course structure
         logical list. Needs a "postreq" column which contains class names that act as postrequisites. Needs a "prereqs"
         column which contains the logical expression for the prereqs.
         :param file:
+        :param cache_folder: Optional folder to keep a cache of the parsed trees in. The cache file is named after a
+        hash of the course structure file, so a changed structure file is parsed again instead of using a stale cache.
         """
-        self.__READ_FILE = pd.read_csv(file)
+        self.__file = file
+        self.__cache_filepath = None
+        if cache_folder is not None:
+            with open(file, 'rb') as structure_file:
+                file_hash = hashlib.sha256(structure_file.read()).hexdigest()
+            self.__cache_filepath = Path(cache_folder) / (self.__CACHE_PREFIX + file_hash + '.pkl')
         self.__OUTPUT_NAME = file.rpartition('\\')[:-1][:-4]
+        self.__prereqs_index = None
+        self.__subtrees = {}
 
-    def __create_trees(self, postreq, prereqs):
+    def __load(self):
         """
-        A recursive descent parser that will generate a prerequisite structure tree for a given class. Each class node
+        Loads the course structure the first time a tree is asked for. With a cache folder, the parsed trees are read
+        from the cache file when one exists for this structure file. Otherwise the structure file is read, the tree of
+        every postrequisite and its prereqs are built, and the cache file is written for the next TreeMaker.
+        :return: None
+        """
+        if self.__prereqs_index is not None:
+            return
+        if self.__cache_filepath is not None and self.__cache_filepath.exists():
+            with open(self.__cache_filepath, 'rb') as cache_file:
+                self.__prereqs_index, self.__subtrees = pickle.load(cache_file)
+            return
+
+        self.__READ_FILE = pd.read_csv(self.__file)
+        self.__prereqs_index = {}
+        for postreq, prereqs in zip(self.__READ_FILE[self.__POSTREQ], self.__READ_FILE[self.__PREREQ].fillna('')):
+            self.__prereqs_index.setdefault(postreq, prereqs)
+        if self.__cache_filepath is not None:
+            for postreq in self.__prereqs_index:
+                self.process(postreq).get_unique_all_prereqs()
+            self.__cache_filepath.parent.mkdir(parents=True, exist_ok=True)
+            temporary_filepath = self.__cache_filepath.with_suffix('.tmp' + str(os.getpid()))
+            with open(temporary_filepath, 'wb') as cache_file:
+                pickle.dump((self.__prereqs_index, self.__subtrees), cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_filepath, self.__cache_filepath)
+
+    def __create_trees(self, postreq, expression):
+        """
+        Generates the prerequisite structure tree for a given class from its parsed logical expression. Each class node
         has a maximum of 2 children, so virtual nodes are used for classes that require more than one relationship type.
         :param postreq: The postreq class node which will act as the head node in the tree.
-        :param prereqs: The list of prerequisites for the given postrequisite node. Taken from the csv, contains a parser
-        expression grammar that is notated by logical expressions (AND, OR, SINGLE). Items are the prereq class names.
+        :param expression: The parsed prerequisites for the given postrequisite node, an Expression from
+        PrereqExpression whose relationship is AND, OR or SINGLE and whose items are Course objects or other
+        Expressions. None when the postrequisite has no prerequisites.
         :return: The postrequisite, for which all classes in the tree will act as at one point (recursively).
         """
-        operator = prereqs.split('(')[0]
-        prereqs = prereqs[(len(operator) + 1):-1]  # remove beginning operator and last parenthesis
-
-        # if AND/OR relationship
-        if operator == self.__AND_RELATIONSHIP or operator == self.__OR_RELATIONSHIP:
-            commas_for_split = self.__get_commas_for_split(operator, prereqs)
-            item_1 = prereqs.split(',', commas_for_split)
-            item_1 = ','.join(item_1[:commas_for_split])
-            item_2 = prereqs.split(',', commas_for_split)
-            item_2 = ','.join(item_2[commas_for_split:])
-            nodes = [Node('', operator), Node('', operator)]
-            postreq.add_prereq(nodes[0])
-            postreq.add_prereq(nodes[1])
-
-            # if item 1 is a class, set grade and name for node 1, call create_trees with item 1 as postreq
-            if item_1[0] == '{':
-                nodes[0].set_grade(item_1.split('#')[1][:-1])
-                nodes[0].set_name(item_1[item_1.find('{') + 1: item_1.find(
-                    str('#') + nodes[0].get_grade() + str('}'))])
-                self.__create_trees(nodes[0], self.__find_items(nodes[0].get_name()))
-            # if item 1 is an operator, set name for node 1 to the incrementing virtual_node_name, call create_trees
-            # with node 1 as the postreq and item 1 as the prereqs list
-            if item_1.split('(')[0] == self.__AND_RELATIONSHIP or item_1.split('(')[0] == self.__OR_RELATIONSHIP or \
-                    item_1.split('(')[0] == self.__SINGLE_RELATIONSHIP:
-                nodes[0].set_name(self.virtual_node_name)
-                nodes[0].set_virtual(nodes[0].VIRTUAL_TYPE)
-                self.virtual_node_name += 1
-                self.__create_trees(nodes[0], item_1)
-
-            # if item 2 is a class, set name and grade for node 1, call create_trees with item 2 as posteq, and return
-            # the original postreq, because we are done
-            if item_2[0] == '{':
-                nodes[1].set_grade(item_2.split('#')[1][:-1])
-                nodes[1].set_name(item_2[item_2.find('{') + 1: item_2.find(
-                    str('#') + nodes[1].get_grade() + str('}'))])
-                self.__create_trees(nodes[1], self.__find_items(nodes[1].get_name()))
-                return postreq
-
-            # if item 2 is an operator, set name for node 2 to the incrementing virtual_node_name, call create_trees
-            # with node 2 as the postreq and item 2 as the prereqs list. Return the original postreq because we are done
-            if item_2.split('(')[0] == self.__AND_RELATIONSHIP or item_2.split('(')[0] == self.__OR_RELATIONSHIP or \
-                    item_2.split('(')[0] == self.__SINGLE_RELATIONSHIP:
-                nodes[1].set_name(random.randint(1, 101))
-                nodes[1].set_virtual(nodes[1].VIRTUAL_TYPE)
-                self.__create_trees(nodes[1], item_2)
-                return postreq
-
-        # If SINGLE relationship, create a node and set the name and grade to the item without an operator.
-        # Return by calling create_trees with the node as postreq and its items as prereq list.
-        if operator == self.__SINGLE_RELATIONSHIP:
-            a = Node('', self.__SINGLE_RELATIONSHIP)
-            removed_operator = prereqs.split('}')[0][1:]
-            a.set_grade(removed_operator.split('#')[1])
-            a.set_name(removed_operator.split('#')[0])
-            postreq.add_prereq(a)
-            return self.__create_trees(a, self.__find_items(a.get_name()))
+        if expression is None:
+            return postreq
+
+        # one node per item, AND/OR items take the operator as their relationship and a SINGLE item is a SINGLE node
+        nodes = [Node('', expression.relationship) for _ in expression.items]
+        for node in nodes:
+            postreq.add_prereq(node)
+
+        for position, (node, item) in enumerate(zip(nodes, expression.items)):
+            # if the item is a class, set name and grade for the node and give it the prereqs of its class
+            if isinstance(item, Course):
+                node.set_grade(item.grade)
+                node.set_name(item.name)
+                self.__add_course_prereqs(node)
+            # if the item is an operator, make the node virtual and call create_trees with the node as the postreq and
+            # the item as its expression. The virtual node is named by its path from the class, for example
+            # "Calculus II#1#0" for the first item of the second item of Calculus II's expression
+            else:
+                node.set_name(postreq.get_name() + self.__VIRTUAL_SEPARATOR + str(position))
+                node.set_virtual(node.VIRTUAL_TYPE)
+                self.__create_trees(node, item)
+        return postreq
+
+    def __add_course_prereqs(self, class_node):
+        """
+        Gives a class node the prerequisite subtree of its class. The subtree of each class is parsed the first time
+        the class is seen and the same child nodes are shared by every later node for that class, in this tree and in
+        the trees of later process calls. The grade on a class node is the grade needed in that class by its parent, so
+        the class node itself is never shared, only its children.
+        :param class_node: A node whose name is a class name, with no prereqs added yet.
+        :return: None
+        """
+        class_name = class_node.get_name()
+        if class_name not in self.__subtrees:
+            subtree = Node(class_name, self.__SINGLE_RELATIONSHIP)
+            self.__create_trees(subtree, self.__find_items(class_name))
+            self.__subtrees[class_name] = subtree.get_prereqs()
+        for prereq in self.__subtrees[class_name]:
+            class_node.add_prereq(prereq)
 
     def __find_items(self, postreq_class_name):
         """
-        Retrieves the prereqs list for a given postrequisite class name
+        Retrieves the parsed prereqs list for a given postrequisite class name
         :param postreq_class_name: a string that contains the class name of a prereq
-        :return: the cell from the prereqs column that matches the given postreq class name
+        :return: the Expression parsed from the prereqs cell that matches the given postreq class name, None if the
+        class has no prereqs
         """
-        for i, row in self.__READ_FILE.iterrows():
-            if self.__READ_FILE.at[i, self.__POSTREQ] == postreq_class_name:
-                return self.__READ_FILE.at[i, self.__PREREQ]
-        return ''
+        self.__load()
+        return parse(self.__prereqs_index.get(postreq_class_name, ''))
 
-    def __get_commas_for_split(self, operator, prereqs):
+    def get_expression(self, postreq_class_name):
         """
-        Retrieves the index of which comma should be used to separate the main logical expression for a prereq list
-        :param operator: Which operator is being used in this prerequisite list (AND, OR, SINGLE)
-        :param prereqs: The list of prereqs, not including the main operator or last parenthesis in the string
-        :return: The comma position, in the prereqs string, where the two items split
+        Gets the parsed logical expression of a class's prerequisites without building a tree.
+        :param postreq_class_name: A string containing the class name to retrieve the prerequisite expression for.
+        :return: An immutable Expression (see PrereqExpression), None if the class has no prerequisites
         """
-        open_paren = 0
-        commas_needed = 1
-        char_iter = iter(prereqs)
-        for idx, char in enumerate(char_iter):
-            if char == '(':
-                open_paren += 1
-                commas_needed += 1
-            if char == ')':
-                open_paren -= 1
-            if idx > len(operator) and open_paren == 0:
-                return commas_needed
+        return self.__find_items(postreq_class_name)
 
     def process(self, postreq_class_name):
         """
@@ -136,8 +155,8 @@ class TreeMaker:
         :param postreq_class_name: A string containing the class name to retrieve the prerequisite tree for.
         :return: The headnode, whose name is the given postrequisite class name, for the prerequisite tree
         """
+        self.__load()
         class_node = Node(postreq_class_name, 'SINGLE')
-        items = self.__find_items(postreq_class_name)
-        self.__create_trees(class_node, items)
+        self.__add_course_prereqs(class_node)
         return class_node
 
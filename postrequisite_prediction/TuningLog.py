@@ -0,0 +1,168 @@
+"""
+Append only log of a hyperparameter search of one course, so a search that is stopped part way can carry on from its
+last completed trial instead of starting over. Every line of the log is one JSON record: the first describes the search,
+then there is one record per scored trial with its parameters and mean cross validation score (and, for a trial of a
+boosted model whose stages were all scored from one fit, its best stage), and a last record holds the best parameters
+once the search is complete. Records are flushed to disk as soon as they are written, the trials scored together in one
+write.
+
+How to use: Open the log of a course with the description of the search (a dictionary of anything that changes which
+trials are run, such as the method, the number of candidates and the seed). Before scoring a trial ask the log for its
+score, and record the score of every trial that had to be scored, with record_batch for a group of trials that were
+scored together. Call complete with the best parameters at the end.
+
+Note: A log that was written for a different search is started over. A last line that was cut off by a crash is
+dropped from the log when it is opened again, that trial is simply scored again.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+LOG_SUFFIX = '.jsonl'
+
+
+class TuningLog:
+    __SEARCH = 'search'
+    __TRIAL = 'trial'
+    __BEST_PARAMS = 'best_params'
+    __STAGE = 'stage'
+
+    def __init__(self, filepath, search):
+        """
+        The constructor for a TuningLog object. Reads the trials of the log when it was written for the same search.
+        :param filepath: the log file of the course
+        :param search: dictionary describing the search
+        """
+        self._filepath = Path(filepath)
+        self._search = self.__to_json(search)
+        self._scores = {}
+        self._stages = {}
+        self._best = None
+
+        records = []
+        torn = False
+        if self._filepath.exists():
+            with open(self._filepath) as log_file:
+                for line in log_file:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        torn = True
+                        break
+                    torn = not line.endswith('\n')
+        if not records or records[0].get(self.__SEARCH) != self._search:
+            records = [{self.__SEARCH: self._search}]
+            torn = True
+        if torn:
+            self._filepath.parent.mkdir(parents=True, exist_ok=True)
+            with open(self._filepath, 'w') as log_file:
+                log_file.writelines(json.dumps(record) + '\n' for record in records)
+
+        for record in records[1:]:
+            if self.__BEST_PARAMS in record:
+                self._best = record
+            else:
+                self._scores[(record['rung'], record[self.__TRIAL])] = (record['params'], record['score'])
+                if self.__STAGE in record:
+                    self._stages[(record['rung'], record[self.__TRIAL])] = record[self.__STAGE]
+
+    def score(self, rung, trial, params):
+        """
+        Gets the logged score of a trial.
+        :param rung: the budget rung of the trial, 0 for searches without rungs
+        :param trial: the number of the candidate
+        :param params: the parameters of the candidate, the score is only returned when they are the logged ones
+        :return: the mean cross validation score, None when the trial has not been scored
+        """
+        logged = self._scores.get((rung, trial))
+        if logged is None or logged[0] != self.__to_json(params):
+            return None
+        return logged[1]
+
+    def get_stage(self, rung, trial):
+        """
+        Gets the logged best stage of a trial, check its parameters with score first.
+        :param rung: the budget rung of the trial, 0 for searches without rungs
+        :param trial: the number of the candidate
+        :return: the best stage, None when the trial has not been scored or was logged without one
+        """
+        return self._stages.get((rung, trial))
+
+    def record(self, rung, trial, params, score, resources=None, stage=None):
+        """
+        Appends the score of a trial to the log.
+        :param rung: the budget rung of the trial, 0 for searches without rungs
+        :param trial: the number of the candidate
+        :param params: the parameters of the candidate
+        :param score: the mean cross validation score, NaN when the candidate could not be fit
+        :param resources: the budget the trial was scored on, None for searches without budgets
+        :param stage: the best stage of a trial whose stages were all scored from one fit, the score is the one of
+        that stage. None for other trials.
+        """
+        self.__append([self.__record(rung, trial, params, score, resources, stage)])
+
+    def record_batch(self, rung, trials, resources=None):
+        """
+        Appends the scores of several trials of one rung to the log in one write and one flush to disk, for the trials
+        that are scored together.
+        :param rung: the budget rung of the trials, 0 for searches without rungs
+        :param trials: list of (trial number, parameters, score), see record
+        :param resources: the budget the trials were scored on, None for searches without budgets
+        """
+        self.__append([self.__record(rung, trial, params, score, resources) for trial, params, score in trials])
+
+    def complete(self, best_params, best_score):
+        """
+        Marks the search as complete.
+        :param best_params: the parameters of the best candidate
+        :param best_score: the mean cross validation score of the best candidate
+        """
+        self._best = {self.__BEST_PARAMS: self.__to_json(best_params), 'best_score': float(best_score)}
+        self.__append([self._best])
+
+    def is_complete(self):
+        return self._best is not None
+
+    def get_best_params(self):
+        return None if self._best is None else self._best[self.__BEST_PARAMS]
+
+    def get_number_scored(self):
+        return len(self._scores)
+
+    def __record(self, rung, trial, params, score, resources=None, stage=None):
+        """
+        Keeps the score of a trial and makes its record.
+        """
+        params = self.__to_json(params)
+        self._scores[(rung, trial)] = (params, float(score))
+        record = {'rung': rung, self.__TRIAL: trial, 'resources': self.__to_json(resources), 'params': params,
+                  'score': float(score)}
+        if stage is not None:
+            self._stages[(rung, trial)] = int(stage)
+            record[self.__STAGE] = int(stage)
+        return record
+
+    def __append(self, records):
+        if not records:
+            return
+        with open(self._filepath, 'a') as log_file:
+            log_file.write(''.join(json.dumps(record) + '\n' for record in records))
+            log_file.flush()
+            os.fsync(log_file.fileno())
+
+    @classmethod
+    def __to_json(cls, value):
+        """
+        Converts numpy values, tuples and dictionaries of them into the plain values they are read back from JSON as,
+        so logged parameters compare equal to freshly made ones.
+        """
+        if isinstance(value, dict):
+            return {str(key): cls.__to_json(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple, np.ndarray)):
+            return [cls.__to_json(item) for item in value]
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
@@ -1,8 +1,11 @@
 import os
+from functools import lru_cache
 import pandas as pd
 import numpy as np
 import random
 from sklearn import metrics
+from postrequisite_prediction.FoldCache import FOLD_CACHE_FILENAME, FoldCache
+from postrequisite_prediction.GradeCodec import reverse_convert_grade
 from pathlib import Path
 
 PREREQ_PROCESS_TYPE = 'ALL'
@@ -11,39 +14,30 @@ STRATIFIED_DATA_PATH = '..\\data\\' + PREREQ_PROCESS_TYPE + 'PrereqFolds\\'
 RESULTS_FOLDER = '..\\results\\' + PREREQ_PROCESS_TYPE + 'Prereq_MeanZeroR_Results\\'
 TABLES_FILE_PATH = '..\\data\\' + PREREQ_PROCESS_TYPE + 'PrereqTables\\'
 random.seed = 313131
+RANDOM_SEED = 313131  # the seed Predict splits the folds with
 population = [0, 1]
 possible_grades = [10, 9, 8, 7, 6, 5, 4, 3, 2, 1, 0]
 
 
-# Grabs the training and testing data the given course name and fold number.
+# Reads the prereq table of a course in the layout of its folds: the prereq grades and then the postreq grade, with
+# -1 for missing grades.
+@lru_cache(maxsize=1)
+def get_table(course_name):
+    table = pd.read_csv(TABLES_FILE_PATH + course_name + '.csv')
+    x = table.drop([table.columns[1], table.columns[0]], axis=1).iloc[:, :-4].fillna(-1)
+    y = table.iloc[:, 1].fillna(-1)
+    return pd.concat([pd.DataFrame(x.values, columns=x.columns), pd.DataFrame(y.values, columns=[course_name])], axis=1)
+
+
+# Grabs the training and testing data the given course name and fold number from the folds cached by Predict.
 def get_training_testing(course_name, number_of_fold):
-    return pd.read_csv(STRATIFIED_DATA_PATH + course_name + '_train_' + str(number_of_fold) + '.csv'), pd.read_csv(
-        STRATIFIED_DATA_PATH + course_name + '_test_' + str(number_of_fold) + '.csv')
-
-
-def reverse_convert_grade(int_grade):
-    if int_grade == 10:
-        return 'A'
-    elif int_grade == 9:
-        return 'A-'
-    elif int_grade == 8:
-        return 'B+'
-    elif int_grade == 7:
-        return 'B'
-    elif int_grade == 6:
-        return 'B-'
-    elif int_grade == 5:
-        return 'C+'
-    elif int_grade == 4:
-        return 'C'
-    elif int_grade == 3:
-        return 'C-'
-    elif int_grade == 2:
-        return 'D+'
-    elif int_grade == 1:
-        return 'D'
-    elif int_grade == 0:
-        return 'F'
+    table = get_table(course_name)
+    folds = FoldCache.open(STRATIFIED_DATA_PATH + FOLD_CACHE_FILENAME).folds(course_name, RANDOM_SEED,
+                                                                             table[course_name].values)
+    if folds is None:
+        raise ValueError('No folds are cached for ' + course_name + '. Run its predictions first.')
+    train_index, test_index = folds[number_of_fold - 1]
+    return table.iloc[train_index].reset_index(drop=True), table.iloc[test_index].reset_index(drop=True)
 
 
 # https://stackoverflow.com/a/43886290
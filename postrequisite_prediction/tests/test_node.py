@@ -0,0 +1,67 @@
+import copy
+import pickle
+from pathlib import Path
+from unittest import TestCase
+
+from postrequisite_prediction.TreeScripts.Node import Node
+from postrequisite_prediction.TreeScripts.TreeMaker import TreeMaker
+
+COMBINED_COURSE_STRUCTURE_FILEPATH = Path(__file__).resolve().parents[2] / 'Data' / 'combined_course_structure.csv'
+
+
+def make_tree(grade='c-'):
+    tree = Node('Calculus II', 'SINGLE')
+    virtual = Node('Calculus II#0', 'AND')
+    virtual.set_virtual(Node.VIRTUAL_TYPE)
+    calculus = Node('Calculus I', 'AND')
+    calculus.set_grade(grade)
+    precalculus = Node('Precalculus', 'SINGLE')
+    calculus.add_prereq(precalculus)
+    virtual.add_prereq(calculus)
+    virtual.add_prereq(precalculus)
+    tree.add_prereq(virtual)
+    return tree
+
+
+class TestNode(TestCase):
+    def test_same_tree(self):
+        self.assertTrue(make_tree().is_same_tree(make_tree()))
+        self.assertEqual(make_tree().tree_hash(), make_tree().tree_hash())
+        self.assertTrue(make_tree().is_same_tree(copy.copy(make_tree())))
+
+    def test_not_same_tree(self):
+        self.assertFalse(make_tree().is_same_tree(make_tree('d')))
+        self.assertFalse(Node('A', 'SINGLE').is_same_tree(Node('B', 'SINGLE')))
+        self.assertFalse(Node('A', 'SINGLE').is_same_tree(Node('A', 'AND')))
+        self.assertFalse(Node('A', 'SINGLE').is_same_tree('A'))
+
+        tree = make_tree()
+        tree.add_prereq(Node('Physics I', 'SINGLE'))
+        self.assertFalse(make_tree().is_same_tree(tree))
+
+        virtual = Node('A', 'SINGLE')
+        virtual.set_virtual(Node.VIRTUAL_TYPE)
+        self.assertFalse(Node('A', 'SINGLE').is_same_tree(virtual))
+
+    def test_identity(self):
+        # nodes are kept in sets and dictionaries while their trees are built, so they compare and hash by identity
+        tree = make_tree()
+        nodes = {tree}
+        tree.add_prereq(Node('Physics I', 'SINGLE'))
+        self.assertIn(tree, nodes)
+        self.assertNotEqual(make_tree(), make_tree())
+        self.assertEqual(2, len({make_tree(), make_tree()}))
+
+    def test_pickled(self):
+        tree = make_tree()
+        self.assertTrue(tree.is_same_tree(pickle.loads(pickle.dumps(tree))))
+        self.assertEqual(tree.tree_hash(), pickle.loads(pickle.dumps(tree)).tree_hash())
+
+    def test_tree_makers(self):
+        structure = str(COMBINED_COURSE_STRUCTURE_FILEPATH)
+        first = TreeMaker(structure)
+        second = TreeMaker(structure)
+        for postreq in ['Calculus and Analytic Geometry II', 'Object-Oriented Programming and Data Structures II']:
+            with self.subTest(postreq=postreq):
+                self.assertTrue(first.process(postreq).is_same_tree(second.process(postreq)))
+                self.assertEqual(first.process(postreq).tree_hash(), second.process(postreq).tree_hash())
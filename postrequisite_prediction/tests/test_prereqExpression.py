@@ -0,0 +1,107 @@
+from pathlib import Path
+from unittest import TestCase
+
+import pandas as pd
+
+from postrequisite_prediction.TreeScripts.PrereqExpression import AND_RELATIONSHIP, OR_RELATIONSHIP, \
+    SINGLE_RELATIONSHIP, Course, Expression, parse, tokenize
+
+COMBINED_COURSE_STRUCTURE_FILEPATH = Path(__file__).resolve().parents[2] / 'Data' / 'combined_course_structure.csv'
+
+
+def legacy_courses(prereqs):
+    """
+    The (name, grade) of every class read from an expression by the string splitting parser TreeMaker used before
+    PrereqExpression, in the order it read them.
+    """
+    courses = []
+    operator = prereqs.split('(')[0]
+    prereqs = prereqs[(len(operator) + 1):-1]
+    if operator == AND_RELATIONSHIP or operator == OR_RELATIONSHIP:
+        commas_for_split = legacy_commas_for_split(operator, prereqs)
+        items = prereqs.split(',', commas_for_split)
+        for item in (','.join(items[:commas_for_split]), ','.join(items[commas_for_split:])):
+            if item[0] == '{':
+                grade = item.split('#')[1][:-1]
+                courses.append((item[item.find('{') + 1: item.find('#' + grade + '}')], grade))
+            elif item.split('(')[0] in (AND_RELATIONSHIP, OR_RELATIONSHIP, SINGLE_RELATIONSHIP):
+                courses += legacy_courses(item)
+    elif operator == SINGLE_RELATIONSHIP:
+        removed_operator = prereqs.split('}')[0][1:]
+        courses.append((removed_operator.split('#')[0], removed_operator.split('#')[1]))
+    return courses
+
+
+def legacy_commas_for_split(operator, prereqs):
+    open_paren = 0
+    commas_needed = 1
+    for idx, char in enumerate(prereqs):
+        if char == '(':
+            open_paren += 1
+            commas_needed += 1
+        if char == ')':
+            open_paren -= 1
+        if idx > len(operator) and open_paren == 0:
+            return commas_needed
+
+
+def courses(expression):
+    """
+    The (name, grade) of every class in a parsed expression, in the order they are written.
+    """
+    if expression is None:
+        return []
+    found = []
+    for item in expression.items:
+        found += [tuple(item)] if isinstance(item, Course) else courses(item)
+    return found
+
+
+class TestPrereqExpression(TestCase):
+    def test_single(self):
+        self.assertEqual(Expression(SINGLE_RELATIONSHIP, (Course('Precalculus', 'c-'),)),
+                         parse('SINGLE({Precalculus#c-})'))
+
+    def test_nested(self):
+        expression = parse('AND({Discrete Mathematics#c-},OR(SINGLE({Precalculus#c-}),AND({College Algebra#},'
+                           '{Trigonometry#d})))')
+
+        self.assertEqual(Expression(AND_RELATIONSHIP, (
+            Course('Discrete Mathematics', 'c-'),
+            Expression(OR_RELATIONSHIP, (
+                Expression(SINGLE_RELATIONSHIP, (Course('Precalculus', 'c-'),)),
+                Expression(AND_RELATIONSHIP, (Course('College Algebra', ''), Course('Trigonometry', 'd'))))))),
+            expression)
+
+    def test_course_names(self):
+        expression = parse('OR({World Population, Food and Resources#c},{C# Programming#})')
+
+        self.assertEqual((Course('World Population, Food and Resources', 'c'), Course('C# Programming', '')),
+                         expression.items)
+
+    def test_whitespace(self):
+        self.assertEqual(parse('AND({A#c},OR({B#},SINGLE({C#d})))'),
+                         parse('  AND ( {A#c} ,\tOR( {B#} , SINGLE ( {C#d} ) ) )  \n'))
+
+    def test_empty(self):
+        self.assertIsNone(parse(''))
+        self.assertIsNone(parse('   '))
+        self.assertEqual([], tokenize(''))
+
+    def test_cached(self):
+        self.assertIs(parse('AND({A#c},{B#})'), parse('AND({A#c},{B#})'))
+
+    def test_malformed(self):
+        for expression in ['AND({A#c})', 'OR({A#c},{B#},{C#})', 'SINGLE({A#c},{B#})', 'AND({A#c},{B#}',
+                           'AND({A#c}{B#})', 'AND({A#c},{B#}))', 'XOR({A#c},{B#})', 'AND({A#c},{B#',
+                           'AND({A#c},)', '{A#c}', 'SINGLE()', 'AND{A#c},{B#})', 'SINGLE({A#c}) SINGLE({B#})']:
+            with self.assertRaises(ValueError, msg=expression):
+                parse(expression)
+
+    def test_course_structure_matches_legacy_parser(self):
+        structure = pd.read_csv(COMBINED_COURSE_STRUCTURE_FILEPATH)
+        self.assertGreater(len(structure), 0)
+        for postreq, prereqs in zip(structure['postreq'], structure['prereqs']):
+            prereqs = '' if pd.isna(prereqs) else prereqs
+            with self.subTest(postreq=postreq):
+                self.assertEqual(legacy_courses(prereqs) if prereqs else [], courses(parse(prereqs)))
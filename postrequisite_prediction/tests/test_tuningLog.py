@@ -0,0 +1,227 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.ensemble import GradientBoostingRegressor
+
+from postrequisite_prediction import Predict
+from postrequisite_prediction.TuningLog import TuningLog
+
+SEARCH = {'method': 'RANDOM', 'candidates': 3, 'seed': 313131, 'folds': 2}
+
+
+class CountingRegressor(BaseEstimator, RegressorMixin):
+    """
+    Predicts the mean label plus an offset, counting how many times it is fit.
+    """
+    fits = 0
+
+    def __init__(self, offset=0.0, n_estimators=1):
+        self.offset = offset
+        self.n_estimators = n_estimators
+
+    def fit(self, x, y):
+        CountingRegressor.fits += 1
+        self.mean_ = np.mean(y)
+        return self
+
+    def predict(self, x):
+        return np.full(len(x), self.mean_ + self.offset)
+
+
+class TestTuningLog(TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.filepath = Path(self.folder.name) / 'logs' / 'course.jsonl'
+        CountingRegressor.fits = 0
+        rng = np.random.RandomState(0)
+        self.x = rng.randint(0, 11, (40, 3)).astype(np.float64)
+        self.y = rng.randint(0, 11, 40).astype(np.float64)
+        self.folds = [(np.arange(0, 20), np.arange(20, 40)), (np.arange(20, 40), np.arange(0, 20))]
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def lines(self):
+        with open(self.filepath) as log_file:
+            return log_file.readlines()
+
+    def test_new_log(self):
+        log = TuningLog(self.filepath, SEARCH)
+
+        self.assertEqual(0, log.get_number_scored())
+        self.assertFalse(log.is_complete())
+        self.assertIsNone(log.get_best_params())
+        self.assertEqual([{'search': SEARCH}], [json.loads(line) for line in self.lines()])
+
+    def test_reopen(self):
+        log = TuningLog(self.filepath, SEARCH)
+        log.record(0, 0, {'C': 0.5}, -1.5)
+        log.record(0, 1, {'C': 2.0}, np.NaN)
+        log.complete({'C': 0.5}, -1.5)
+
+        log = TuningLog(self.filepath, SEARCH)
+        self.assertEqual(2, log.get_number_scored())
+        self.assertEqual(-1.5, log.score(0, 0, {'C': 0.5}))
+        self.assertTrue(np.isnan(log.score(0, 1, {'C': 2.0})))
+        self.assertTrue(log.is_complete())
+        self.assertEqual({'C': 0.5}, log.get_best_params())
+
+    def test_torn_trial(self):
+        log = TuningLog(self.filepath, SEARCH)
+        log.record(0, 0, {'C': 0.5}, -1.5)
+        log.record(0, 1, {'C': 2.0}, -2.5)
+        log.record(0, 2, {'C': 8.0}, -3.5)
+        with open(self.filepath, 'r+') as log_file:
+            log_file.truncate(os.path.getsize(self.filepath) - 10)
+
+        log = TuningLog(self.filepath, SEARCH)
+        self.assertEqual(2, log.get_number_scored())
+        self.assertEqual(-2.5, log.score(0, 1, {'C': 2.0}))
+        self.assertIsNone(log.score(0, 2, {'C': 8.0}))
+        self.assertFalse(log.is_complete())
+        # the torn line is gone, so the next record starts on a line of its own
+        self.assertEqual(3, len(self.lines()))
+        log.record(0, 2, {'C': 8.0}, -3.5)
+        self.assertEqual(3, TuningLog(self.filepath, SEARCH).get_number_scored())
+
+    def test_torn_completion(self):
+        log = TuningLog(self.filepath, SEARCH)
+        log.record(0, 0, {'C': 0.5}, -1.5)
+        log.complete({'C': 0.5}, -1.5)
+        with open(self.filepath, 'r+') as log_file:
+            log_file.truncate(os.path.getsize(self.filepath) - 3)
+
+        log = TuningLog(self.filepath, SEARCH)
+        self.assertFalse(log.is_complete())
+        self.assertEqual(1, log.get_number_scored())
+
+    def test_line_without_newline(self):
+        log = TuningLog(self.filepath, SEARCH)
+        log.record(0, 0, {'C': 0.5}, -1.5)
+        with open(self.filepath, 'r+') as log_file:
+            log_file.truncate(os.path.getsize(self.filepath) - 1)
+
+        log = TuningLog(self.filepath, SEARCH)
+        self.assertEqual(1, log.get_number_scored())
+        self.assertTrue(self.lines()[-1].endswith('\n'))
+
+    def test_search_mismatch_restarts(self):
+        log = TuningLog(self.filepath, SEARCH)
+        log.record(0, 0, {'C': 0.5}, -1.5)
+        log.complete({'C': 0.5}, -1.5)
+
+        log = TuningLog(self.filepath, dict(SEARCH, seed=1))
+        self.assertEqual(0, log.get_number_scored())
+        self.assertFalse(log.is_complete())
+        self.assertIsNone(log.score(0, 0, {'C': 0.5}))
+        self.assertEqual([{'search': dict(SEARCH, seed=1)}], [json.loads(line) for line in self.lines()])
+
+    def test_score_params(self):
+        log = TuningLog(self.filepath, SEARCH)
+        log.record(0, 0, {'C': np.float64(0.5), 'n_estimators': np.int64(30), 'layers': (1, 2)}, -1.5)
+
+        # numpy values and tuples compare equal to the plain values they are read back as
+        self.assertEqual(-1.5, log.score(0, 0, {'C': 0.5, 'n_estimators': 30, 'layers': [1, 2]}))
+        self.assertEqual(-1.5, TuningLog(self.filepath, SEARCH).score(0, 0, {'C': 0.5, 'n_estimators': 30,
+                                                                             'layers': (1, 2)}))
+        self.assertIsNone(log.score(0, 0, {'C': 0.6, 'n_estimators': 30, 'layers': [1, 2]}))
+        self.assertIsNone(log.score(0, 0, {'C': 0.5, 'n_estimators': 90, 'layers': [1, 2]}))
+        self.assertIsNone(log.score(1, 0, {'C': 0.5, 'n_estimators': 30, 'layers': [1, 2]}))
+
+    def test_record_batch(self):
+        log = TuningLog(self.filepath, SEARCH)
+        log.record_batch(2, [(0, {'C': 0.5}, -1.5), (3, {'C': 2.0}, -2.5)], resources=90)
+        log.record_batch(2, [])
+
+        self.assertEqual(3, len(self.lines()))
+        self.assertEqual(90, json.loads(self.lines()[1])['resources'])
+        log = TuningLog(self.filepath, SEARCH)
+        self.assertEqual(-1.5, log.score(2, 0, {'C': 0.5}))
+        self.assertEqual(-2.5, log.score(2, 3, {'C': 2.0}))
+
+    def test_stage(self):
+        log = TuningLog(self.filepath, SEARCH)
+        log.record(0, 0, {'C': 0.5}, -1.5, stage=np.int64(90))
+        log.record(0, 1, {'C': 2.0}, -2.5)
+
+        log = TuningLog(self.filepath, SEARCH)
+        self.assertEqual(90, log.get_stage(0, 0))
+        self.assertIsNone(log.get_stage(0, 1))
+        self.assertIsNone(log.get_stage(0, 2))
+        self.assertNotIn('stage', json.loads(self.lines()[2]))
+
+    def test_resume_scores_only_missing_trials(self):
+        candidates = [(trial, {'offset': offset}) for trial, offset in enumerate([0.0, 1.0, 2.0])]
+        log = TuningLog(self.filepath, SEARCH)
+        scores = Predict.score_candidates(CountingRegressor(), candidates[:2], self.x, self.y, self.folds, log)
+        self.assertEqual(4, CountingRegressor.fits)
+
+        CountingRegressor.fits = 0
+        log = TuningLog(self.filepath, SEARCH)
+        resumed = Predict.score_candidates(CountingRegressor(), candidates, self.x, self.y, self.folds, log)
+        self.assertEqual(2, CountingRegressor.fits)
+        self.assertEqual(scores[0], resumed[0])
+        self.assertEqual(scores[1], resumed[1])
+        self.assertEqual(3, log.get_number_scored())
+
+    def test_halving_rungs_recomputed(self):
+        candidates = [(trial, {'offset': offset}) for trial, offset in enumerate([0.0, 1.0, 2.0])]
+        log = TuningLog(self.filepath, SEARCH)
+        rung_candidates = [(trial, dict(params, n_estimators=10)) for trial, params in candidates]
+        Predict.score_candidates(CountingRegressor(), rung_candidates, self.x, self.y, self.folds, log, 0, 10)
+
+        # the next rung scores the kept trials again on the larger budget, the logged rung is not scored again
+        CountingRegressor.fits = 0
+        log = TuningLog(self.filepath, SEARCH)
+        kept = [(trial, dict(params, n_estimators=30)) for trial, params in candidates[:2]]
+        Predict.score_candidates(CountingRegressor(), rung_candidates, self.x, self.y, self.folds, log, 0, 10)
+        self.assertEqual(0, CountingRegressor.fits)
+        Predict.score_candidates(CountingRegressor(), kept, self.x, self.y, self.folds, log, 1, 30)
+        self.assertEqual(4, CountingRegressor.fits)
+        self.assertEqual(5, TuningLog(self.filepath, SEARCH).get_number_scored())
+
+        # a rung logged with other parameters, such as another budget, is scored again
+        CountingRegressor.fits = 0
+        kept = [(trial, dict(params, n_estimators=90)) for trial, params in candidates[:2]]
+        Predict.score_candidates(CountingRegressor(), kept, self.x, self.y, self.folds, log, 1, 90)
+        self.assertEqual(4, CountingRegressor.fits)
+
+    def test_warm_rungs_match_fresh_fits(self):
+        model = GradientBoostingRegressor(random_state=np.random.RandomState(313131))
+        candidates = [(trial, {'learning_rate': rate, 'subsample': 0.8}) for trial, rate in enumerate([0.05, 0.1, 0.3])]
+        log = TuningLog(self.filepath, SEARCH)
+        rung = [(trial, dict(params, n_estimators=5)) for trial, params in candidates]
+        _, fits = Predict.score_candidates_warm(model, rung, self.x, self.y, self.folds, log, 0, 5, {}, 2)
+        self.assertEqual(2, len(fits))
+
+        rung = [(trial, dict(params, n_estimators=15)) for trial, params in candidates if trial in fits]
+        warm, _ = Predict.score_candidates_warm(model, rung, self.x, self.y, self.folds, log, 1, 15, fits, 0)
+        fresh = Predict.score_candidates(model, rung, self.x, self.y, self.folds,
+                                         TuningLog(Path(self.folder.name) / 'fresh.jsonl', SEARCH), 1, 15)
+        self.assertEqual(fresh, warm)
+
+    def test_staged_trials_logged_once_per_fit(self):
+        model = GradientBoostingRegressor(random_state=np.random.RandomState(313131))
+        candidates = [(trial, {'learning_rate': rate, 'subsample': 0.8}) for trial, rate in enumerate([0.05, 0.3])]
+        stages = [1, 3, 10, 30]
+        log = TuningLog(self.filepath, SEARCH)
+        scores, best_stages = Predict.score_candidates_staged(model, candidates, stages, self.x, self.y, self.folds,
+                                                              log)
+        self.assertEqual(3, len(self.lines()))
+
+        # the score of the best stage is the one of fitting that many estimators on their own
+        for trial, params in candidates:
+            fresh = [Predict.cross_validate_params(model, dict(params, n_estimators=stage), self.x, self.y,
+                                                   self.folds) for stage in stages]
+            self.assertEqual(max(fresh), scores[trial])
+            self.assertEqual(stages[int(np.argmax(fresh))], best_stages[trial])
+
+        log = TuningLog(self.filepath, SEARCH)
+        resumed = Predict.score_candidates_staged(model, candidates, stages, self.x, self.y, self.folds, log)
+        self.assertEqual((scores, best_stages), resumed)
+        self.assertEqual(3, len(self.lines()))